@@ -0,0 +1,266 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+# Content-addressed cache of training artifacts (used by train_final_model.py).
+# Entries live in CACHE_DIR/<kind>/<key>/ with their files and a meta.json, where
+# key is a sha256 over everything that determines the artifact:
+#   run        dataset file bytes + feature lists + forest params + library versions
+#              + training code -> the baselines/model keys it produced (no files)
+#   baselines  healthy rows' raw metrics + library versions + code -> baseline_stats.pkl
+#   model      training matrix (deltas + context) + labels + params + versions + code
+#              -> model .pkl, compiled .npz, importance plot
+# An unchanged dataset is a 'run' hit and nothing is recomputed. Otherwise each
+# stage is looked up on its own: new or changed regression rows reuse the
+# baselines and refit only the model; edits outside the training columns
+# (timestamps, commit IDs, extra columns) reuse both. Least recently used entries
+# are evicted beyond MAX_CACHE_MB.
+#
+# models/build_manifest.json records which build the files in models/ come from
+# (sha256 of model, baselines and compiled model), so validate_model.py can refuse
+# a model paired with another build's baselines, and a stale .npz is not scored with.
+#   python scripts/artifact_cache.py list
+#   python scripts/artifact_cache.py clear
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+CACHE_DIR = os.path.join(PERFORMANCE_APP_DIR, 'artifact_cache')
+MAX_CACHE_MB = float(os.environ.get('PERF_ARTIFACT_CACHE_MB', 1024))
+BUILD_MANIFEST_PATH = os.path.join(PERFORMANCE_APP_DIR, 'models', 'build_manifest.json')
+
+# Distributions whose version can change a fitted artifact
+LIBRARIES = ['numpy', 'pandas', 'scikit-learn', 'joblib', 'matplotlib']
+# Scripts whose code determines the artifacts
+CODE_FILES = ['features.py', 'dataset_loader.py', 'train_final_model.py', 'compiled_forest.py']
+
+
+def library_versions():
+    versions = {'python': platform.python_version()}
+    for name in LIBRARIES:
+        try:
+            versions[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def file_digest(path, chunk_bytes=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_digest(files=CODE_FILES):
+    return {name: file_digest(os.path.join(SCRIPT_DIR, name)) for name in files}
+
+
+def frame_digest(df):
+    """Hash of a frame's values, column names and dtypes (row order matters, the index doesn't)."""
+    import pandas as pd
+
+    digest = hashlib.sha256(json.dumps([[col, str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(*parts):
+    """sha256 of JSON-serializable parts (dict keys sorted)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _copy_atomic(src, dst):
+    tmp_path = f"{dst}.tmp"
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+class ArtifactCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_mb=MAX_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Serialize index updates between concurrent training runs."""
+        with open(os.path.join(self.cache_dir, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_index(self, index):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def entry_dir(self, kind, key):
+        return os.path.join(self.cache_dir, kind, key)
+
+    def get(self, kind, key):
+        """meta.json of the entry (with 'path' set to its directory) and mark it used; None on a miss."""
+        path = self.entry_dir(kind, key)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with self._locked():
+            index = self._load_index()
+            if f"{kind}/{key}" in index:
+                index[f"{kind}/{key}"]['last_used'] = time.time()
+                self._save_index(index)
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['path'] = path
+        return meta
+
+    def put(self, kind, key, files=None, meta=None):
+        """
+        Store `files` ({name: source path}) and `meta` under kind/key, then evict least
+        recently used entries beyond the size limit. Returns the entry's meta.
+        """
+        os.makedirs(os.path.join(self.cache_dir, kind), exist_ok=True)
+        path = self.entry_dir(kind, key)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=os.path.join(self.cache_dir, kind))
+        try:
+            for name, src in (files or {}).items():
+                shutil.copyfile(src, os.path.join(tmp_dir, name))
+            meta = {**(meta or {}), 'kind': kind, 'key': key, 'files': sorted(files or {}),
+                    'created_at': time.time()}
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=2)
+            size = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir))
+            with self._locked():
+                if os.path.exists(path):
+                    shutil.rmtree(tmp_dir) # Same key, same content: another run stored it first
+                else:
+                    os.replace(tmp_dir, path)
+                index = self._load_index()
+                index[f"{kind}/{key}"] = {'bytes': size, 'last_used': time.time()}
+                self._evict(index, keep=f"{kind}/{key}")
+                self._save_index(index)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return {**meta, 'path': path}
+
+    def _evict(self, index, keep=None):
+        total = sum(entry['bytes'] for entry in index.values())
+        for name in sorted(index, key=lambda name: index[name]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= index.pop(name)['bytes']
+            print(f"🧹 Evicted cached {name} (LRU)")
+
+    def restore(self, meta, targets):
+        """Copy the entry's files to their targets ({name: destination path}), skipping identical ones."""
+        for name, dst in targets.items():
+            if name not in meta['files']:
+                continue
+            src = os.path.join(meta['path'], name)
+            if not (os.path.exists(dst) and file_digest(dst) == file_digest(src)):
+                _copy_atomic(src, dst)
+
+    def entries(self):
+        with self._locked():
+            return self._load_index()
+
+    def clear(self):
+        with self._locked():
+            for name in self._load_index():
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            self._save_index({})
+
+
+def record_build(model_path, baselines_path, build_id, path=BUILD_MANIFEST_PATH, compiled_path=None, **details):
+    """Write the manifest tying the model, baselines (and compiled model) files in models/ to one build."""
+    manifest = {
+        'build_id': build_id,
+        'model_sha256': file_digest(model_path),
+        'baselines_sha256': file_digest(baselines_path),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        **details,
+    }
+    if compiled_path and os.path.exists(compiled_path):
+        manifest['compiled_sha256'] = file_digest(compiled_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_build_manifest(path=BUILD_MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_build(model_path, baselines_path, path=BUILD_MANIFEST_PATH):
+    """
+    (ok, message): ok is True when both files match the build manifest, False when
+    either was replaced since (e.g. baselines from another build), None without a manifest.
+    """
+    manifest = load_build_manifest(path)
+    if manifest is None:
+        return None, "no build manifest (models/ predates artifact_cache.py)"
+    mismatched = [name for name, file in (('model', model_path), ('baselines', baselines_path))
+                  if file_digest(file) != manifest[f'{name}_sha256']]
+    if mismatched:
+        return False, f"{' and '.join(mismatched)} not from build {manifest['build_id']}"
+    return True, f"build {manifest['build_id']}"
+
+
+def verify_compiled(compiled_path, path=BUILD_MANIFEST_PATH):
+    """
+    (ok, message) for the compiled model (compiled_forest.py): False when it was not
+    exported from the manifest's build, None when the manifest doesn't record it.
+    """
+    manifest = load_build_manifest(path)
+    if manifest is None or 'compiled_sha256' not in manifest:
+        return None, "build manifest doesn't record a compiled model"
+    if file_digest(compiled_path) != manifest['compiled_sha256']:
+        return False, f"compiled model not from build {manifest['build_id']}"
+    return True, f"build {manifest['build_id']}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed training artifact cache")
+    parser.add_argument("command", choices=["list", "clear"])
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+
+    args = parser.parse_args()
+
+    cache = ArtifactCache(args.cache_dir)
+    if args.command == "clear":
+        cache.clear()
+        print(f"🧹 Cleared {args.cache_dir}")
+        sys.exit(0)
+
+    entries = cache.entries()
+    for name, entry in sorted(entries.items(), key=lambda item: -item[1]['last_used']):
+        used = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))
+        print(f"   {name[:40]:<40} {entry['bytes'] / 1024 ** 2:8.1f} MB  last used {used}")
+    total_mb = sum(entry['bytes'] for entry in entries.values()) / 1024 ** 2
+    print(f"📦 {len(entries)} entries, {total_mb:.1f} MB of {cache.max_bytes / 1024 ** 2:.0f} MB")
@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import sys
+import urllib.parse
+from datetime import datetime, timezone
+
+from plan_routes import load_test_config
+from web_vitals import COLLECT_SCRIPT, COLLECTOR_SCRIPT, collect_args
+
+# Static asset record/replay.
+# Under 3G emulation most of each sample is spent re-downloading the JS/CSS/font
+# bundle, which has nothing to do with the server or API change being measured.
+# `record` loads each route once and stores its static assets in a HAR file;
+# replay mode then routes every request through Playwright:
+#   document and /api/* requests             -> live app
+#   static assets recorded under the same URL -> fulfilled from the HAR
+#   static assets not in the HAR              -> live, and flagged when only the
+#     build hash differs from a recorded asset (e.g. page-1a2b3c.js -> page-9f8e7d.js),
+#     i.e. the change under test touched that bundle
+# Replayed assets never hit the (throttled) network, so load time / LCP under
+# replay are only comparable with other replay runs; API latency is unaffected.
+#   python scripts/asset_replay.py record                  # every route in test-config.json
+#   python scripts/asset_replay.py record --url http://localhost:3000/products   # merged into the HAR
+#   python scripts/asset_replay.py show
+#   python scripts/asset_replay.py check                   # asset_identity on known file names
+#   python scripts/measure_performance.py --replay-assets
+#   python scripts/generate_validation_data.py --replay-assets
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+ASSET_HAR_PATH = os.path.join(PERFORMANCE_APP_DIR, 'asset_cache', 'assets.har')
+DEFAULT_BASE_URL = "http://localhost:3000"
+
+STATIC_RESOURCE_TYPES = {'script', 'stylesheet', 'image', 'font', 'media', 'manifest'}
+LIVE_PATH_PREFIXES = ('/api/',)
+# The body is stored decoded, so transport headers from the original response no longer apply
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'date'}
+
+# Next.js build output: /_next/static/<buildId>/_buildManifest.js and content-hashed
+# file names (page-1a2b3c4d5e6f7a8b.js, 9f8e7d6c5b4a3210.css, turbopack's foo_d95469f0._.js)
+_BUILD_ID_RE = re.compile(r'/_next/static/(?!chunks/|css/|media/)[^/]+/')
+_CONTENT_HASH_RE = re.compile(r'(?:^|[-._])[0-9a-f]{8,}(?=(?:\._)?\.\w+$)')
+
+
+def is_live(resource_type, url):
+    """Requests that always go to the live app."""
+    if resource_type not in STATIC_RESOURCE_TYPES:
+        return True
+    path = urllib.parse.urlsplit(url).path
+    return path.startswith(LIVE_PATH_PREFIXES)
+
+
+def cache_key(url):
+    """Path + query: recorded assets replay against any host/port the app is served on."""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def asset_identity(url):
+    """
+    The asset's path with build ids and content hashes removed: stable across builds.
+    Names that are nothing but a hash (css/9f8e7d6c5b4a3210.css, chunks/0123456789abcdef.js)
+    keep it, since stripping it would give every such file the same identity.
+    """
+    path = _BUILD_ID_RE.sub('/_next/static/<build>/', urllib.parse.urlsplit(url).path)
+    directory, _, name = path.rpartition('/')
+    stripped = _CONTENT_HASH_RE.sub('', name)
+    if not stripped.split('.', 1)[0]:
+        stripped = name
+    return f"{directory}/{stripped}"
+
+
+# (url, url, same identity?) pairs that `asset_replay.py check` asserts
+IDENTITY_CASES = [
+    ('/_next/static/chunks/pages/products-1a2b3c4d5e6f7a8b.js',
+     '/_next/static/chunks/pages/products-9f8e7d6c5b4a3210.js', True),
+    ('/_next/static/chunks/app/page_d95469f0._.js', '/_next/static/chunks/app/page_0badc0de._.js', True),
+    ('/_next/static/Xk2pQ9aB/_buildManifest.js', '/_next/static/7hG4tR1z/_buildManifest.js', True),
+    ('/_next/static/css/9f8e7d6c5b4a3210.css', '/_next/static/css/aaaabbbbccccdddd.css', False),
+    ('/_next/static/chunks/0123456789abcdef.js', '/_next/static/chunks/fedcba9876543210.js', False),
+    ('/_next/static/chunks/d95469f0._.js', '/_next/static/chunks/0badc0de._.js', False),
+    ('/_next/static/chunks/pages/products-1a2b3c4d5e6f7a8b.js',
+     '/_next/static/chunks/pages/about-1a2b3c4d5e6f7a8b.js', False),
+]
+
+
+def check_identities(cases=IDENTITY_CASES):
+    """Assert asset_identity matches and separates the cases as expected. Returns True when all pass."""
+    ok = True
+    for url_a, url_b, same in cases:
+        id_a, id_b = asset_identity(url_a), asset_identity(url_b)
+        passed = (id_a == id_b) == same
+        ok &= passed
+        print(f"   {'✅' if passed else '❌'} {'same' if same else 'distinct'}: {id_a} | {id_b}")
+    return ok
+
+
+# --- HAR file ----------------------------------------------------------------
+
+def _har_headers(headers):
+    return [{'name': name, 'value': value} for name, value in headers.items()]
+
+
+def har_entry(url, resource_type, status, status_text, headers, body):
+    """One HAR 1.2 entry with the body inlined as base64 (importable in DevTools)."""
+    return {
+        'startedDateTime': datetime.now(timezone.utc).isoformat(),
+        'time': 0,
+        '_resourceType': resource_type,
+        'request': {
+            'method': 'GET', 'url': url, 'httpVersion': 'HTTP/1.1',
+            'headers': [], 'queryString': [], 'cookies': [], 'headersSize': -1, 'bodySize': 0,
+        },
+        'response': {
+            'status': status, 'statusText': status_text, 'httpVersion': 'HTTP/1.1',
+            'headers': _har_headers(headers), 'cookies': [], 'redirectURL': '',
+            'headersSize': -1, 'bodySize': len(body),
+            'content': {
+                'size': len(body),
+                'mimeType': headers.get('content-type', 'application/octet-stream'),
+                'text': base64.b64encode(body).decode('ascii'),
+                'encoding': 'base64',
+            },
+        },
+        'cache': {},
+        'timings': {'send': 0, 'wait': 0, 'receive': 0},
+    }
+
+
+def write_har(entries, path=ASSET_HAR_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    har = {'log': {
+        'version': '1.2',
+        'creator': {'name': 'asset_replay.py', 'version': '1.0'},
+        'pages': [],
+        'entries': entries,
+    }}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(har, f)
+    os.replace(tmp_path, path)
+
+
+def read_har_entries(path=ASSET_HAR_PATH):
+    """The raw HAR entries of a recording, [] when there is none yet."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['log']['entries']
+
+
+# Parsed HAR files by path, invalidated by mtime so a long-lived daemon sees re-records
+_LOADED = {}
+
+
+def load_assets(path=ASSET_HAR_PATH):
+    """{cache_key: {'status', 'headers', 'body'}} from a recorded HAR. Raises FileNotFoundError."""
+    mtime = os.path.getmtime(path)
+    cached = _LOADED.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    assets = {}
+    for entry in read_har_entries(path):
+        response = entry['response']
+        content = response['content']
+        text = content.get('text', '')
+        body = base64.b64decode(text) if content.get('encoding') == 'base64' else text.encode('utf-8')
+        headers = {h['name']: h['value'] for h in response['headers'] if h['name'].lower() not in DROPPED_HEADERS}
+        assets[cache_key(entry['request']['url'])] = {
+            'status': response['status'],
+            'headers': headers,
+            'body': body,
+        }
+    _LOADED[path] = (mtime, assets)
+    return assets
+
+
+# --- Replay ------------------------------------------------------------------
+
+class AssetReplay:
+    """
+    Request router for one browser context. Counts what was replayed and
+    collects the static assets that had to go live because their build hash changed.
+    """
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.identities = {asset_identity(key): key for key in assets}
+        self.replayed = 0
+        self.live = 0
+        self.changed = [] # (recorded key, live URL)
+        self.uncached = [] # static assets with no recorded counterpart
+
+    @classmethod
+    def load(cls, path=ASSET_HAR_PATH):
+        return cls(load_assets(path))
+
+    def decide(self, resource_type, url):
+        """The recorded asset to serve, or None to send the request to the live app."""
+        if is_live(resource_type, url):
+            self.live += 1
+            return None
+        asset = self.assets.get(cache_key(url))
+        if asset is not None:
+            self.replayed += 1
+            return asset
+
+        self.live += 1
+        recorded = self.identities.get(asset_identity(url))
+        if recorded is not None:
+            self.changed.append((recorded, url))
+        else:
+            self.uncached.append(url)
+        return None
+
+    async def _route_async(self, route):
+        asset = self.decide(route.request.resource_type, route.request.url)
+        if asset is None:
+            await route.continue_()
+        else:
+            await route.fulfill(status=asset['status'], headers=asset['headers'], body=asset['body'])
+
+    def _route_sync(self, route):
+        asset = self.decide(route.request.resource_type, route.request.url)
+        if asset is None:
+            route.continue_()
+        else:
+            route.fulfill(status=asset['status'], headers=asset['headers'], body=asset['body'])
+
+    async def attach(self, context):
+        await context.route('**/*', self._route_async)
+
+    def attach_sync(self, context):
+        context.route('**/*', self._route_sync)
+
+    def stats(self):
+        return {
+            'assets_replayed': self.replayed,
+            'requests_live': self.live,
+            'assets_changed': [url for _, url in self.changed],
+            'assets_uncached': list(self.uncached),
+        }
+
+    def print_report(self):
+        print(f"📦 Asset replay: {self.replayed} static asset(s) served locally, {self.live} request(s) live")
+        for recorded, url in self.changed:
+            print(f"   ⚠️ Build hash changed, fetched live: {cache_key(url)} (recorded {recorded})")
+        if self.uncached:
+            print(f"   ℹ️ {len(self.uncached)} static asset(s) not in the recording, fetched live "
+                  f"(re-run asset_replay.py record after asset changes)")
+
+
+# --- Record ------------------------------------------------------------------
+
+async def record(urls, har_path=ASSET_HAR_PATH, show_ui=False, merge=False):
+    """
+    Load each URL unthrottled and store its static assets. Returns the entry count.
+    With merge, the existing recording is kept and updated: other routes' assets stay,
+    and a recorded asset is replaced by its new build (same asset_identity).
+    """
+    from playwright.async_api import async_playwright
+
+    entries = {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not show_ui)
+        try:
+            context = await browser.new_context()
+            for url in urls:
+                page = await context.new_page()
+                responses = []
+                page.on("response", lambda response: responses.append(response))
+                # Wait for lazily loaded chunks too (see web_vitals.py)
+                await page.add_init_script(COLLECTOR_SCRIPT)
+                await page.goto(url, wait_until="load")
+                await page.evaluate(COLLECT_SCRIPT, collect_args())
+
+                count = 0
+                for response in responses:
+                    request = response.request
+                    if is_live(request.resource_type, response.url) or response.status != 200:
+                        continue
+                    try:
+                        body = await response.body()
+                    except Exception:
+                        continue # Redirected or evicted body
+                    entries[cache_key(response.url)] = har_entry(
+                        response.url, request.resource_type, response.status, response.status_text,
+                        await response.all_headers(), body)
+                    count += 1
+                print(f"   {url}: {count} static asset(s)")
+                await page.close()
+        finally:
+            await browser.close()
+
+    if merge:
+        recorded = {asset_identity(key) for key in entries}
+        kept = {cache_key(entry['request']['url']): entry for entry in read_har_entries(har_path)}
+        entries = {**{key: entry for key, entry in kept.items() if asset_identity(key) not in recorded}, **entries}
+
+    write_har(list(entries.values()), har_path)
+    return len(entries)
+
+
+def show(har_path=ASSET_HAR_PATH):
+    assets = load_assets(har_path)
+    total_kb = sum(len(asset['body']) for asset in assets.values()) / 1024
+    print(f"📦 {har_path}: {len(assets)} asset(s), {total_kb:.1f} KB")
+    for key, asset in sorted(assets.items()):
+        print(f"   {len(asset['body']) / 1024:8.1f} KB  {key}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record static assets to a HAR and inspect the recording")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Load routes and store their static assets")
+    rec.add_argument("--url", action="append", help="URL to record (repeatable; default: every route in test-config.json)")
+    rec.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    rec.add_argument("--har", default=ASSET_HAR_PATH)
+    rec.add_argument("--headed", action="store_true")
+
+    show_cmd = sub.add_parser("show", help="List the recorded assets")
+    show_cmd.add_argument("--har", default=ASSET_HAR_PATH)
+
+    sub.add_parser("check", help="Check build-stable asset identities on known Next.js file names")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        urls = args.url or [f"{args.base_url.rstrip('/')}{route['url']}" for route in load_test_config()['routes']]
+        print(f"🎬 Recording static assets of {len(urls)} route(s)...")
+        # Recording only some routes keeps the rest of the HAR
+        n = asyncio.run(record(urls, args.har, args.headed, merge=bool(args.url)))
+        print(f"💾 {n} asset(s) saved: {args.har}")
+    elif args.command == "check":
+        print("🔍 Asset identities:")
+        sys.exit(0 if check_identities() else 1)
+    else:
+        show(args.har)
@@ -0,0 +1,331 @@
+import glob
+import json
+import os
+import argparse
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from dataset_loader import BASELINE_COLUMNS, DEFAULT_CHUNK_ROWS, iter_dataset, read_dataset
+from features import BASELINE_KEYS, RAW_METRICS, compute_baselines, prepare_raw_metrics
+
+# Incremental baseline store. Instead of re-running
+#   healthy_df.groupby(['Page_Name', 'Network_Type'])[RAW_METRICS].median()
+# over the whole history on every retrain, each (Page_Name, Network_Type) group keeps
+# P² quantile sketches (Jain & Chlamtac, 1985): five markers per tracked quantile,
+# so memory per group is fixed no matter how many healthy runs arrive.
+#
+#   python scripts/baseline_store.py ingest new_healthy_runs.csv   # update + snapshot
+#   python scripts/baseline_store.py export                        # latest snapshot -> baseline_stats.pkl
+#   python scripts/baseline_store.py compare                       # sketch vs exact medians
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+MODEL_DIR = os.path.join(PERFORMANCE_APP_DIR, 'models')
+STORE_DIR = os.path.join(MODEL_DIR, 'baseline_store')
+STATE_PATH = os.path.join(STORE_DIR, 'state.json')
+SNAPSHOT_DIR = os.path.join(STORE_DIR, 'snapshots')
+BASELINE_PATH = os.path.join(MODEL_DIR, 'baseline_stats.pkl')
+INPUT_FILE = os.path.join(PERFORMANCE_APP_DIR, 'thesis_final_dataset.csv')
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95)
+HEALTHY_SCENARIO = 'baseline'
+
+
+class P2Quantile:
+    """Streaming estimate of one quantile with five markers (the P² algorithm)."""
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []                         # marker heights q[0..4]
+        self.positions = [0, 1, 2, 3, 4]          # actual marker positions n[0..4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x):
+        self.count += 1
+        q = self.heights
+
+        # Warm-up: keep the first five observations sorted
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Adjust the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        if self.count == 0:
+            return float('nan')
+        if self.count <= 5:
+            # Exact (linear interpolation, same as pandas) while fewer than five observations
+            return float(np.quantile(self.heights, self.p))
+        return float(self.heights[2])
+
+    def to_dict(self):
+        return {'p': self.p, 'count': self.count, 'heights': self.heights,
+                'positions': self.positions, 'desired': self.desired}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['p'])
+        sketch.count = state['count']
+        sketch.heights = list(state['heights'])
+        sketch.positions = list(state['positions'])
+        sketch.desired = list(state['desired'])
+        return sketch
+
+
+class SketchSet:
+    """One P² sketch per (metric, quantile) for a single group."""
+
+    def __init__(self, quantiles):
+        self.sketches = {m: {q: P2Quantile(q) for q in quantiles} for m in RAW_METRICS}
+
+    @property
+    def count(self):
+        return next(iter(next(iter(self.sketches.values())).values())).count
+
+    def update(self, values):
+        for metric, sketches in self.sketches.items():
+            for sketch in sketches.values():
+                sketch.update(values[metric])
+
+    def estimates(self):
+        return {m: {q: s.value() for q, s in sk.items()} for m, sk in self.sketches.items()}
+
+    def to_dict(self):
+        return {m: [s.to_dict() for s in sk.values()] for m, sk in self.sketches.items()}
+
+    @classmethod
+    def from_dict(cls, state, quantiles):
+        sketch_set = cls(quantiles)
+        for metric, sketches in state.items():
+            sketch_set.sketches[metric] = {s['p']: P2Quantile.from_dict(s) for s in sketches}
+        return sketch_set
+
+
+class BaselineStore:
+    """
+    Per-(Page_Name, Network_Type) streaming baselines.
+    window_runs=None tracks the whole history. With window_runs=N each group keeps a
+    current and a previous generation (a hopping window): once the current one has
+    seen N runs it replaces the previous one and a fresh generation starts. Estimates
+    come from the current generation once it has N/2 runs, otherwise from the previous.
+    """
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES, window_runs=None):
+        self.quantiles = tuple(sorted(set(quantiles) | {0.5}))
+        self.window_runs = window_runs
+        self.groups = {}   # key -> {'current': SketchSet, 'previous': SketchSet | None, 'runs': int}
+        self.version = 0
+
+    def update(self, df):
+        """Feed healthy runs (rows of raw metrics) into their group sketches."""
+        df = prepare_raw_metrics(df.copy())
+        # Sketch state is kept (and saved as JSON) in float64 whatever the input dtype
+        df[RAW_METRICS] = df[RAW_METRICS].astype(float)
+        for row in df[BASELINE_KEYS + RAW_METRICS].itertuples(index=False):
+            key = (row[0], row[1])
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = {'current': SketchSet(self.quantiles), 'previous': None, 'runs': 0}
+            group['current'].update(dict(zip(RAW_METRICS, row[2:])))
+            group['runs'] += 1
+            if self.window_runs and group['current'].count >= self.window_runs:
+                group['previous'] = group['current']
+                group['current'] = SketchSet(self.quantiles)
+        return self
+
+    def _active(self, group):
+        current, previous = group['current'], group['previous']
+        if previous is not None and current.count < max(1, self.window_runs // 2):
+            return previous
+        return current
+
+    def percentiles(self):
+        """{(page, network): {metric: {quantile: estimate}}}"""
+        return {key: self._active(group).estimates() for key, group in sorted(self.groups.items())}
+
+    def medians(self):
+        """Medians in the legacy baseline_stats.pkl layout: {(page, network): {metric: median}}."""
+        return {key: {m: est[m][0.5] for m in RAW_METRICS} for key, est in self.percentiles().items()}
+
+    # --- Persistence ---
+
+    def save(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        state = {
+            'version': self.version,
+            'quantiles': list(self.quantiles),
+            'window_runs': self.window_runs,
+            'groups': [
+                {
+                    'key': list(key),
+                    'runs': group['runs'],
+                    'current': group['current'].to_dict(),
+                    'previous': group['previous'].to_dict() if group['previous'] else None,
+                }
+                for key, group in self.groups.items()
+            ],
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH, quantiles=DEFAULT_QUANTILES, window_runs=None):
+        """Load saved sketch state, or return an empty store if none exists yet."""
+        if not os.path.exists(path):
+            return cls(quantiles, window_runs)
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        store = cls(state['quantiles'], state['window_runs'])
+        store.version = state['version']
+        for group in state['groups']:
+            store.groups[tuple(group['key'])] = {
+                'current': SketchSet.from_dict(group['current'], store.quantiles),
+                'previous': SketchSet.from_dict(group['previous'], store.quantiles) if group['previous'] else None,
+                'runs': group['runs'],
+            }
+        return store
+
+    def snapshot(self, snapshot_dir=SNAPSHOT_DIR):
+        """Write an immutable, numbered snapshot of the current estimates."""
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.version += 1
+        path = os.path.join(snapshot_dir, f"baseline_v{self.version:04d}.json")
+        payload = {
+            'version': self.version,
+            'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'window_runs': self.window_runs,
+            'baselines': [
+                {'Page_Name': page, 'Network_Type': net, 'runs': self.groups[(page, net)]['runs'],
+                 'percentiles': {m: {str(q): v for q, v in est.items()} for m, est in metrics.items()}}
+                for (page, net), metrics in self.percentiles().items()
+            ],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        return path
+
+
+def load_snapshot(version=None, snapshot_dir=SNAPSHOT_DIR):
+    """Medians from a snapshot (latest when version is None) in the baseline_stats.pkl layout."""
+    if version is None:
+        paths = sorted(glob.glob(os.path.join(snapshot_dir, 'baseline_v*.json')))
+        if not paths:
+            raise FileNotFoundError(f"No baseline snapshots in {snapshot_dir}")
+        path = paths[-1]
+    else:
+        path = os.path.join(snapshot_dir, f"baseline_v{version:04d}.json")
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    return {
+        (b['Page_Name'], b['Network_Type']): {m: b['percentiles'][m]['0.5'] for m in RAW_METRICS}
+        for b in payload['baselines']
+    }
+
+
+def compare_with_exact(df, store):
+    """Per-group, per-metric error of the sketch estimates against exact quantiles."""
+    df = prepare_raw_metrics(df.copy())
+    healthy = df[df['Scenario'] == HEALTHY_SCENARIO]
+    exact = healthy[RAW_METRICS].astype(float).groupby(
+        [healthy[key] for key in BASELINE_KEYS], observed=True).quantile(list(store.quantiles))
+    rows = []
+    for (page, net), metrics in store.percentiles().items():
+        for metric, estimates in metrics.items():
+            for q, estimate in estimates.items():
+                truth = exact.loc[(page, net, q), metric]
+                rows.append({
+                    'Page_Name': page, 'Network_Type': net, 'Metric': metric, 'Quantile': q,
+                    'Exact': round(truth, 2), 'Sketch': round(estimate, 2),
+                    'Abs_Error': round(abs(estimate - truth), 2),
+                    'Rel_Error_%': round(abs(estimate - truth) / abs(truth) * 100, 3) if truth else 0.0,
+                })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental baseline store (P² quantile sketches)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Update sketches with healthy runs from a CSV and snapshot")
+    ingest.add_argument("csv")
+    ingest.add_argument("--scenario", default=HEALTHY_SCENARIO, help="Rows with this Scenario are healthy")
+    ingest.add_argument("--window-runs", type=int, default=None, help="Hopping window size per group (new store only)")
+    ingest.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows read per chunk")
+
+    export = sub.add_parser("export", help="Write a snapshot's medians to baseline_stats.pkl")
+    export.add_argument("--version", type=int, default=None)
+    export.add_argument("--output", default=BASELINE_PATH)
+
+    compare = sub.add_parser("compare", help="Compare sketch estimates with exact quantiles")
+    compare.add_argument("csv", nargs="?", default=INPUT_FILE)
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        store = BaselineStore.load(window_runs=args.window_runs)
+        # Streamed: the CSV can be any size, the store keeps only the sketches
+        ingested = 0
+        for chunk in iter_dataset(args.csv, columns=BASELINE_COLUMNS, chunk_rows=args.chunk_rows):
+            healthy = chunk[chunk['Scenario'] == args.scenario]
+            store.update(healthy)
+            ingested += len(healthy)
+        path = store.snapshot()
+        store.save()
+        print(f"✅ Ingested {ingested} healthy runs into {len(store.groups)} groups. Snapshot: {path}")
+    elif args.command == "export":
+        baselines = load_snapshot(args.version)
+        joblib.dump(baselines, args.output)
+        print(f"💾 Baseline Stats Saved: {args.output}")
+    else:
+        df = read_dataset(args.csv, columns=BASELINE_COLUMNS)
+        store = BaselineStore().update(df[df['Scenario'] == HEALTHY_SCENARIO])
+        report = compare_with_exact(df, store)
+        print(report.to_string(index=False))
+        medians = report[report['Quantile'] == 0.5]
+        print(f"\nMedian: mean rel. error {medians['Rel_Error_%'].mean():.3f}%, max {medians['Rel_Error_%'].max():.3f}%")
+        print(f"All quantiles: mean rel. error {report['Rel_Error_%'].mean():.3f}%, max {report['Rel_Error_%'].max():.3f}%")
+        exact = compute_baselines(prepare_raw_metrics(df.copy()))
+        print(f"Groups: {len(store.groups)} sketch vs {len(exact)} exact")
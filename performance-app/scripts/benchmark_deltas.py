@@ -0,0 +1,103 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from features import DELTA_COLUMNS, RAW_METRICS, add_delta_features
+
+# Benchmark: legacy row-wise df.apply(calculate_deltas) vs. vectorized add_delta_features
+#   python scripts/benchmark_deltas.py --rows 5000 500000 5000000
+
+PAGES = ['Homepage', 'Products', 'About']
+NETWORKS = ['WiFi', '4G', '3G']
+
+# Row-wise apply is ~minutes per million rows; above this size its time is extrapolated
+DEFAULT_APPLY_CAP = 500_000
+
+
+def make_frame(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Page_Name': rng.choice(PAGES, n_rows),
+        'Network_Type': rng.choice(NETWORKS, n_rows),
+    })
+    for metric in RAW_METRICS:
+        df[metric] = rng.gamma(2.0, 500.0, n_rows).round(2)
+    return df
+
+
+def make_baselines():
+    rng = np.random.default_rng(0)
+    return {
+        (page, net): {metric: float(rng.uniform(50, 5000)) for metric in RAW_METRICS}
+        for page in PAGES for net in NETWORKS
+    }
+
+
+def legacy_deltas(df, baselines):
+    # Copy of the pre-features.py implementation, kept here for comparison only
+    def calculate_deltas(row):
+        key = (row['Page_Name'], row['Network_Type'])
+        if key in baselines:
+            base = baselines[key]
+            return pd.Series([
+                row['Page_Load_Time_ms'] - base['Page_Load_Time_ms'],
+                row['Perceived_Load_Time_ms'] - base['Perceived_Load_Time_ms'],
+                row['LCP_ms'] - base['LCP_ms'],
+                row['API_Latency_ms'] - base['API_Latency_ms']
+            ])
+        else:
+            return pd.Series([0, 0, 0, 0])
+
+    df[DELTA_COLUMNS] = df.apply(calculate_deltas, axis=1)
+    return df
+
+
+def run_benchmark(sizes, apply_cap=DEFAULT_APPLY_CAP):
+    baselines = make_baselines()
+    results = []
+
+    for n_rows in sizes:
+        df = make_frame(n_rows)
+
+        start = time.perf_counter()
+        add_delta_features(df, baselines)
+        vector_s = time.perf_counter() - start
+
+        # Legacy path on at most apply_cap rows, extrapolated linearly beyond that
+        n_apply = min(n_rows, apply_cap)
+        legacy_df = df.iloc[:n_apply][['Page_Name', 'Network_Type'] + RAW_METRICS].copy()
+        start = time.perf_counter()
+        legacy_deltas(legacy_df, baselines)
+        apply_s = (time.perf_counter() - start) * (n_rows / n_apply)
+
+        # Both paths must agree on the rows they share
+        np.testing.assert_allclose(
+            legacy_df[DELTA_COLUMNS].to_numpy(dtype=float),
+            df.iloc[:n_apply][DELTA_COLUMNS].to_numpy(dtype=float)
+        )
+
+        results.append({
+            'Rows': n_rows,
+            'Apply_s': round(apply_s, 3),
+            'Apply_Estimated': n_apply < n_rows,
+            'Vectorized_s': round(vector_s, 4),
+            'Speedup': round(apply_s / vector_s, 1) if vector_s > 0 else float('inf'),
+        })
+        print(f"[{n_rows:>9,} rows] apply={apply_s:.3f}s{' (est.)' if n_apply < n_rows else ''}  "
+              f"vectorized={vector_s:.4f}s  speedup={results[-1]['Speedup']}x")
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark delta feature computation")
+    parser.add_argument("--rows", type=int, nargs="+", default=[5_000, 500_000, 5_000_000], help="Dataset sizes")
+    parser.add_argument("--apply-cap", type=int, default=DEFAULT_APPLY_CAP, help="Max rows to run through df.apply")
+
+    args = parser.parse_args()
+
+    print("🚀 Benchmarking delta computation (df.apply vs vectorized)...")
+    summary = run_benchmark(args.rows, args.apply_cap)
+    print()
+    print(summary.to_string(index=False))
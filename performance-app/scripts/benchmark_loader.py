@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from benchmark_pipeline import peak_rss_mb as rusage_peak_rss_mb
+from dataset_loader import BASELINE_COLUMNS, DEFAULT_CHUNK_ROWS, iter_dataset, read_dataset
+from features import (
+    BASELINE_KEYS, DELTA_COLUMNS, RAW_METRICS, TARGET,
+    add_delta_features, compute_baselines, compute_baselines_chunked, model_features, prepare_raw_metrics
+)
+from model_metadata import DEFAULT_THRESHOLD
+from validate_model import MODEL_PATH, score_chunks
+
+# Benchmark: peak RSS of loading a large history three ways, each mode in its own
+# process (the peak is a per-process high-water mark):
+#   legacy   pd.read_csv with default dtypes, every column, whole file in memory
+#   typed    dataset_loader.read_dataset: schema dtypes + usecols projection
+#   chunked  dataset_loader.iter_dataset: baselines in one pass, deltas (+ scoring) in a second
+# Every mode computes the same baselines and delta sums, which are checked for agreement.
+#   python scripts/benchmark_loader.py --rows 10000000
+#   python scripts/benchmark_loader.py --rows 1000000 --score   # + predict_proba (slow on few cores)
+
+DEFAULT_ROWS = 10_000_000
+MODES = ['legacy', 'typed', 'chunked']
+SCORE_KEEP = ['Page_Name', 'Network_Type', 'Scenario', TARGET] # What a batch report needs per row
+# Modes agree when their results differ by less than this (float32 metrics vs float64)
+DELTA_SUM_RTOL = 1e-4
+
+
+def peak_rss_mb():
+    # VmHWM starts over at exec; ru_maxrss on Linux carries over the parent's peak
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rusage_peak_rss_mb()
+
+
+def _summary(baselines, delta_sums, rows, flagged=None):
+    return {
+        'rows': int(rows),
+        'baselines': {f"{page}/{net}": values for (page, net), values in sorted(baselines.items())},
+        'delta_sums': [float(v) for v in delta_sums],
+        'flagged': None if flagged is None else int(flagged),
+    }
+
+
+def _whole_frame(df, model):
+    prepare_raw_metrics(df)
+    baselines = compute_baselines(df)
+    add_delta_features(df, baselines)
+    flagged = None
+    if model is not None:
+        numeric_features, categorical_features = model_features(model)
+        y_prob = model.predict_proba(df[numeric_features + categorical_features])[:, 1]
+        flagged = (y_prob >= DEFAULT_THRESHOLD).sum()
+    return _summary(baselines, df[DELTA_COLUMNS].sum().to_numpy(), len(df), flagged)
+
+
+def run_legacy(csv_path, model, chunk_rows):
+    return _whole_frame(pd.read_csv(csv_path), model)
+
+
+def run_typed(csv_path, model, chunk_rows):
+    columns = BASELINE_COLUMNS + (['Total_Page_Size_KB'] if model is not None else [])
+    return _whole_frame(read_dataset(csv_path, columns=columns), model)
+
+
+def run_chunked(csv_path, model, chunk_rows):
+    chunks = (prepare_raw_metrics(chunk) for chunk in iter_dataset(csv_path, columns=BASELINE_COLUMNS, chunk_rows=chunk_rows))
+    baselines = compute_baselines_chunked(chunks)
+
+    rows, flagged = 0, 0
+    delta_sums = np.zeros(len(DELTA_COLUMNS))
+    if model is not None:
+        for chunk in score_chunks(csv_path, model, baselines, DEFAULT_THRESHOLD, chunk_rows, keep=SCORE_KEEP + DELTA_COLUMNS):
+            rows += len(chunk)
+            delta_sums += chunk[DELTA_COLUMNS].sum().to_numpy()
+            flagged += int(chunk['Predicted_Label'].sum())
+        return _summary(baselines, delta_sums, rows, flagged)
+
+    for chunk in iter_dataset(csv_path, columns=BASELINE_KEYS + RAW_METRICS + ['API_Measured'], chunk_rows=chunk_rows):
+        prepare_raw_metrics(chunk)
+        add_delta_features(chunk, baselines)
+        rows += len(chunk)
+        delta_sums += chunk[DELTA_COLUMNS].sum().to_numpy()
+    return _summary(baselines, delta_sums, rows)
+
+
+RUNNERS = {'legacy': run_legacy, 'typed': run_typed, 'chunked': run_chunked}
+
+
+def run_child(mode, csv_path, score, chunk_rows):
+    """Body of one measurement process: prints a JSON line with wall time and peak RSS."""
+    model = joblib.load(MODEL_PATH) if score else None
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    result = RUNNERS[mode](csv_path, model, chunk_rows)
+    result.update({
+        'mode': mode,
+        'wall_s': round(time.perf_counter() - start, 2),
+        'start_rss_mb': round(start_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    })
+    print(json.dumps(result))
+
+
+def measure(mode, csv_path, score=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode, '--csv', csv_path, '--chunk-rows', str(chunk_rows)]
+    if score:
+        cmd.append('--score')
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    if out.returncode != 0:
+        # e.g. killed by the OOM killer: that is the result for this mode
+        print(f"   ❌ {mode:<8} failed (exit {out.returncode}): {out.stderr.strip()[-300:]}")
+        return {'mode': mode, 'error': out.returncode}
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    flagged = f"  flagged={result['flagged']:,}" if result['flagged'] is not None else ""
+    print(f"   {mode:<8} {result['wall_s']:8.1f}s  peak RSS {result['peak_rss_mb']:8.1f} MB "
+          f"(+{result['peak_rss_mb'] - result['start_rss_mb']:.1f} MB after imports){flagged}")
+    return result
+
+
+def check_agreement(results):
+    """Every successful mode must reproduce the first one's baselines and delta sums."""
+    done = [r for r in results if 'error' not in r]
+    if len(done) < 2:
+        return True
+    ref = done[0]
+    ok = True
+    for other in done[1:]:
+        base_ok = all(np.allclose(list(ref['baselines'][key].values()), list(values.values()), rtol=DELTA_SUM_RTOL)
+                      for key, values in other['baselines'].items()) and ref['baselines'].keys() == other['baselines'].keys()
+        delta_ok = np.allclose(ref['delta_sums'], other['delta_sums'], rtol=DELTA_SUM_RTOL)
+        if not (base_ok and delta_ok and ref['rows'] == other['rows']):
+            print(f"   ⚠️ {other['mode']} disagrees with {ref['mode']} "
+                  f"(baselines {'ok' if base_ok else 'differ'}, delta sums {'ok' if delta_ok else 'differ'})")
+            ok = False
+    if ok:
+        print(f"✅ All modes agree on baselines and delta sums ({ref['rows']:,} rows).")
+    return ok
+
+
+def run_benchmark(n_rows, modes=MODES, score=False, chunk_rows=DEFAULT_CHUNK_ROWS, csv_path=None, seed=42):
+    with tempfile.TemporaryDirectory() as workdir:
+        if csv_path is None:
+            csv_path = os.path.join(workdir, f'synthetic_{n_rows}.csv')
+            start = time.perf_counter()
+            synthetic_data.write_csv(csv_path, n_rows, seed)
+            print(f"🧪 {n_rows:,} synthetic rows ({os.path.getsize(csv_path) / 1024 ** 2:.0f} MB CSV) "
+                  f"in {time.perf_counter() - start:.0f}s")
+        print(f"🚀 Peak RSS per mode{' (with scoring)' if score else ''}:")
+        results = [measure(mode, csv_path, score, chunk_rows) for mode in modes]
+    check_agreement(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of legacy vs typed vs chunked dataset loading")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Synthetic history size")
+    parser.add_argument("--csv", help="Existing dataset CSV instead of a synthetic one")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--score", action="store_true", help="Also batch-score every row with the trained model")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.csv, args.score, args.chunk_rows)
+    else:
+        run_benchmark(args.rows, args.modes, args.score, args.chunk_rows, args.csv, args.seed)
@@ -0,0 +1,92 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import metrics_store
+
+# Benchmark: flat CSV vs. Parquet metrics store, full load and a filtered load
+# ("healthy baseline rows for Products on 3G").
+#   python scripts/benchmark_metrics_store.py --rows 5000 500000 5000000
+
+SOURCE_CSV = metrics_store.LEGACY_DATASETS['thesis_final']
+FILTER = {'scenario': 'baseline', 'page': 'Products', 'network': '3G'}
+N_COMMITS = 50 # Synthetic histories are spread over this many Commit_ID partitions
+
+
+def make_history(n_rows, seed=42):
+    """Resample the thesis dataset to n_rows, spread over N_COMMITS commits and days."""
+    source = pd.read_csv(SOURCE_CSV)
+    rng = np.random.default_rng(seed)
+    df = source.iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+    commit_idx = np.arange(n_rows) * N_COMMITS // n_rows
+    df['Commit_ID'] = df['Commit_ID'] + '_' + pd.Series(commit_idx).astype(str)
+    timestamps = (pd.Timestamp('2026-01-01') + pd.to_timedelta(commit_idx, unit='D')
+                  + pd.to_timedelta(rng.integers(0, 86_400, n_rows), unit='s'))
+    df['Timestamp'] = timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+
+def measure(fn):
+    pool = pa.default_memory_pool()
+    arrow_before = pool.max_memory() or 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow_peak = max(0, (pool.max_memory() or 0) - arrow_before)
+    return result, elapsed, (py_peak + arrow_peak) / 1024 ** 2
+
+
+def csv_filtered(csv_path):
+    df = pd.read_csv(csv_path)
+    return df[(df['Scenario'] == FILTER['scenario']) & (df['Page_Name'] == FILTER['page'])
+              & (df['Network_Type'] == FILTER['network'])]
+
+
+def run_benchmark(sizes):
+    results = []
+    for n_rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'history.csv')
+            store_dir = os.path.join(tmp, 'store')
+            make_history(n_rows).to_csv(csv_path, index=False)
+            metrics_store.migrate_csvs({'bench': csv_path}, store_dir)
+
+            cases = {
+                'csv_full': lambda: pd.read_csv(csv_path),
+                'store_full': lambda: metrics_store.load(store_dir=store_dir),
+                'csv_filtered': lambda: csv_filtered(csv_path),
+                'store_filtered': lambda: metrics_store.load(store_dir=store_dir, **FILTER),
+            }
+            for case, fn in cases.items():
+                df, elapsed, peak_mb = measure(fn)
+                results.append({
+                    'Rows': n_rows,
+                    'Case': case,
+                    'Rows_Returned': len(df),
+                    'Load_s': round(elapsed, 3),
+                    'Peak_MB': round(peak_mb, 1),
+                    'Frame_MB': round(df.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+                })
+                print(f"[{n_rows:>9,} rows] {case:<15} {elapsed:8.3f}s  peak={peak_mb:8.1f}MB  rows={len(df)}")
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet metrics store")
+    parser.add_argument("--rows", type=int, nargs="+", default=[5_000, 500_000, 5_000_000], help="History sizes")
+
+    args = parser.parse_args()
+
+    print("🚀 Benchmarking CSV vs metrics store loads...")
+    summary = run_benchmark(args.rows)
+    print()
+    print(summary.to_string(index=False))
@@ -0,0 +1,285 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+import synthetic_data
+from features import (
+    CATEGORICAL_FEATURES, NUMERIC_FEATURES, TARGET, TRAINING_FEATURES,
+    add_delta_features, compute_baselines, prepare_raw_metrics
+)
+from model_metadata import DEFAULT_THRESHOLD
+from validate_model import write_report
+
+# End-to-end benchmark of the training/validation pipeline on synthetic data.
+# Each stage (CSV load, baselines, deltas, ColumnTransformer fit, forest fit,
+# predict_proba, markdown report) is timed and memory-profiled separately and
+# the run is saved as JSON for comparing branches:
+#   python scripts/benchmark_pipeline.py run --rows 5000 100000 1000000
+#   python scripts/benchmark_pipeline.py compare results/main.json results/branch.json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+RESULTS_DIR = os.path.join(PERFORMANCE_APP_DIR, 'benchmark_results')
+DEFAULT_SIZES = [5_000, 100_000, 1_000_000]
+# Forest training is O(n log n) per tree and dominates everything else; above this
+# many rows the forest is fit on a seeded subsample (recorded as Rows in the stage)
+DEFAULT_MAX_TRAIN_ROWS = 500_000
+N_ESTIMATORS = 300 # Same forest as train_final_model.py
+SLOWDOWN_TOLERANCE = 0.20 # compare: flag stages more than 20% slower
+RSS_POLL_S = 0.005
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except OSError:
+        return None
+
+
+class RssSampler:
+    """
+    Polls resident memory in a background thread and reports the stage's peak growth.
+    Unlike tracemalloc this adds no per-allocation overhead, so timings stay honest,
+    and it also sees memory allocated by native code (Arrow, BLAS, joblib workers' threads).
+    """
+
+    def __init__(self):
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+
+    def _poll(self):
+        while not self.done.wait(RSS_POLL_S):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        if self.start_mb is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.done.set()
+        if self.start_mb is not None:
+            self.thread.join()
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    @property
+    def growth_mb(self):
+        return None if self.start_mb is None else self.peak_mb - self.start_mb
+
+
+def run_stage(name, fn, n_rows, trace_memory=False):
+    """
+    Run fn() once; returns (result, stage record). Peak RSS growth is always recorded;
+    trace_memory adds tracemalloc's Python-level peak at a large cost in wall time.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    error = None
+    result = None
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            result = fn()
+        except Exception as e: # Record and keep going so one broken stage doesn't hide the rest
+            error = f"{type(e).__name__}: {e}"
+        wall_s = time.perf_counter() - start
+        cpu_s = time.process_time() - cpu_start
+
+    record = {'Stage': name, 'Rows': n_rows, 'Wall_s': round(wall_s, 4), 'CPU_s': round(cpu_s, 4)}
+    if sampler.growth_mb is not None:
+        record['Peak_RSS_Growth_MB'] = round(sampler.growth_mb, 1)
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        record['Peak_Alloc_MB'] = round(peak / 1024 ** 2, 1)
+    record['Peak_RSS_MB'] = round(peak_rss_mb(), 1)
+    if error:
+        record['Error'] = error
+        print(f"   ❌ {name:<18} failed: {error}")
+    else:
+        print(f"   {name:<18} {record['Wall_s']:9.3f}s  +RSS={record.get('Peak_RSS_Growth_MB', '-')}MB  "
+              f"process peak={record['Peak_RSS_MB']}MB")
+    return result, record
+
+
+def make_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), NUMERIC_FEATURES),
+            ('cat', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES)
+        ])
+
+
+def benchmark_size(n_rows, workdir, seed=42, n_estimators=N_ESTIMATORS,
+                   max_train_rows=DEFAULT_MAX_TRAIN_ROWS, trace_memory=False, source=None):
+    print(f"🚀 [{n_rows:,} rows]")
+    csv_path = os.path.join(workdir, f'synthetic_{n_rows}.csv')
+    report_path = os.path.join(workdir, f'report_{n_rows}.md')
+    stages = []
+
+    def stage(name, fn, rows=n_rows):
+        result, record = run_stage(name, fn, rows, trace_memory)
+        stages.append(record)
+        return result
+
+    stage('generate_csv', lambda: synthetic_data.write_csv(csv_path, n_rows, seed, source))
+    df = stage('csv_load', lambda: pd.read_csv(csv_path))
+    os.remove(csv_path)
+
+    def baselines_stage():
+        prepare_raw_metrics(df)
+        return compute_baselines(df)
+
+    baselines = stage('baselines', baselines_stage)
+    stage('delta_features', lambda: add_delta_features(df, baselines))
+
+    X = df[TRAINING_FEATURES]
+    y = df[TARGET]
+    preprocessor = make_preprocessor()
+    X_t = stage('transformer_fit', lambda: preprocessor.fit_transform(X))
+
+    n_train = min(n_rows, max_train_rows)
+    train_idx = np.sort(np.random.default_rng(seed).choice(n_rows, n_train, replace=False)) if n_train < n_rows else slice(None)
+    classifier = RandomForestClassifier(n_estimators=n_estimators, random_state=42, class_weight='balanced', n_jobs=-1)
+    stage('forest_fit', lambda: classifier.fit(X_t[train_idx], y.to_numpy()[train_idx]), n_train)
+
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+    y_prob = stage('predict_proba', lambda: pipeline.predict_proba(X)[:, 1])
+
+    def report_stage():
+        df['Regression_Prob'] = y_prob
+        df['Predicted_Label'] = (y_prob >= DEFAULT_THRESHOLD).astype(int)
+        write_report(df, report_path, DEFAULT_THRESHOLD)
+
+    stage('report', report_stage)
+    return stages
+
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=PERFORMANCE_APP_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git('rev-parse', 'HEAD'),
+        'git_branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_benchmark(sizes, output=None, seed=42, n_estimators=N_ESTIMATORS,
+                  max_train_rows=DEFAULT_MAX_TRAIN_ROWS, trace_memory=False):
+    env = environment()
+    source = synthetic_data.load_source()
+    results = {
+        'environment': env,
+        'config': {'sizes': sizes, 'seed': seed, 'n_estimators': n_estimators,
+                   'max_train_rows': max_train_rows, 'trace_memory': trace_memory},
+        'stages': [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in sizes:
+            results['stages'].extend(benchmark_size(
+                n_rows, workdir, seed, n_estimators, max_train_rows, trace_memory, source
+            ))
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        tag = (env['git_commit'] or 'nogit')[:8]
+        output = os.path.join(RESULTS_DIR, f"pipeline_{tag}_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results Saved: {output}")
+    return results
+
+
+def compare(base_path, head_path, tolerance=SLOWDOWN_TOLERANCE):
+    """Per-stage wall-time/memory ratios head vs. base. Returns True if no stage slowed beyond tolerance."""
+    def frame(path):
+        with open(path, encoding='utf-8') as f:
+            return pd.DataFrame(json.load(f)['stages']).set_index(['Rows', 'Stage'])
+
+    base, head = frame(base_path), frame(head_path)
+    joined = base.join(head, lsuffix='_base', rsuffix='_head', how='inner')
+    if joined.empty:
+        print("⚠️ No (Rows, Stage) pairs in common.")
+        return True
+    joined['Time_Ratio'] = (joined['Wall_s_head'] / joined['Wall_s_base']).round(3)
+    if 'Peak_RSS_Growth_MB_base' in joined and 'Peak_RSS_Growth_MB_head' in joined:
+        joined['Mem_Delta_MB'] = (joined['Peak_RSS_Growth_MB_head'] - joined['Peak_RSS_Growth_MB_base']).round(1)
+    columns = [c for c in ['Wall_s_base', 'Wall_s_head', 'Time_Ratio', 'Mem_Delta_MB'] if c in joined]
+    print(joined[columns].to_string())
+
+    slower = joined[joined['Time_Ratio'] > 1 + tolerance]
+    if slower.empty:
+        print(f"\n✅ No stage more than {tolerance:.0%} slower.")
+        return True
+    print(f"\n❌ {len(slower)} stage(s) more than {tolerance:.0%} slower:")
+    for (rows, name), row in slower.iterrows():
+        print(f"   {name} @ {rows:,} rows: {row['Wall_s_base']}s -> {row['Wall_s_head']}s (x{row['Time_Ratio']})")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the training/validation pipeline stage by stage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="Benchmark on synthetic datasets and save JSON")
+    run_p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES, help="Dataset sizes (5k-10M)")
+    run_p.add_argument("--seed", type=int, default=42)
+    run_p.add_argument("--n-estimators", type=int, default=N_ESTIMATORS)
+    run_p.add_argument("--max-train-rows", type=int, default=DEFAULT_MAX_TRAIN_ROWS,
+                       help="Subsample the forest fit above this size")
+    run_p.add_argument("--tracemalloc", action="store_true",
+                       help="Also record tracemalloc peaks (inflates wall times several-fold)")
+    run_p.add_argument("--output", help="JSON path (default: benchmark_results/pipeline_<commit>_<time>.json)")
+
+    cmp_p = sub.add_parser("compare", help="Compare two result files (e.g. main vs. branch)")
+    cmp_p.add_argument("base")
+    cmp_p.add_argument("head")
+    cmp_p.add_argument("--tolerance", type=float, default=SLOWDOWN_TOLERANCE)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_benchmark(args.rows, args.output, args.seed, args.n_estimators,
+                      args.max_train_rows, args.tracemalloc)
+    else:
+        sys.exit(0 if compare(args.base, args.head, args.tolerance) else 1)
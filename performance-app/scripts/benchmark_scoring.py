@@ -0,0 +1,121 @@
+import argparse
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from features import SERVER_TIMING_FEATURES, VITALS_FEATURES, add_delta_features, model_features, prepare_raw_metrics
+from scoring_server import (
+    BASELINE_PATH, MODEL_PATH, PERFORMANCE_APP_DIR, RegressionScorer, ScoringService, make_handler
+)
+
+# Benchmark: per-row scoring latency of the scoring service vs. the old
+# "load pipeline + predict_proba" path. Target: p99 < 5 ms per row.
+#   python scripts/benchmark_scoring.py --requests 2000
+
+VALIDATION_FILE = os.path.join(PERFORMANCE_APP_DIR, 'real_validation_data.csv')
+TARGET_P99_MS = 5.0
+RAW_COLUMNS = ['Page_Name', 'Network_Type', 'Page_Load_Time_ms', 'Perceived_Load_Time_ms',
+               'LCP_ms', 'API_Latency_ms', 'API_Measured', 'Total_Page_Size_KB']
+
+
+def load_rows():
+    df = pd.read_csv(VALIDATION_FILE)
+    rows = df[RAW_COLUMNS + [col for col in VITALS_FEATURES + SERVER_TIMING_FEATURES if col in df.columns]].to_dict('records')
+    for row in rows:
+        if pd.isna(row['API_Latency_ms']):
+            row['API_Latency_ms'] = None
+    return rows
+
+
+def summarize(name, samples_s):
+    ms = np.array(samples_s) * 1000
+    stats = {
+        'Path': name,
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+    print(f"{name:<22} p50={stats['p50_ms']:8.3f}ms  p99={stats['p99_ms']:8.3f}ms")
+    return stats
+
+
+def bench_pipeline(scorer, rows, n):
+    # Legacy path: pandas frame + delta features + Pipeline.predict_proba per call
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        df = pd.DataFrame([rows[i % len(rows)]])
+        prepare_raw_metrics(df)
+        add_delta_features(df, scorer.baselines)
+        scorer.model.predict_proba(df[sum(model_features(scorer.model), [])])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_in_process(scorer, rows, n):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        scorer.score([rows[i % len(rows)]])
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_http(scorer, rows, n):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(ScoringService(scorer)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+    samples = []
+    try:
+        for i in range(n):
+            body = json.dumps(rows[i % len(rows)])
+            start = time.perf_counter()
+            conn.request('POST', '/score', body, {'Content-Type': 'application/json'})
+            conn.getresponse().read()
+            samples.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+        server.shutdown()
+    return samples
+
+
+def check_agreement(scorer, rows):
+    df = pd.DataFrame(rows)
+    prepare_raw_metrics(df)
+    add_delta_features(df, scorer.baselines)
+    expected = scorer.model.predict_proba(df[sum(model_features(scorer.model), [])])[:, 1]
+    actual = np.array([r['Regression_Prob'] for r in scorer.score(rows)])
+    return float(np.max(np.abs(expected - actual)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-row scoring latency")
+    parser.add_argument("--requests", type=int, default=2000, help="Scoring calls per path")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--baselines", default=BASELINE_PATH)
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scorer = RegressionScorer(args.model, args.baselines)
+    print(f"🚀 Scorer loaded in {time.perf_counter() - start:.2f}s (fast path: {scorer.fast is not None})")
+
+    rows = load_rows()
+    print(f"Max |prob diff| vs pipeline over {len(rows)} rows: {check_agreement(scorer, rows):.2e}")
+
+    results = [
+        summarize('pipeline (legacy)', bench_pipeline(scorer, rows, min(args.requests, 200))),
+        summarize('scorer in-process', bench_in_process(scorer, rows, args.requests)),
+        summarize('scorer over HTTP', bench_http(scorer, rows, args.requests)),
+    ]
+
+    p99 = results[-1]['p99_ms']
+    status = "✅" if p99 < TARGET_P99_MS else "❌"
+    print(f"\n{status} HTTP p99 {p99}ms (target < {TARGET_P99_MS}ms)")
+    print(pd.DataFrame(results).to_string(index=False))
@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from perfcheck import COMMANDS
+
+# Benchmark: cold start of `perfcheck <command> --help`, each run in a fresh interpreter.
+# Fails (exit 1) when the median exceeds the budget or when any heavy library is
+# imported on the way, so an eager top-level import of pandas/sklearn/Playwright in
+# a command's module shows up here instead of as a slow CLI.
+#   python scripts/benchmark_startup.py                        # measure --help, 10 runs
+#   python scripts/benchmark_startup.py --commands measure train --runs 20
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFCHECK = os.path.join(SCRIPT_DIR, 'perfcheck.py')
+
+STARTUP_BUDGET_MS = 300
+DEFAULT_RUNS = 10
+# Top-level packages `--help` must never load
+HEAVY_MODULES = ['pandas', 'numpy', 'sklearn', 'scipy', 'matplotlib', 'joblib', 'playwright', 'pyarrow']
+# numpy is allowed where the command's module genuinely needs it at import time
+ALLOWED_HEAVY = {'train': {'numpy'}, 'score': {'numpy'}}
+
+
+def cold_start(command, importtime=False):
+    """Wall time (ms) of one fresh `perfcheck command --help` and its stderr."""
+    cmd = [sys.executable, *(['-X', 'importtime'] if importtime else []), PERFCHECK, command, '--help']
+    start = time.perf_counter()
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if out.returncode != 0:
+        raise RuntimeError(f"perfcheck {command} --help exited {out.returncode}:\n{out.stderr}")
+    return wall_ms, out.stderr
+
+
+def heavy_imports(command):
+    """Heavy top-level packages imported anywhere during `perfcheck command --help`."""
+    _, stderr = cold_start(command, importtime=True)
+    imported = set()
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            imported.add(line.rsplit('|', 1)[1].strip().split('.')[0])
+    return sorted(imported & (set(HEAVY_MODULES) - ALLOWED_HEAVY.get(command, set())))
+
+
+def run_benchmark(commands, runs=DEFAULT_RUNS, budget_ms=STARTUP_BUDGET_MS):
+    print(f"🚀 Cold start of `perfcheck <command> --help` ({runs} runs, budget {budget_ms:.0f} ms):")
+    ok = True
+    for command in commands:
+        cold_start(command) # Warm the OS file cache and __pycache__ so runs compare like for like
+        times = [cold_start(command)[0] for _ in range(runs)]
+        median_ms = statistics.median(times)
+        heavy = heavy_imports(command)
+        within = median_ms <= budget_ms and not heavy
+        ok &= within
+        print(f"   {'✅' if within else '❌'} {command:<10} median {median_ms:6.0f} ms "
+              f"(min {min(times):.0f}, max {max(times):.0f})"
+              + (f"  imports {', '.join(heavy)}" if heavy else ""))
+
+    if not ok:
+        print("❌ Startup regression: see `python scripts/perfcheck.py --profile-startup <command> --help`")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start time and import hygiene of the perfcheck CLI")
+    parser.add_argument("--commands", nargs="+", choices=list(COMMANDS), default=['measure'])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+
+    args = parser.parse_args()
+
+    sys.exit(0 if run_benchmark(args.commands, args.runs, args.budget_ms) else 1)
@@ -0,0 +1,293 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+from plan_routes import load_test_config
+
+# Browserless pre-gate on the Next.js build output (run after `next build`).
+# For each route in test-config.json the first-load JS/CSS is read from the build
+# manifests: the root main files (build-manifest.json) plus the entry JS/CSS of
+# the route's layouts and page (server/app/<route>/page_client-reference-manifest.js,
+# or app-build-manifest.json on older webpack builds). Byte counts are compared with
+# the per-route baselines in models/bundle_baselines.json:
+#   fail     - over the route's budget: fail fast, no browser needed
+#   pass     - client bundle and server output identical to the baseline build: skip the browser
+#   measure  - changed within budget, or no baseline: the Playwright stage decides
+# Budgets: optional max_first_load_js_kb / max_first_load_css_kb per route in
+# test-config.json, otherwise baseline + BUNDLE_GROWTH_TOLERANCE.
+#   python scripts/bundle_pregate.py record     # on the reference build (e.g. main)
+#   python scripts/bundle_pregate.py check      # exit 1 when a route is over budget
+#   python scripts/bundle_pregate.py fingerprint --compare ../other-build/.next   # same commit, same fingerprints?
+#   python scripts/measure_performance.py --diff origin/main --pregate
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+NEXT_DIR = os.path.join(PERFORMANCE_APP_DIR, '.next')
+BASELINES_PATH = os.path.join(PERFORMANCE_APP_DIR, 'models', 'bundle_baselines.json')
+
+BUNDLE_GROWTH_TOLERANCE = 0.10 # Fail when first-load bytes grow by more than 10%...
+MIN_GROWTH_KB = 5 # ...and by at least this much (tiny routes would trip on any change)
+
+PASS, FAIL, MEASURE = 'pass', 'fail', 'measure'
+
+# Under .next/server: App Router and Pages Router handlers, and the shared chunks they load
+SERVER_HANDLER_DIRS = ['app', 'pages', 'chunks']
+# Build manifests (middleware-build-manifest.js, server-reference-manifest.js,
+# page_client-reference-manifest.js, ...) embed per-build values and are not handler code
+_MANIFEST_NAME_RE = re.compile(r'(?:^|[-_])manifest\.js$')
+
+_RSC_MANIFEST_RE = re.compile(r'__RSC_MANIFEST\["([^"]+)"\]\s*=\s*(\{.*\})\s*;?\s*$', re.DOTALL)
+
+
+def app_page_key(route_url):
+    """'/' -> '/page', '/products' -> '/products/page' (the App Router entry name)."""
+    path = route_url.split('?')[0].rstrip('/')
+    return f"{path}/page"
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def root_files(next_dir=NEXT_DIR):
+    """JS loaded by every App Router page (polyfills are nomodule and skipped by modern browsers)."""
+    manifest = _read_json(os.path.join(next_dir, 'build-manifest.json'))
+    return list(manifest.get('rootMainFiles', []))
+
+
+def route_entry_files(route_url, next_dir=NEXT_DIR):
+    """
+    (js_files, css_files) of the route's layouts + page, relative to .next.
+    Raises FileNotFoundError/KeyError when the build has no entry for the route.
+    """
+    key = app_page_key(route_url)
+    manifest_path = os.path.join(next_dir, 'server', 'app', key.lstrip('/') + '_client-reference-manifest.js')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            match = _RSC_MANIFEST_RE.search(f.read())
+        if not match:
+            raise KeyError(f"unrecognized client reference manifest: {manifest_path}")
+        manifest = json.loads(match.group(2))
+        js = [file for files in manifest.get('entryJSFiles', {}).values() for file in files]
+        css = [entry['path'] if isinstance(entry, dict) else entry
+               for entries in manifest.get('entryCSSFiles', {}).values() for entry in entries
+               if not (isinstance(entry, dict) and entry.get('inlined'))]
+    else:
+        files = _read_json(os.path.join(next_dir, 'app-build-manifest.json'))['pages'][key]
+        js = [file for file in files if file.endswith('.js')]
+        css = [file for file in files if file.endswith('.css')]
+    return js, css
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def route_bundle(route_url, next_dir=NEXT_DIR):
+    """First-load bundle of one route: byte counts (raw and gzip) and a content fingerprint."""
+    js, css = route_entry_files(route_url, next_dir)
+    js = list(dict.fromkeys(root_files(next_dir) + js))
+    css = list(dict.fromkeys(css))
+
+    sizes = {}
+    digest = hashlib.sha256()
+    for file in sorted(js + css):
+        path = os.path.join(next_dir, file)
+        with open(path, 'rb') as f:
+            data = f.read()
+        sizes[file] = (len(data), len(gzip.compress(data, 6)))
+        digest.update(file.split('/')[-1].encode())
+        digest.update(hashlib.sha256(data).digest())
+
+    return {
+        'js_bytes': sum(sizes[f][0] for f in js),
+        'css_bytes': sum(sizes[f][0] for f in css),
+        'js_gzip_bytes': sum(sizes[f][1] for f in js),
+        'css_gzip_bytes': sum(sizes[f][1] for f in css),
+        'files': len(sizes),
+        'fingerprint': digest.hexdigest(),
+    }
+
+
+def build_volatile_values(next_dir=NEXT_DIR):
+    """
+    Values `next build` generates anew on every run, even for the same commit: the
+    buildId and the server actions encryption key.
+    """
+    values = []
+    build_id_path = os.path.join(next_dir, 'BUILD_ID')
+    if os.path.exists(build_id_path):
+        with open(build_id_path, encoding='utf-8') as f:
+            values.append(f.read().strip())
+    actions_path = os.path.join(next_dir, 'server', 'server-reference-manifest.json')
+    if os.path.exists(actions_path):
+        values.append(_read_json(actions_path).get('encryptionKey'))
+    return [value.encode() for value in values if value]
+
+
+def server_files(next_dir=NEXT_DIR):
+    """Server page/route handlers and the chunks they load, relative to .next/server (manifests excluded)."""
+    server_dir = os.path.join(next_dir, 'server')
+    found = []
+    for top in SERVER_HANDLER_DIRS:
+        for root, dirs, files in os.walk(os.path.join(server_dir, top)):
+            dirs.sort()
+            found += [os.path.relpath(os.path.join(root, name), server_dir) for name in sorted(files)
+                      if name.endswith('.js') and not _MANIFEST_NAME_RE.search(name)]
+    return found
+
+
+def server_fingerprint(next_dir=NEXT_DIR):
+    """
+    Hash of the server JS (page/route handlers and their chunks). Server-side changes,
+    e.g. to an API route, don't show up in client bundles, so a route can only be
+    passed without a browser when this is unchanged too. Manifests are left out and
+    per-build values are blanked, so two builds of the same commit hash the same.
+    """
+    server_dir = os.path.join(next_dir, 'server')
+    volatile = build_volatile_values(next_dir)
+    digest = hashlib.sha256()
+    for name in server_files(next_dir):
+        with open(os.path.join(server_dir, name), 'rb') as f:
+            data = f.read()
+        for value in volatile:
+            data = data.replace(value, b'<build>')
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    return _read_json(path)
+
+
+def record_baselines(routes, next_dir=NEXT_DIR, path=BASELINES_PATH, commit_id=None):
+    baselines = {
+        'server_fingerprint': server_fingerprint(next_dir),
+        'commit': commit_id,
+        'recorded_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'routes': {route['name']: route_bundle(route['url'], next_dir) for route in routes},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2)
+    os.replace(tmp_path, path)
+    return baselines
+
+
+def _over_budget(kind, current, baseline, limit_kb):
+    """Reason string when `current` bytes exceed the explicit or growth budget, else None."""
+    if limit_kb is not None:
+        if current > limit_kb * 1024:
+            return f"first-load {kind} {current / 1024:.1f} KB > budget {limit_kb} KB"
+        return None
+    if baseline is None:
+        return None
+    growth = current - baseline
+    if growth > baseline * BUNDLE_GROWTH_TOLERANCE and growth > MIN_GROWTH_KB * 1024:
+        return (f"first-load {kind} grew by {growth / 1024:.1f} KB ({baseline / 1024:.1f} -> {current / 1024:.1f} KB, "
+                f"> {BUNDLE_GROWTH_TOLERANCE:.0%})")
+    return None
+
+
+def evaluate_route(route, bundle, baseline, server_changed):
+    """Decision for one route: {'route', 'decision', 'reason', 'js_kb', 'css_kb', 'delta_kb'}."""
+    reasons = [reason for reason in (
+        _over_budget('JS', bundle['js_bytes'], baseline and baseline['js_bytes'], route.get('max_first_load_js_kb')),
+        _over_budget('CSS', bundle['css_bytes'], baseline and baseline['css_bytes'], route.get('max_first_load_css_kb')),
+    ) if reason]
+
+    delta = None
+    if baseline:
+        delta = (bundle['js_bytes'] + bundle['css_bytes'] - baseline['js_bytes'] - baseline['css_bytes']) / 1024
+
+    if reasons:
+        decision, reason = FAIL, '; '.join(reasons)
+    elif baseline is None:
+        decision, reason = MEASURE, "no bundle baseline"
+    elif bundle['fingerprint'] != baseline['fingerprint']:
+        decision, reason = MEASURE, "client bundle changed within budget"
+    elif server_changed:
+        decision, reason = MEASURE, "client bundle unchanged, server output changed"
+    else:
+        decision, reason = PASS, "bundle and server output identical to baseline"
+
+    return {
+        'route': route['name'],
+        'decision': decision,
+        'reason': reason,
+        'js_kb': round(bundle['js_bytes'] / 1024, 1),
+        'css_kb': round(bundle['css_bytes'] / 1024, 1),
+        'delta_kb': None if delta is None else round(delta, 1),
+    }
+
+
+def pregate(routes, next_dir=NEXT_DIR, baselines_path=BASELINES_PATH):
+    """Decisions for `routes` (test-config.json entries). Routes missing from the build get 'measure'."""
+    baselines = load_baselines(baselines_path)
+    server_changed = baselines.get('server_fingerprint') != server_fingerprint(next_dir)
+    decisions = []
+    for route in routes:
+        try:
+            bundle = route_bundle(route['url'], next_dir)
+        except (OSError, KeyError, ValueError) as e:
+            decisions.append({'route': route['name'], 'decision': MEASURE, 'reason': f"no build data ({e})",
+                              'js_kb': None, 'css_kb': None, 'delta_kb': None})
+            continue
+        decisions.append(evaluate_route(route, bundle, baselines.get('routes', {}).get(route['name']), server_changed))
+    return decisions
+
+
+def print_decisions(decisions):
+    icons = {PASS: '✅', FAIL: '❌', MEASURE: '🌐'}
+    print("📦 Bundle pre-gate:")
+    for d in decisions:
+        size = f" JS {d['js_kb']} KB, CSS {d['css_kb']} KB" if d['js_kb'] is not None else ""
+        delta = f" ({d['delta_kb']:+.1f} KB)" if d['delta_kb'] is not None else ""
+        print(f"   {icons[d['decision']]} {d['route']}:{size}{delta} - {d['reason']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Browserless pre-gate on Next.js route bundle sizes")
+    parser.add_argument("command", choices=["record", "check", "fingerprint"])
+    parser.add_argument("--routes", nargs="*", metavar="NAME", help="Route names from test-config.json (default: all)")
+    parser.add_argument("--next-dir", default=NEXT_DIR, help="Next.js build output directory")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--commit", help="Commit ID stored with recorded baselines")
+    parser.add_argument("--compare", metavar="NEXT_DIR", help="fingerprint: another build to compare with (exit 1 when they differ)")
+
+    args = parser.parse_args()
+
+    selected = [r for r in load_test_config()['routes'] if not args.routes or r['name'] in args.routes]
+    if args.command == "fingerprint":
+        # Two clean builds of one commit must match, or the pre-gate can never pass a route
+        builds = [args.next_dir] + ([args.compare] if args.compare else [])
+        prints = []
+        for build in builds:
+            routes = {route['name']: route_bundle(route['url'], build)['fingerprint'] for route in selected}
+            prints.append((server_fingerprint(build), routes))
+            print(f"   {build}: server {prints[-1][0][:16]} ({len(server_files(build))} file(s)), "
+                  + ", ".join(f"{name} {fingerprint[:16]}" for name, fingerprint in routes.items()))
+        same = all(fingerprints == prints[0] for fingerprints in prints)
+        print("✅ Builds fingerprint identically." if same else "❌ Builds fingerprint differently.")
+        sys.exit(0 if same else 1)
+    elif args.command == "record":
+        recorded = record_baselines(selected, args.next_dir, args.baselines, args.commit)
+        for name, bundle in recorded['routes'].items():
+            print(f"   {name}: JS {bundle['js_bytes'] / 1024:.1f} KB "
+                  f"({bundle['js_gzip_bytes'] / 1024:.1f} KB gzip), CSS {bundle['css_bytes'] / 1024:.1f} KB")
+        print(f"💾 Bundle baselines saved: {args.baselines}")
+    else:
+        results = pregate(selected, args.next_dir, args.baselines)
+        print_decisions(results)
+        sys.exit(1 if any(d['decision'] == FAIL for d in results) else 0)
@@ -0,0 +1,435 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from dataset_loader import read_dataset
+from features import RAW_METRICS
+from metrics_store import LEGACY_DATASETS
+
+# Change-point detection across commits.
+# The per-sample gate compares each run with a static baseline median, so a slow
+# creep (every commit adds 30 ms, none of them enough on its own) never trips it.
+# Here every recorded run is indexed per series (Dataset, Page_Name, Network_Type,
+# metric), ordered by commit and timestamp, and two online detectors watch each
+# series. Both update in O(1) per sample:
+#   cusum  two-sided tabular CUSUM against a reference learned from the first
+#          WARMUP_SAMPLES (re-learned after every alarm). On an alarm the shift is
+#          dated by the most likely single mean change over the recent samples.
+#   bocpd  Bayesian online change-point detection (Adams & MacKay, 2007), Gaussian
+#          with unknown mean/variance, run length truncated at MAX_RUN_LENGTH. A
+#          change is the start of the most probable run once it has lasted
+#          BOCPD_CONFIRM samples and moved the mean by >= BOCPD_MIN_SHIFT sigma.
+# Each event names the commit of the first sample of the shift. Commits are ordered
+# by their first run's timestamp. Datasets recorded on different machines are
+# separate series and are never compared with each other.
+#
+#   python scripts/change_points.py backfill                  # existing datasets, one pass
+#   python scripts/change_points.py update new_runs.csv --dataset real_validation
+#   python scripts/change_points.py events --metric API_Latency_ms
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+STORE_DIR = os.path.join(PERFORMANCE_APP_DIR, 'change_point_store')
+INDEX_DIR = os.path.join(STORE_DIR, 'index')
+STATE_PATH = os.path.join(STORE_DIR, 'state.npz')
+EVENTS_PATH = os.path.join(STORE_DIR, 'events.csv')
+
+SERIES_KEYS = ['Dataset', 'Page_Name', 'Network_Type', 'Metric']
+# Metrics missing from a dataset (or NaN for a run, e.g. API latency on pages without an API call) are skipped
+TRACKED_METRICS = RAW_METRICS + ['Total_Page_Size_KB', 'TBT_ms', 'CLS', 'INP_ms']
+
+WARMUP_SAMPLES = 30 # Samples that define a series' reference level
+STD_FLOOR_FRACTION = 0.01 # Reference std is at least 1% of the mean (near-constant metrics)
+CUSUM_K = 0.5 # Allowance, in reference standard deviations
+CUSUM_H = 12.0 # Alarm threshold, in reference standard deviations
+HAZARD = 1 / 1000 # BOCPD prior probability of a change at any sample
+MAX_RUN_LENGTH = 256
+BOCPD_CONFIRM = 5
+BOCPD_MIN_SHIFT = 0.5
+# Normal-Gamma prior on standardized values; slot r has kappa = KAPPA0 + r and alpha = ALPHA0 + r/2
+MU0, KAPPA0, ALPHA0, BETA0 = 0.0, 1.0, 1.0, 1.0
+
+EVENT_COLUMNS = ['Dataset', 'Page_Name', 'Network_Type', 'Metric', 'Detector', 'Direction', 'Commit_ID',
+                 'Detected_Commit_ID', 'Start_Position', 'Detected_Position', 'Before', 'After', 'Shift', 'Shift_Pct']
+
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+INDEX_SCHEMA = pa.schema([
+    ('Dataset', DICT_STRING),
+    ('Page_Name', DICT_STRING),
+    ('Network_Type', DICT_STRING),
+    ('Metric', DICT_STRING),
+    ('Commit_ID', DICT_STRING),
+    ('Commit_Seq', pa.int32()),
+    ('Timestamp', pa.timestamp('s')),
+    ('Position', pa.int32()),
+    ('Value', pa.float64()),
+])
+
+_RUN = np.arange(MAX_RUN_LENGTH)
+_KAPPA = KAPPA0 + _RUN
+_ALPHA = ALPHA0 + _RUN / 2
+# Student-t predictive: lgamma((nu + 1) / 2) - lgamma(nu / 2) with nu = 2 * alpha
+_T_LGAMMA = np.array([math.lgamma(a + 0.5) - math.lgamma(a) for a in _ALPHA])
+
+
+def _logsumexp(a, axis=1):
+    peak = a.max(axis=axis, keepdims=True)
+    return (peak + np.log(np.exp(a - peak).sum(axis=axis, keepdims=True))).squeeze(axis)
+
+
+class DetectorBank:
+    """
+    CUSUM and BOCPD state for many series, as arrays indexed by series id.
+    update() takes at most one new sample per series and is vectorized across them,
+    so a backfill is one pass over sample positions and an online update is the same call.
+    """
+
+    SCALARS = {
+        'n': 0, 'w_n': 0, 'w_mean': 0.0, 'w_m2': 0.0, 'ref_mean': np.nan, 'ref_std': np.nan,
+        'scale_mean': np.nan, 'scale_std': np.nan,
+        's_pos': 0.0, 's_neg': 0.0, 'seg_begin': 0, 'run_start': -1, 'seg_mean': 0.0,
+    }
+    MATRICES = {'log_r': -np.inf, 'mu': MU0, 'beta': BETA0, 'ring': -1, 'ring_x': np.nan}
+
+    def __init__(self, arrays=None):
+        if arrays is None:
+            arrays = {name: np.array([], dtype=np.asarray(v).dtype) for name, v in self.SCALARS.items()}
+            arrays.update({name: np.empty((0, MAX_RUN_LENGTH), dtype=np.asarray(v).dtype)
+                           for name, v in self.MATRICES.items()})
+        self.a = arrays
+
+    def __len__(self):
+        return len(self.a['n'])
+
+    def add_series(self, count):
+        for name, value in self.SCALARS.items():
+            self.a[name] = np.concatenate([self.a[name], np.full(count, value, dtype=self.a[name].dtype)])
+        for name, value in self.MATRICES.items():
+            self.a[name] = np.vstack([self.a[name], np.full((count, MAX_RUN_LENGTH), value, dtype=self.a[name].dtype)])
+
+    def update(self, idx, x, commit):
+        """
+        One sample for each series in idx (unique ids). Returns raw events:
+        (series id, detector, direction, start position, start commit, position, commit, before, after).
+        """
+        a = self.a
+        pos = a['n'][idx].copy()
+        a['n'][idx] += 1
+        a['ring'][idx, pos % MAX_RUN_LENGTH] = commit
+        a['ring_x'][idx, pos % MAX_RUN_LENGTH] = x
+        events = []
+
+        ready = a['w_n'][idx] >= WARMUP_SAMPLES
+        self._warmup(idx[~ready], x[~ready], pos[~ready])
+        events += self._cusum(idx[ready], x[ready], pos[ready], commit[ready])
+        scaled = ~np.isnan(a['scale_std'][idx]) & (a['run_start'][idx] <= pos)
+        events += self._bocpd(idx[scaled], x[scaled], pos[scaled], commit[scaled])
+        return events
+
+    def _warmup(self, idx, x, pos):
+        a = self.a
+        a['w_n'][idx] += 1
+        delta = x - a['w_mean'][idx]
+        a['w_mean'][idx] += delta / a['w_n'][idx]
+        a['w_m2'][idx] += delta * (x - a['w_mean'][idx])
+
+        done = a['w_n'][idx] >= WARMUP_SAMPLES
+        idx, pos = idx[done], pos[done]
+        mean = a['w_mean'][idx]
+        std = np.sqrt(a['w_m2'][idx] / (WARMUP_SAMPLES - 1))
+        a['ref_mean'][idx] = mean
+        a['ref_std'][idx] = np.maximum(std, np.maximum(np.abs(mean) * STD_FLOOR_FRACTION, 1e-9))
+
+        # The first reference also fixes the BOCPD scale; its first run starts after the warm-up
+        first = np.isnan(a['scale_std'][idx])
+        idx, pos = idx[first], pos[first]
+        a['scale_mean'][idx] = a['ref_mean'][idx]
+        a['scale_std'][idx] = a['ref_std'][idx]
+        a['log_r'][idx] = -np.inf
+        a['log_r'][idx, 0] = 0.0
+        a['mu'][idx] = MU0
+        a['beta'][idx] = BETA0
+        a['run_start'][idx] = pos + 1
+
+    def _split(self, sid, lo, hi):
+        """
+        Most likely single mean shift among positions lo..hi (the recent values ring):
+        (first position after the shift, mean before, mean after).
+        """
+        lo = max(lo, hi - MAX_RUN_LENGTH + 1)
+        values = self.a['ring_x'][sid, np.arange(lo, hi + 1) % MAX_RUN_LENGTH]
+        n = len(values)
+        k = np.arange(1, n)
+        before = np.cumsum(values)[:-1] / k
+        after = (values.sum() - before * k) / (n - k)
+        best = int(np.argmax(k * (n - k) / n * (after - before) ** 2))
+        return lo + best + 1, before[best], after[best]
+
+    def _cusum(self, idx, x, pos, commit):
+        a = self.a
+        z = (x - a['ref_mean'][idx]) / a['ref_std'][idx]
+        a['s_pos'][idx] = np.maximum(0.0, a['s_pos'][idx] + z - CUSUM_K)
+        a['s_neg'][idx] = np.maximum(0.0, a['s_neg'][idx] - z - CUSUM_K)
+
+        events = []
+        for i in np.flatnonzero((a['s_pos'][idx] > CUSUM_H) | (a['s_neg'][idx] > CUSUM_H)):
+            sid = idx[i]
+            start, before, after = self._split(sid, a['seg_begin'][sid], pos[i])
+            direction = 'up' if a['s_pos'][sid] > CUSUM_H else 'down'
+            events.append((sid, 'cusum', direction, start, a['ring'][sid, start % MAX_RUN_LENGTH],
+                           pos[i], commit[i], before, after))
+            # Restart both sides; the reference is re-learned on the new level
+            a['seg_begin'][sid] = start
+            a['s_pos'][sid] = a['s_neg'][sid] = 0.0
+            a['w_n'][sid], a['w_mean'][sid], a['w_m2'][sid] = 0, 0.0, 0.0
+        return events
+
+    def _bocpd(self, idx, x, pos, commit):
+        a = self.a
+        xs = ((x - a['scale_mean'][idx]) / a['scale_std'][idx])[:, None]
+        mu, beta = a['mu'][idx], a['beta'][idx]
+
+        # Student-t predictive of x under each run length
+        nu = 2 * _ALPHA
+        var = beta * (_KAPPA + 1) / (_ALPHA * _KAPPA)
+        log_pred = _T_LGAMMA - 0.5 * np.log(np.pi * nu * var) - (nu + 1) / 2 * np.log1p((xs - mu) ** 2 / (nu * var))
+
+        joint = a['log_r'][idx] + log_pred
+        growth = joint + math.log(1 - HAZARD)
+        log_r = np.empty_like(joint)
+        log_r[:, 0] = _logsumexp(joint + math.log(HAZARD))
+        log_r[:, 1:] = growth[:, :-1]
+        log_r[:, -1] = np.logaddexp(growth[:, -2], growth[:, -1]) # Truncation: the oldest run folds into the last slot
+        log_r -= _logsumexp(log_r)[:, None]
+
+        # Posterior of each run after x; slot 0 is a run starting after x (prior)
+        new_mu, new_beta = np.empty_like(mu), np.empty_like(beta)
+        new_mu[:, 0], new_beta[:, 0] = MU0, BETA0
+        new_mu[:, 1:] = ((_KAPPA * mu + xs) / (_KAPPA + 1))[:, :-1]
+        new_beta[:, 1:] = (beta + _KAPPA * (xs - mu) ** 2 / (2 * (_KAPPA + 1)))[:, :-1]
+        a['log_r'][idx], a['mu'][idx], a['beta'][idx] = log_r, new_mu, new_beta
+
+        r_map = log_r.argmax(axis=1)
+        start = pos - r_map + 1
+        run_mean = new_mu[np.arange(len(idx)), r_map]
+
+        # Still the current segment (or a saturated run drifting forward): track its mean
+        current = (start <= a['run_start'][idx]) | (r_map == MAX_RUN_LENGTH - 1)
+        a['run_start'][idx[current]] = np.maximum(a['run_start'][idx[current]], start[current])
+        a['seg_mean'][idx[current]] = run_mean[current]
+
+        shift = run_mean - a['seg_mean'][idx]
+        changed = ~current & (r_map >= BOCPD_CONFIRM) & (np.abs(shift) >= BOCPD_MIN_SHIFT)
+        events = []
+        for i in np.flatnonzero(changed):
+            sid = idx[i]
+            scale_mean, scale_std = a['scale_mean'][sid], a['scale_std'][sid]
+            events.append((sid, 'bocpd', 'up' if shift[i] > 0 else 'down', start[i],
+                           a['ring'][sid, start[i] % MAX_RUN_LENGTH], pos[i], commit[i],
+                           scale_mean + a['seg_mean'][sid] * scale_std, scale_mean + run_mean[i] * scale_std))
+        a['run_start'][idx[changed]] = start[changed]
+        a['seg_mean'][idx[changed]] = run_mean[changed]
+        return events
+
+
+class ChangePointIndex:
+    """Series/commit registry plus the detector bank; persisted as one .npz file."""
+
+    def __init__(self, series=None, commits=None, bank=None):
+        self.series = series or [] # [(dataset, page, network, metric)]
+        self.series_ids = {key: i for i, key in enumerate(self.series)}
+        self.commits = commits or [] # Commit_IDs in commit order
+        self.commit_seq = {commit: i for i, commit in enumerate(self.commits)}
+        self.bank = bank or DetectorBank()
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as f:
+            meta = json.loads(str(f['meta']))
+            arrays = {name: f[name] for name in f.files if name != 'meta'}
+        return cls([tuple(key) for key in meta['series']], meta['commits'], DetectorBank(arrays))
+
+    def save(self, path=STATE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = json.dumps({'series': self.series, 'commits': self.commits})
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, meta=np.array(meta), **self.bank.a)
+        os.replace(tmp_path, path)
+
+    def series_frame(self, df, dataset):
+        """Long format (one row per run and tracked metric) with series ids, commit order and positions."""
+        df = df.copy()
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+        df['Commit_ID'] = df['Commit_ID'].astype(str)
+
+        # New commits are appended in order of their first run
+        first_seen = df.groupby('Commit_ID')['Timestamp'].min().sort_values(kind='stable')
+        for commit in first_seen.index:
+            if commit not in self.commit_seq:
+                self.commit_seq[commit] = len(self.commits)
+                self.commits.append(commit)
+
+        metrics = [m for m in TRACKED_METRICS if m in df.columns]
+        long = df.melt(id_vars=['Page_Name', 'Network_Type', 'Commit_ID', 'Timestamp'], value_vars=metrics,
+                       var_name='Metric', value_name='Value').dropna(subset=['Value'])
+        long['Dataset'] = dataset
+        long['Page_Name'] = long['Page_Name'].astype(str)
+        long['Network_Type'] = long['Network_Type'].astype(str)
+        long['Value'] = long['Value'].astype(float)
+        long['Commit_Seq'] = long['Commit_ID'].map(self.commit_seq).astype('int32')
+
+        keys = list(long[SERIES_KEYS].drop_duplicates().itertuples(index=False, name=None))
+        new_keys = [key for key in keys if key not in self.series_ids]
+        for key in new_keys:
+            self.series_ids[key] = len(self.series)
+            self.series.append(key)
+        self.bank.add_series(len(new_keys))
+
+        series_ids = pd.MultiIndex.from_tuples(self.series, names=SERIES_KEYS)
+        long['Series'] = series_ids.get_indexer(pd.MultiIndex.from_frame(long[SERIES_KEYS]))
+        long = long.sort_values(['Series', 'Commit_Seq', 'Timestamp'], kind='stable')
+        long['Position'] = (long.groupby('Series').cumcount().to_numpy()
+                            + self.bank.a['n'][long['Series'].to_numpy()]).astype('int32')
+        return long.reset_index(drop=True)
+
+    def run(self, long):
+        """Feed samples position by position (vectorized across series). Returns an events frame."""
+        order = np.lexsort((long['Series'].to_numpy(), long['Position'].to_numpy()))
+        series = long['Series'].to_numpy()[order]
+        values = long['Value'].to_numpy()[order]
+        commits = long['Commit_Seq'].to_numpy()[order]
+        _, bounds = np.unique(long['Position'].to_numpy()[order], return_index=True)
+
+        raw = []
+        for lo, hi in zip(bounds, list(bounds[1:]) + [len(order)]):
+            raw += self.bank.update(series[lo:hi], values[lo:hi], commits[lo:hi])
+        return self.events_frame(raw)
+
+    def events_frame(self, raw):
+        rows = []
+        for sid, detector, direction, start, start_commit, position, commit, before, after in raw:
+            dataset, page, network, metric = self.series[sid]
+            rows.append({
+                'Dataset': dataset, 'Page_Name': page, 'Network_Type': network, 'Metric': metric,
+                'Detector': detector, 'Direction': direction,
+                'Commit_ID': self.commits[start_commit], 'Detected_Commit_ID': self.commits[commit],
+                'Start_Position': int(start), 'Detected_Position': int(position),
+                'Before': round(float(before), 3), 'After': round(float(after), 3),
+                'Shift': round(float(after - before), 3),
+                'Shift_Pct': round(float((after - before) / before * 100), 1) if before else None,
+            })
+        return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+
+def append_index(long, store_dir=INDEX_DIR):
+    table = pa.Table.from_pandas(long[INDEX_SCHEMA.names], schema=INDEX_SCHEMA, preserve_index=False)
+    ds.write_dataset(
+        table,
+        store_dir,
+        format='parquet',
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return table.num_rows
+
+
+def load_series(dataset, page, network, metric, store_dir=INDEX_DIR):
+    """One series from the index, in commit/timestamp order."""
+    expr = ((ds.field('Dataset') == dataset) & (ds.field('Page_Name') == page)
+            & (ds.field('Network_Type') == network) & (ds.field('Metric') == metric))
+    df = ds.dataset(store_dir, format='parquet', schema=INDEX_SCHEMA).to_table(filter=expr).to_pandas()
+    return df.sort_values('Position').reset_index(drop=True)
+
+
+def append_events(events, path=EVENTS_PATH):
+    if not events.empty:
+        events.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def load_events(path=EVENTS_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    return pd.read_csv(path)
+
+
+def ingest(index, frames, store_dir=STORE_DIR):
+    """Index and run detectors over {dataset: frame}; persists index, state and events."""
+    longs = [index.series_frame(df, dataset) for dataset, df in frames.items()]
+    long = pd.concat(longs, ignore_index=True)
+    events = index.run(long)
+    append_index(long, os.path.join(store_dir, 'index'))
+    index.save(os.path.join(store_dir, 'state.npz'))
+    append_events(events, os.path.join(store_dir, 'events.csv'))
+    return long, events
+
+
+def backfill(datasets=LEGACY_DATASETS, store_dir=STORE_DIR):
+    """Rebuild the index and detector state from the full history in one pass."""
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    frames = {name: read_dataset(path) for name, path in datasets.items() if os.path.exists(path)}
+    return ingest(ChangePointIndex(), frames, store_dir)
+
+
+def print_events(events, title):
+    if events.empty:
+        print(f"✅ {title}: no change points.")
+        return
+    print(f"📈 {title}: {len(events)} change point(s)")
+    for row in events.itertuples():
+        icon = '🔺' if row.Direction == 'up' else '🔻'
+        pct = f" ({row.Shift_Pct:+.1f}%)" if pd.notna(row.Shift_Pct) else ""
+        print(f"   {icon} [{row.Detector}] {row.Dataset} {row.Page_Name}/{row.Network_Type} {row.Metric}: "
+              f"{row.Before:.1f} -> {row.After:.1f}{pct}, began at commit {row.Commit_ID} "
+              f"(detected at {row.Detected_Commit_ID}, {row.Detected_Position - row.Start_Position + 1} samples later)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-series change-point detection across commits")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("backfill", help="Rebuild index and detectors from the existing datasets")
+
+    update = sub.add_parser("update", help="Feed new runs to the detectors")
+    update.add_argument("csv")
+    update.add_argument("--dataset", required=True, help="Dataset label, e.g. real_validation")
+    update.add_argument("--fail-on-change", action="store_true", help="Exit 1 when a new change point is found")
+
+    events_cmd = sub.add_parser("events", help="Print recorded change points")
+    for flag in ("dataset", "page", "network", "metric", "detector", "commit"):
+        events_cmd.add_argument(f"--{flag}")
+
+    parser.add_argument("--store", default=STORE_DIR, help="Store directory")
+
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        long, events = backfill(store_dir=args.store)
+        print(f"✅ Indexed {len(long):,} samples in {long['Series'].nunique()} series.")
+        print_events(events, "Backfill")
+    elif args.command == "update":
+        index = ChangePointIndex.load(os.path.join(args.store, 'state.npz'))
+        long, events = ingest(index, {args.dataset: read_dataset(args.csv)}, args.store)
+        print(f"✅ Ingested {len(long):,} samples.")
+        print_events(events, "Update")
+        sys.exit(1 if args.fail_on_change and not events.empty else 0)
+    else:
+        events = load_events(os.path.join(args.store, 'events.csv'))
+        for column, value in {'Dataset': args.dataset, 'Page_Name': args.page, 'Network_Type': args.network,
+                              'Metric': args.metric, 'Detector': args.detector, 'Commit_ID': args.commit}.items():
+            if value is not None:
+                events = events[events[column] == value]
+        print_events(events, "Recorded")
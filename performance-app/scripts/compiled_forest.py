@@ -0,0 +1,261 @@
+import json
+import os
+import time
+import argparse
+
+import numpy as np
+
+# Array-backed export of the trained Pipeline(ColumnTransformer -> RandomForestClassifier).
+# The scaler, one-hot encoder and every tree are flattened into a single .npz of
+# node arrays, evaluated with NumPy only (no sklearn/pandas import, no pickle):
+#   feature[n]   split feature index, -1 for leaves
+#   threshold[n] split threshold (x <= threshold goes left)
+#   left[n], right[n]  global child node indices
+#   proba[n]     P(Is_Regression=1) at the node (used at leaves)
+#   roots[t]     first node of tree t
+#
+#   python scripts/compiled_forest.py export    # after train_final_model.py
+#   python scripts/compiled_forest.py verify    # compare with sklearn predict_proba
+# train_final_model.py / incremental_update.py export it next to the pickle;
+# validate_model.py --compiled and scoring_server.py --compiled score with it.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+MODEL_DIR = os.path.join(PERFORMANCE_APP_DIR, 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.pkl')
+COMPILED_MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.npz')
+VALIDATION_FILE = os.path.join(PERFORMANCE_APP_DIR, 'real_validation_data.csv')
+
+FORMAT_VERSION = 1
+BATCH_ROWS = 4096 # Rows traversed at once; bounds the (rows x trees) working set
+
+
+def compile_pipeline(pipeline):
+    """Flatten a fitted pipeline into plain NumPy arrays plus a JSON metadata string."""
+    preprocessor = pipeline.named_steps['preprocessor']
+    classifier = pipeline.named_steps['classifier']
+    transformers = {name: (est, list(cols)) for name, est, cols in preprocessor.transformers_}
+    scaler, numeric_features = transformers['num']
+    encoder, categorical_features = transformers['cat']
+
+    if list(classifier.classes_) != [0, 1]:
+        raise ValueError(f"Expected binary classes [0, 1], got {list(classifier.classes_)}")
+
+    features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in classifier.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        values = tree.value[:, 0, :2]
+        normalizer = values.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, -1, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        probas.append(values[:, 1] / normalizer)
+        offset += tree.node_count
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'numeric_features': numeric_features,
+        'categorical_features': categorical_features,
+        'categories': [[str(c) for c in cats] for cats in encoder.categories_],
+        'n_trees': len(roots),
+        'max_depth': int(max(est.tree_.max_depth for est in classifier.estimators_)),
+    }
+    n_features = len(numeric_features) + sum(len(c) for c in meta['categories'])
+    index_dtype = np.int16 if n_features < 2 ** 15 else np.int32
+
+    return {
+        'meta': np.array(json.dumps(meta)),
+        'mean': np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(len(numeric_features)), dtype=np.float64),
+        'scale': np.asarray(scaler.scale_ if scaler.with_std else np.ones(len(numeric_features)), dtype=np.float64),
+        'feature': np.concatenate(features).astype(index_dtype),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'proba': np.concatenate(probas).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }
+
+
+def export_compiled_model(pipeline, path=COMPILED_MODEL_PATH):
+    np.savez_compressed(path, **compile_pipeline(pipeline))
+    return path
+
+
+class CompiledForest:
+    """Pure-NumPy evaluator for an exported pipeline; predict_proba matches sklearn's."""
+
+    def __init__(self, arrays):
+        self.meta = json.loads(str(arrays['meta']))
+        if self.meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format {self.meta['format_version']}")
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+        self.feature = arrays['feature'].astype(np.intp)
+        self.threshold = arrays['threshold']
+        self.left = arrays['left'].astype(np.intp)
+        self.right = arrays['right'].astype(np.intp)
+        self.proba = arrays['proba']
+        self.roots = arrays['roots'].astype(np.intp)
+        self.categories = [np.asarray(c, dtype=object) for c in self.meta['categories']]
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    @property
+    def features(self):
+        """(numeric, categorical) input columns, as features.model_features gives for the pipeline."""
+        return list(self.meta['numeric_features']), list(self.meta['categorical_features'])
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def transform(self, numeric, categorical):
+        """
+        Apply StandardScaler + OneHotEncoder(handle_unknown='ignore').
+        numeric: (n, len(numeric_features)); categorical: (n, len(categorical_features)).
+        """
+        numeric = np.asarray(numeric, dtype=np.float64)
+        categorical = np.asarray(categorical, dtype=object).reshape(len(numeric), -1)
+        blocks = [(numeric - self.mean) / self.scale]
+        for j, cats in enumerate(self.categories):
+            blocks.append((categorical[:, j:j + 1] == cats[None, :]).astype(np.float64))
+        # sklearn's forest evaluates on float32 inputs against float64 thresholds
+        return np.hstack(blocks).astype(np.float32).astype(np.float64)
+
+    def _leaf_nodes(self, X):
+        n = len(X)
+        node = np.repeat(self.roots[None, :], n, axis=0)
+        rows = np.arange(n)[:, None]
+        for _ in range(self.meta['max_depth']):
+            feat = self.feature[node]
+            active = feat >= 0
+            if not active.any():
+                break
+            go_left = X[rows, np.where(active, feat, 0)] <= self.threshold[node]
+            node = np.where(active, np.where(go_left, self.left[node], self.right[node]), node)
+        return node
+
+    def predict_proba_transformed(self, X):
+        out = np.empty(len(X))
+        for start in range(0, len(X), BATCH_ROWS):
+            batch = X[start:start + BATCH_ROWS]
+            out[start:start + BATCH_ROWS] = self.proba[self._leaf_nodes(batch)].mean(axis=1)
+        return np.column_stack([1.0 - out, out])
+
+    def predict_proba(self, frame):
+        """Same contract as Pipeline.predict_proba for a frame with the training feature columns."""
+        numeric = np.column_stack([np.asarray(frame[col], dtype=np.float64) for col in self.meta['numeric_features']])
+        categorical = np.column_stack([np.asarray(frame[col], dtype=object) for col in self.meta['categorical_features']])
+        return self.predict_proba_transformed(self.transform(numeric, categorical))
+
+
+def load_model(model_path=MODEL_PATH, compiled_path=COMPILED_MODEL_PATH, compiled=False):
+    """
+    The model to score with. With `compiled`, the CompiledForest (no sklearn import,
+    no pickle) unless the .npz is missing, unreadable or not from the build in
+    models/build_manifest.json; then, and without `compiled`, the pickled pipeline.
+    Both have the same predict_proba(frame) contract.
+    """
+    if compiled:
+        from artifact_cache import verify_compiled
+        try:
+            same_build, message = verify_compiled(compiled_path)
+            if same_build is False:
+                raise ValueError(message)
+            return CompiledForest.load(compiled_path)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Compiled model unavailable ({e}); falling back to the pickled pipeline.")
+    import joblib
+    return joblib.load(model_path)
+
+
+def _validation_features():
+    import joblib
+    from dataset_loader import read_dataset
+    from features import add_delta_features, prepare_raw_metrics
+
+    df = read_dataset(VALIDATION_FILE)
+    prepare_raw_metrics(df)
+    add_delta_features(df, joblib.load(os.path.join(MODEL_DIR, 'baseline_stats.pkl')))
+    return df
+
+
+def verify(model_path=MODEL_PATH, compiled_path=COMPILED_MODEL_PATH):
+    import joblib
+
+    X = _validation_features()
+    forest = CompiledForest.load(compiled_path)
+    X = X[forest.meta['numeric_features'] + forest.meta['categorical_features']]
+    expected = joblib.load(model_path).predict_proba(X)
+    actual = forest.predict_proba(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    status = "✅" if max_diff < 1e-9 else "❌"
+    print(f"{status} Max |predict_proba diff| over {len(X)} rows: {max_diff:.3e}")
+    return max_diff
+
+
+def benchmark(model_path=MODEL_PATH, compiled_path=COMPILED_MODEL_PATH, repeats=200):
+    """Artifact size, cold load and per-row latency: pickle + sklearn vs. compiled arrays."""
+    start = time.perf_counter()
+    forest = CompiledForest.load(compiled_path)
+    compiled_load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import joblib
+    pipeline = joblib.load(model_path)
+    pickle_load_s = time.perf_counter() - start
+    pipeline.named_steps['classifier'].n_jobs = 1
+
+    X = _validation_features()[forest.meta['numeric_features'] + forest.meta['categorical_features']]
+    Z = forest.transform(
+        np.column_stack([X[c].to_numpy(dtype=np.float64) for c in forest.meta['numeric_features']]),
+        np.column_stack([X[c].to_numpy(dtype=object) for c in forest.meta['categorical_features']]),
+    )
+
+    def per_row(fn):
+        samples = []
+        for i in range(repeats):
+            t = time.perf_counter()
+            fn(i % len(X))
+            samples.append(time.perf_counter() - t)
+        return np.percentile(samples, [50, 99]) * 1e6
+
+    sk_us = per_row(lambda i: pipeline.predict_proba(X.iloc[i:i + 1]))
+    cf_us = per_row(lambda i: forest.predict_proba_transformed(Z[i:i + 1]))
+
+    start = time.perf_counter()
+    forest.predict_proba_transformed(Z)
+    batch_us = (time.perf_counter() - start) / len(Z) * 1e6
+
+    print(f"Artifact size:  pickle {os.path.getsize(model_path) / 1024:8.1f} KB | compiled {os.path.getsize(compiled_path) / 1024:8.1f} KB")
+    print(f"Cold load:      pickle {pickle_load_s:8.3f} s  | compiled {compiled_load_s:8.3f} s  (pickle time includes importing sklearn)")
+    print(f"Per-row p50/99: sklearn {sk_us[0]:8.0f}/{sk_us[1]:.0f} us | compiled {cf_us[0]:8.0f}/{cf_us[1]:.0f} us")
+    print(f"Batched ({len(Z)} rows): compiled {batch_us:.1f} us/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and evaluate the array-backed forest")
+    parser.add_argument("command", choices=["export", "verify", "bench"])
+    parser.add_argument("--model", default=MODEL_PATH, help="Fitted pipeline (.pkl)")
+    parser.add_argument("--compiled", default=COMPILED_MODEL_PATH, help="Compiled model (.npz)")
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import joblib
+        path = export_compiled_model(joblib.load(args.model), args.compiled)
+        print(f"💾 Compiled Model Saved: {path} ({os.path.getsize(path) / 1024:.1f} KB)")
+    elif args.command == "verify":
+        verify(args.model, args.compiled)
+    else:
+        benchmark(args.model, args.compiled)
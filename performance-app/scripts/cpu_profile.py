@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import base64
+import bisect
+import json
+import os
+import re
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+from web_vitals import COLLECT_SCRIPT, COLLECTOR_SCRIPT, collect_args
+
+# CPU profile + trace capture for failed gate runs (measure_performance.py --profile-on-failure).
+# The route is reloaded once in a fresh browser with the CDP Profiler and Chrome
+# tracing enabled; nothing here runs on passing builds. Output, per failure:
+#   profiles/<time>_<route>/profile.cpuprofile   (open in DevTools > Performance)
+#   profiles/<time>_<route>/trace.json           (chrome://tracing / Perfetto)
+#   profiles/<time>_<route>/summary.json         (hot functions + long tasks below)
+# Hot functions are ranked by self time from the sampled profile. Each main-thread
+# long task (> 50ms RunTask in the trace) is attributed to the function with the
+# most samples inside it. Locations are mapped through source maps when the
+# script has one, so webpack/turbopack chunks resolve to e.g. src/components/HeavyClient.tsx:10.
+#   python scripts/cpu_profile.py http://localhost:3000/
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+PROFILE_DIR = os.path.join(PERFORMANCE_APP_DIR, 'profiles')
+SAMPLING_INTERVAL_US = 100
+LONG_TASK_MS = 50
+TOP_FUNCTIONS = 15
+TRACE_CATEGORIES = ['devtools.timeline', 'disabled-by-default-devtools.timeline', 'v8.execute']
+# Profile nodes that are not JS functions
+SYNTHETIC_FUNCTIONS = {'(root)', '(program)', '(idle)', '(garbage collector)'}
+FETCH_TIMEOUT_S = 5
+
+
+# --- Source maps -----------------------------------------------------------
+
+_B64 = {c: i for i, c in enumerate('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/')}
+
+
+def _decode_vlq(segment):
+    values, shift, value = [], 0, 0
+    for ch in segment:
+        digit = _B64[ch]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            shift = value = 0
+    return values
+
+
+class SourceMap:
+    """Minimal source map v3 reader (including sectioned/index maps): generated -> original position."""
+
+    def __init__(self, data):
+        self.sections = None
+        if 'sections' in data:
+            self.sections = [((s['offset']['line'], s['offset']['column']), SourceMap(s['map'])) for s in data['sections']]
+            return
+        self.sources = data.get('sources', [])
+        self.lines = [] # per generated line: sorted [(gen_col, source_idx, orig_line, orig_col)]
+        src = orig_line = orig_col = 0
+        for line in data.get('mappings', '').split(';'):
+            segments = []
+            gen_col = 0
+            for segment in filter(None, line.split(',')):
+                fields = _decode_vlq(segment)
+                gen_col += fields[0]
+                if len(fields) >= 4:
+                    src += fields[1]
+                    orig_line += fields[2]
+                    orig_col += fields[3]
+                    segments.append((gen_col, src, orig_line, orig_col))
+            self.lines.append(segments)
+
+    def original(self, line, column):
+        """0-based generated (line, column) -> (source, 1-based line) or None."""
+        if self.sections is not None:
+            offsets = [offset for offset, _ in self.sections]
+            i = bisect.bisect_right(offsets, (line, column)) - 1
+            if i < 0:
+                return None
+            (off_line, off_col), section = self.sections[i]
+            return section.original(line - off_line, column - off_col if line == off_line else column)
+        if line >= len(self.lines) or not self.lines[line]:
+            return None
+        segments = self.lines[line]
+        i = bisect.bisect_right([s[0] for s in segments], column) - 1
+        _, src, orig_line, _ = segments[max(i, 0)]
+        return self.sources[src] if src < len(self.sources) else None, orig_line + 1
+
+
+def _fetch_text(url):
+    with urllib.request.urlopen(url, timeout=FETCH_TIMEOUT_S) as response:
+        return response.read().decode('utf-8', errors='replace')
+
+
+class SourceResolver:
+    """Caches one source map per script URL; unresolvable scripts keep their generated location."""
+
+    def __init__(self):
+        self.maps = {}
+
+    def _load(self, url):
+        if url in self.maps:
+            return self.maps[url]
+        smap = None
+        if url.startswith(('http://', 'https://')):
+            try:
+                match = re.findall(r'[#@] sourceMappingURL=(\S+)', _fetch_text(url))
+                if match:
+                    ref = match[-1]
+                    if ref.startswith('data:'):
+                        text = base64.b64decode(ref.split(',', 1)[1]).decode('utf-8')
+                    else:
+                        text = _fetch_text(urllib.parse.urljoin(url, ref))
+                    smap = SourceMap(json.loads(text))
+            except (OSError, ValueError, KeyError, IndexError):
+                smap = None
+        self.maps[url] = smap
+        return smap
+
+    def location(self, url, line, column):
+        """'source:line' for a 0-based generated position."""
+        smap = self._load(url) if url else None
+        original = smap.original(line, column) if smap else None
+        if original and original[0]:
+            source = re.sub(r'^(?:webpack://[^/]*/|turbopack:///\[project\]/|\./)+', '', original[0])
+            return f"{source}:{original[1]}"
+        return f"{url or '(native)'}:{line + 1}:{column + 1}"
+
+
+# --- Profile / trace analysis ---------------------------------------------
+
+def _sample_times_us(profile):
+    times, t = [], profile['startTime']
+    for delta in profile.get('timeDeltas', []):
+        t += delta
+        times.append(t)
+    return times
+
+
+def _sample_weights_ms(profile):
+    """Time attributed to each sample: the gap until the next sample."""
+    times = _sample_times_us(profile)
+    ends = times[1:] + [profile['endTime']]
+    return [max(0, end - start) / 1000 for start, end in zip(times, ends)]
+
+
+def _function_key(node):
+    frame = node['callFrame']
+    return frame['functionName'] or '(anonymous)', frame['url'], frame['lineNumber'], frame['columnNumber']
+
+
+def hot_functions(profile, top=TOP_FUNCTIONS):
+    """[(key, self_ms, total_ms)] for the top JS functions by self time."""
+    nodes = {node['id']: node for node in profile['nodes']}
+    parent = {child: node['id'] for node in profile['nodes'] for child in node.get('children', [])}
+
+    self_ms = defaultdict(float)
+    total_ms = defaultdict(float)
+    for node_id, weight in zip(profile.get('samples', []), _sample_weights_ms(profile)):
+        node = nodes[node_id]
+        if node['callFrame']['functionName'] in SYNTHETIC_FUNCTIONS:
+            continue
+        self_ms[_function_key(node)] += weight
+        # Inclusive time: credit each distinct function on the stack once (recursion-safe)
+        seen = set()
+        while node_id is not None:
+            key = _function_key(nodes[node_id])
+            if key not in seen and nodes[node_id]['callFrame']['functionName'] not in SYNTHETIC_FUNCTIONS:
+                total_ms[key] += weight
+                seen.add(key)
+            node_id = parent.get(node_id)
+
+    ranked = sorted(self_ms.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(key, ms, total_ms[key]) for key, ms in ranked]
+
+
+def main_thread_long_tasks(trace_events, min_ms=LONG_TASK_MS):
+    """RunTask events on the renderer main thread longer than min_ms: [(ts_us, dur_ms)]."""
+    main_threads = {
+        (e['pid'], e['tid']) for e in trace_events
+        if e.get('ph') == 'M' and e.get('name') == 'thread_name' and e.get('args', {}).get('name') == 'CrRendererMain'
+    }
+    tasks = [
+        (e['ts'], e['dur'] / 1000) for e in trace_events
+        if e.get('ph') == 'X' and e.get('name') == 'RunTask' and (e['pid'], e['tid']) in main_threads
+        and e.get('dur', 0) / 1000 >= min_ms
+    ]
+    return sorted(tasks)
+
+
+def attribute_long_tasks(tasks, profile):
+    """For each long task, the function with the most self samples inside its window."""
+    nodes = {node['id']: node for node in profile['nodes']}
+    times = _sample_times_us(profile)
+    weights = _sample_weights_ms(profile)
+    samples = profile.get('samples', [])
+    attributed = []
+    for ts, dur_ms in tasks:
+        lo = bisect.bisect_left(times, ts)
+        hi = bisect.bisect_right(times, ts + dur_ms * 1000)
+        by_function = defaultdict(float)
+        for i in range(lo, hi):
+            node = nodes[samples[i]]
+            if node['callFrame']['functionName'] not in SYNTHETIC_FUNCTIONS:
+                by_function[_function_key(node)] += weights[i]
+        top = max(by_function.items(), key=lambda item: item[1]) if by_function else (None, 0.0)
+        attributed.append((ts, dur_ms, top[0], top[1]))
+    return attributed
+
+
+def summarize(profile, trace_events, resolver=None, top=TOP_FUNCTIONS):
+    resolver = resolver or SourceResolver()
+
+    def describe(key):
+        name, url, line, column = key
+        return {'function': name, 'location': resolver.location(url, line, column)}
+
+    start_us = profile['startTime']
+    return {
+        'hot_functions': [
+            {**describe(key), 'self_ms': round(self_ms, 2), 'total_ms': round(total, 2)}
+            for key, self_ms, total in hot_functions(profile, top)
+        ],
+        'long_tasks': [
+            {'start_ms': round((ts - start_us) / 1000, 1), 'duration_ms': round(dur_ms, 1),
+             'blocking_ms': round(max(0.0, dur_ms - LONG_TASK_MS), 1),
+             **(describe(key) if key else {'function': None, 'location': None}),
+             'function_ms': round(fn_ms, 1)}
+            for ts, dur_ms, key, fn_ms in attribute_long_tasks(main_thread_long_tasks(trace_events), profile)
+        ],
+    }
+
+
+def print_summary(summary):
+    print("🔥 Hottest JS functions (self time):")
+    for i, fn in enumerate(summary['hot_functions'], start=1):
+        print(f"   {i:>2}. {fn['self_ms']:8.1f}ms self / {fn['total_ms']:8.1f}ms total  {fn['function']}  ({fn['location']})")
+    if summary['long_tasks']:
+        print(f"🧱 Long tasks on the main thread (> {LONG_TASK_MS}ms):")
+        for task in sorted(summary['long_tasks'], key=lambda t: t['duration_ms'], reverse=True):
+            print(f"   {task['duration_ms']:8.1f}ms @ {task['start_ms']:.0f}ms  -> {task['function']} ({task['location']}, "
+                  f"{task['function_ms']:.0f}ms sampled)")
+    else:
+        print("🧱 No main-thread long tasks.")
+
+
+# --- Capture ----------------------------------------------------------------
+
+async def capture_profile(browser, url, out_dir):
+    """Reload url in a new context with Profiler + tracing on; returns (profile, trace_events, vitals)."""
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        await page.add_init_script(COLLECTOR_SCRIPT)
+        cdp = await context.new_cdp_session(page)
+        await cdp.send('Profiler.enable')
+        await cdp.send('Profiler.setSamplingInterval', {'interval': SAMPLING_INTERVAL_US})
+
+        trace_path = os.path.join(out_dir, 'trace.json')
+        await browser.start_tracing(page=page, path=trace_path, categories=TRACE_CATEGORIES)
+        await cdp.send('Profiler.start')
+        try:
+            await page.goto(url, wait_until='load')
+            vitals = await page.evaluate(COLLECT_SCRIPT, collect_args())
+        finally:
+            profile = (await cdp.send('Profiler.stop'))['profile']
+            await browser.stop_tracing()
+    finally:
+        await context.close()
+
+    with open(trace_path, encoding='utf-8') as f:
+        trace = json.load(f)
+    trace_events = trace['traceEvents'] if isinstance(trace, dict) else trace
+    with open(os.path.join(out_dir, 'profile.cpuprofile'), 'w', encoding='utf-8') as f:
+        json.dump(profile, f)
+    return profile, trace_events, vitals
+
+
+def profile_dir_for(url, root=PROFILE_DIR):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', urllib.parse.urlparse(url).path).strip('_') or 'root'
+    path = os.path.join(root, f"{datetime.now():%Y%m%d_%H%M%S}_{slug}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+async def profile_url(url, show_ui=False, root=PROFILE_DIR):
+    """Failure-path entry point: capture, summarize and save. Returns the summary dict."""
+    from playwright.async_api import async_playwright
+
+    out_dir = profile_dir_for(url, root)
+    print(f"🔬 Profiling {url} (CPU profile + trace)...")
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not show_ui)
+        try:
+            profile, trace_events, vitals = await capture_profile(browser, url, out_dir)
+        finally:
+            await browser.close()
+
+    summary = await asyncio.to_thread(summarize, profile, trace_events)
+    summary['url'] = url
+    summary['vitals'] = {k: vitals[k] for k in ('lcp_ms', 'tbt_ms', 'cls', 'long_tasks', 'api_duration_ms')}
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    print_summary(summary)
+    print(f"💾 Profile saved: {out_dir}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture and summarize a CPU profile + trace for one URL")
+    parser.add_argument("url")
+    parser.add_argument("--headed", action="store_true")
+    parser.add_argument("--out", default=PROFILE_DIR, help="Root directory for profile output")
+    parser.add_argument("--summarize", metavar="DIR", help="Re-summarize a saved profile directory instead of capturing")
+
+    args = parser.parse_args()
+
+    if args.summarize:
+        with open(os.path.join(args.summarize, 'profile.cpuprofile'), encoding='utf-8') as f:
+            saved_profile = json.load(f)
+        with open(os.path.join(args.summarize, 'trace.json'), encoding='utf-8') as f:
+            saved_trace = json.load(f)
+        print_summary(summarize(saved_profile, saved_trace['traceEvents'] if isinstance(saved_trace, dict) else saved_trace))
+    else:
+        asyncio.run(profile_url(args.url, args.headed, args.out))
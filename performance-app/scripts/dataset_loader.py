@@ -0,0 +1,63 @@
+# Typed CSV loading shared by the training/validation/scoring scripts.
+# The defaults of pd.read_csv cost several times the memory the data needs:
+# every string column becomes Python objects (Page_Name, Network_Type, Scenario
+# and Commit_ID have a handful of distinct values) and every metric float64.
+# DATASET_DTYPES instead reads them as categoricals, float32 metrics and int8
+# flags, and Timestamp as datetime64. `columns` projects at parse time (usecols),
+# so unused columns are never materialized; columns missing from an older file
+# are skipped rather than failing.
+#   df = read_dataset(path, columns=BASELINE_COLUMNS)
+#   for chunk in iter_dataset(path, chunk_rows=1_000_000): ...   # history bigger than RAM
+# Chunks are typed the same way, but each chunk's categoricals only know the
+# categories seen in that chunk; compare by value, not by category code.
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+CATEGORY_COLUMNS = ['Page_Name', 'Network_Type', 'Scenario', 'Commit_ID']
+METRIC_COLUMNS = [
+    'Page_Load_Time_ms', 'Perceived_Load_Time_ms', 'LCP_ms', 'API_Latency_ms', 'Total_Page_Size_KB',
+    'TBT_ms', 'CLS', 'INP_ms', 'API_Server_ms', 'API_Data_Fetch_ms', 'API_Serialize_ms',
+]
+FLAG_COLUMNS = ['API_Measured', 'Is_Regression']
+
+DATASET_DTYPES = {
+    **{col: 'category' for col in CATEGORY_COLUMNS},
+    **{col: 'float32' for col in METRIC_COLUMNS},
+    **{col: 'int8' for col in FLAG_COLUMNS},
+    'Sample_ID': 'string',
+}
+
+# Projections for the common consumers
+BASELINE_COLUMNS = ['Page_Name', 'Network_Type', 'Scenario', 'Page_Load_Time_ms', 'Perceived_Load_Time_ms',
+                    'LCP_ms', 'API_Latency_ms', 'API_Measured']
+
+
+def _read_options(columns, parse_dates):
+    if columns is None:
+        usecols = None
+        wanted = set(DATASET_DTYPES) | {'Timestamp'}
+    else:
+        wanted = set(columns)
+        usecols = lambda col: col in wanted
+    options = {
+        'usecols': usecols,
+        'dtype': {col: dtype for col, dtype in DATASET_DTYPES.items() if col in wanted},
+    }
+    if parse_dates and 'Timestamp' in wanted:
+        options['parse_dates'] = ['Timestamp']
+        options['date_format'] = TIMESTAMP_FORMAT
+    return options
+
+
+def read_dataset(path, columns=None, parse_dates=True):
+    """Load a dataset CSV with DATASET_DTYPES; `columns` limits parsing to those columns."""
+    import pandas as pd # Imported on use: the CLIs import this module for --help too
+    return pd.read_csv(path, **_read_options(columns, parse_dates))
+
+
+def iter_dataset(path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, parse_dates=True):
+    """Yield typed chunks of at most chunk_rows rows; memory stays bounded by one chunk."""
+    import pandas as pd
+    with pd.read_csv(path, chunksize=chunk_rows, **_read_options(columns, parse_dates)) as reader:
+        yield from reader
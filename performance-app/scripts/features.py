@@ -0,0 +1,187 @@
+from collections import defaultdict
+
+# Shared feature engineering for training, validation and scoring.
+# NumPy/pandas are imported inside the functions, so the CLIs can read the feature
+# lists (and print --help) without loading them.
+# Baselines are the per-(Page_Name, Network_Type) medians saved in baseline_stats.pkl:
+#   {('Products', '3G'): {'Page_Load_Time_ms': ..., 'LCP_ms': ..., ...}, ...}
+
+BASELINE_KEYS = ['Page_Name', 'Network_Type']
+
+# Original Raw Features (for baseline calc)
+RAW_METRICS = [
+    'Page_Load_Time_ms',
+    'Perceived_Load_Time_ms',
+    'LCP_ms',
+    'API_Latency_ms'
+]
+
+# Delta column produced for each raw metric (same order as RAW_METRICS)
+DELTA_COLUMNS = [
+    'Page_Load_Time_Delta',
+    'Perceived_Load_Time_Delta',
+    'LCP_Delta',
+    'API_Latency_Delta'
+]
+
+NUMERIC_FEATURES = DELTA_COLUMNS + [
+    'API_Measured',
+    'Total_Page_Size_KB'
+]
+CATEGORICAL_FEATURES = ['Network_Type', 'Page_Name']
+
+# Features to Train On (Relative + Context)
+TRAINING_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+TARGET = 'Is_Regression'
+
+# Web Vitals from web_vitals.py. Datasets recorded before it don't have them, so they
+# are only trained on when every row has a value (see numeric_features_for)
+VITALS_FEATURES = ['TBT_ms', 'CLS']
+
+# API Server-Timing (web_vitals.server_timing_columns): the handler's own time, independent
+# of Network_Type, so a slow handler is told apart from a slow network. Same rule as
+# VITALS_FEATURES; the phase columns are kept in the dataset for diagnosis only
+SERVER_TIMING_COLUMNS = ['API_Server_ms', 'API_Data_Fetch_ms', 'API_Serialize_ms']
+SERVER_TIMING_FEATURES = ['API_Server_ms']
+
+
+class MissingBaselineError(KeyError):
+    """Raised when rows reference a (Page_Name, Network_Type) pair with no baseline."""
+
+
+def numeric_features_for(df):
+    """NUMERIC_FEATURES plus the VITALS_FEATURES / SERVER_TIMING_FEATURES present for every row of df."""
+    optional = VITALS_FEATURES + SERVER_TIMING_FEATURES
+    return NUMERIC_FEATURES + [col for col in optional if col in df.columns and df[col].notna().all()]
+
+
+def model_features(pipeline):
+    """(numeric, categorical) input columns of a fitted training pipeline (or compiled_forest.CompiledForest)."""
+    if hasattr(pipeline, 'features'):
+        return pipeline.features
+    columns = {name: list(cols) for name, _, cols in pipeline.named_steps['preprocessor'].transformers_}
+    return columns['num'], columns['cat']
+
+
+def prepare_raw_metrics(df):
+    """
+    Normalise the raw metric columns in place (API_Measured flag, NaN API latency -> 0).
+    Server-Timing columns become 0 on rows without an API call; rows with a call but no
+    header keep NaN.
+    """
+    if 'API_Measured' not in df.columns:
+        df['API_Measured'] = (df['API_Latency_ms'] > 0).astype(int)
+    df['API_Latency_ms'] = df['API_Latency_ms'].fillna(0)
+    for col in SERVER_TIMING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].where(df['API_Measured'] > 0, 0)
+    return df
+
+
+def compute_baselines(df, scenario='baseline'):
+    """Median of each raw metric per (Page_Name, Network_Type) over healthy rows."""
+    healthy_df = df[df['Scenario'] == scenario]
+    # We use Median to be robust against outliers in the "healthy" set
+    # Medians in float64 whatever the stored dtype (dataset_loader reads metrics as float32)
+    metrics = healthy_df[RAW_METRICS].astype(float)
+    medians = metrics.groupby([healthy_df[key] for key in BASELINE_KEYS], observed=True).median()
+    return medians.to_dict('index')
+
+
+def compute_baselines_chunked(chunks, scenario='baseline'):
+    """
+    compute_baselines over an iterable of prepared frames (e.g. dataset_loader.iter_dataset
+    chunks after prepare_raw_metrics). Medians stay exact: only the healthy rows' raw
+    metrics are kept, as float32 arrays per (Page_Name, Network_Type).
+    """
+    import numpy as np
+
+    parts = defaultdict(list)
+    for chunk in chunks:
+        healthy = chunk[chunk['Scenario'] == scenario]
+        for key, group in healthy.groupby(BASELINE_KEYS, observed=True):
+            parts[key].append(group[RAW_METRICS].to_numpy(dtype=np.float32))
+    return {
+        key: dict(zip(RAW_METRICS, np.nanmedian(np.concatenate(values).astype(float), axis=0).tolist()))
+        for key, values in sorted(parts.items())
+    }
+
+
+def baselines_to_frame(baselines):
+    """Convert the baseline dict into a frame indexed by (Page_Name, Network_Type)."""
+    import pandas as pd
+
+    if isinstance(baselines, pd.DataFrame):
+        return baselines[RAW_METRICS]
+    if not baselines:
+        index = pd.MultiIndex.from_tuples([], names=BASELINE_KEYS)
+        return pd.DataFrame(columns=RAW_METRICS, index=index, dtype=float)
+    frame = pd.DataFrame.from_dict(baselines, orient='index')
+    frame.index = pd.MultiIndex.from_tuples(frame.index, names=BASELINE_KEYS)
+    return frame[RAW_METRICS].astype(float)
+
+
+def _key_values(series):
+    # Categoricals (dataset_loader) keep their codes; only the few categories become str
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.rename_categories(series.cat.categories.astype(str)).array
+    return series.astype(str).to_numpy()
+
+
+def _baseline_positions(df, base_frame):
+    """Row position of each df row inside base_frame (-1 when there is no baseline)."""
+    import pandas as pd
+
+    keys = pd.MultiIndex.from_arrays([_key_values(df[col]) for col in BASELINE_KEYS], names=BASELINE_KEYS)
+    return base_frame.index.get_indexer(keys)
+
+
+def find_missing_baselines(df, baselines):
+    """Return the (Page_Name, Network_Type) pairs in df without a baseline, with row counts."""
+    positions = _baseline_positions(df, baselines_to_frame(baselines))
+    missing = df.loc[positions < 0, BASELINE_KEYS]
+    counts = missing.value_counts()
+    return counts[counts > 0].rename('Rows').reset_index() # Categoricals list unobserved pairs too
+
+
+def add_delta_features(df, baselines, on_missing='warn'):
+    """
+    Add the four *_Delta columns (raw metric - baseline median) as column operations.
+
+    on_missing controls rows whose (Page_Name, Network_Type) has no baseline:
+      'warn'  - print the missing pairs and fill their deltas with 0 (legacy behaviour)
+      'nan'   - print the missing pairs and leave their deltas as NaN
+      'raise' - raise MissingBaselineError
+    """
+    import numpy as np
+
+    if on_missing not in ('warn', 'nan', 'raise'):
+        raise ValueError(f"on_missing must be 'warn', 'nan' or 'raise', got {on_missing!r}")
+
+    base_frame = baselines_to_frame(baselines)
+    positions = _baseline_positions(df, base_frame)
+    missing_mask = positions < 0
+
+    if missing_mask.any():
+        missing = df.loc[missing_mask, BASELINE_KEYS].value_counts()
+        missing = missing[missing > 0]
+        pairs = ", ".join(f"{page}/{net} ({n} rows)" for (page, net), n in missing.items())
+        if on_missing == 'raise':
+            raise MissingBaselineError(f"No baseline for: {pairs}")
+        print(f"⚠️ Missing baselines for {int(missing_mask.sum())} rows: {pairs}")
+
+    # Gather baseline medians row-aligned with df; a trailing NaN row absorbs missing keys
+    base_values = np.vstack([
+        base_frame.to_numpy(dtype=float),
+        np.full((1, len(RAW_METRICS)), np.nan)
+    ])
+    # One column at a time: peak memory is a few columns, not three full (rows x metrics) matrices
+    for i, (metric, col) in enumerate(zip(RAW_METRICS, DELTA_COLUMNS)):
+        deltas = df[metric].to_numpy(dtype=float) - base_values[positions, i]
+        if on_missing == 'warn':
+            deltas[missing_mask] = 0.0
+        df[col] = deltas
+    return df
@@ -1,4 +1,4 @@
-import pandas as pd
+import argparse
 import os
 
 # Paths
@@ -9,7 +9,24 @@ HEALTHY_PATH = os.path.join(APP_DIR, 'val_healthy.csv')
 REGRESSION_PATH = os.path.join(APP_DIR, 'val_regression.csv')
 OUTPUT_PATH = os.path.join(APP_DIR, 'real_validation_data.csv')
 
-def finalize_validation_data():
+def drop_replay_rows(df, path):
+    """
+    Drop rows measured with replayed static assets: their load time / LCP are not
+    comparable with live samples, and the Scenario tag saying so is overwritten below.
+    """
+    from generate_validation_data import REPLAY_SCENARIO
+
+    if 'Scenario' not in df.columns:
+        return df
+    replay_mask = df['Scenario'] == REPLAY_SCENARIO
+    if replay_mask.any():
+        print(f"⚠️ Dropping {int(replay_mask.sum())} asset replay row(s) from {os.path.basename(path)} "
+              f"(re-run generate_validation_data.py without --replay-assets for validation data)")
+    return df[~replay_mask]
+
+def finalize_validation_data(to_store=False):
+    import pandas as pd
+
     print("🚀 Merging and Labeling Validation Data...")
 
     # Load
@@ -17,8 +34,8 @@ def finalize_validation_data():
         print("❌ Error: Missing temporary validation files.")
         return
 
-    df_h = pd.read_csv(HEALTHY_PATH)
-    df_r = pd.read_csv(REGRESSION_PATH)
+    df_h = drop_replay_rows(pd.read_csv(HEALTHY_PATH), HEALTHY_PATH)
+    df_r = drop_replay_rows(pd.read_csv(REGRESSION_PATH), REGRESSION_PATH)
     
     # Labeling Logic
     # 1. Healthy Run: Everything is 0
@@ -44,10 +61,25 @@ def finalize_validation_data():
     # Save
     df_final.to_csv(OUTPUT_PATH, index=False)
     print(f"✅ Final Balanced Validation Data Saved: {OUTPUT_PATH}")
+
+    # Append-only ingest into the columnar metrics store (no rewrite of earlier runs)
+    if to_store:
+        import metrics_store
+        rows = metrics_store.append(df_final, 'real_validation')
+        print(f"✅ Appended {rows} rows to metrics store: {metrics_store.STORE_DIR}")
     print(f"Total Rows: {len(df_final)}")
     print(f"Class Distribution:\n{df_final['Is_Regression'].value_counts()}")
     print("\nSample Regression Rows:")
     print(df_final[df_final['Is_Regression'] == 1][['Page_Name', 'Is_Regression', 'Scenario']].head())
 
+def add_arguments(parser):
+    # Usage: python finalize_validation_data.py [--store]
+    parser.add_argument("--store", action="store_true", help="Also append the rows to the columnar metrics store")
+
+def main(args):
+    finalize_validation_data(to_store=args.store)
+
 if __name__ == "__main__":
-    finalize_validation_data()
+    parser = argparse.ArgumentParser(description="Merge and label the healthy/regression validation runs")
+    add_arguments(parser)
+    main(parser.parse_args())
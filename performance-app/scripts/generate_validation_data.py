@@ -1,19 +1,29 @@
 import os
-import random
 import time
-import pandas as pd
+import asyncio
+import argparse
 from datetime import datetime
-from playwright.sync_api import sync_playwright
+
+from asset_replay import AssetReplay, load_assets
+from network_profiles import NETWORK_PROFILES, emulate, emulate_sync
+from sample_writer import DEFAULT_BATCH_SIZE, CheckpointedWriter, export_parquet
+from web_vitals import COLLECT_SCRIPT, COLLECTOR_SCRIPT, collect_args, vitals_columns
 
 # --- Configuration ---
 BASE_URL = "http://localhost:3000"
 OUTPUT_FILE = "performance-app/performance-app/real_validation_data.csv" # Adjusting path based on user's folder structure confusion or relative to root
-# User said "save to real_validation_data.csv". I'll put it in performance-app to be safe or root? 
+# User said "save to real_validation_data.csv". I'll put it in performance-app to be safe or root?
 # Helper: The user seems to be in root `thesis`, and has `performance-app`.
 # Let's write to `performance-app/real_validation_data.csv`.
 
 OUTPUT_PATH = 'performance-app/real_validation_data.csv'
 TOTAL_SAMPLES = 200
+API_PATH = "/api/products"
+
+# Rows measured with static assets served from the HAR (asset_replay.py) are tagged,
+# since their load time / LCP are not comparable with fully live samples
+LIVE_SCENARIO = 'live_validation'
+REPLAY_SCENARIO = 'asset_replay_validation'
 
 PAGES = [
     {'path': '/', 'name': 'Homepage'},
@@ -21,178 +31,311 @@ PAGES = [
     {'path': '/about', 'name': 'About'}
 ]
 
-NETWORK_PROFILES = {
-    'WiFi': None, # No throttling
-    '4G': {
-        'offline': False,
-        'downloadThroughput': 4 * 1024 * 1024 / 8, # 4MB/s
-        'uploadThroughput': 4 * 1024 * 1024 / 8,
-        'latency': 20
-    },
-    '3G': {
-        'offline': False,
-        'downloadThroughput': 750 * 1024 / 8, # 750kb/s
-        'uploadThroughput': 250 * 1024 / 8,
-        'latency': 100
-    }
-}
-
 COLUMNS = [
-    'Timestamp', 'Page_Name', 'Network_Type', 
-    'Page_Load_Time_ms', 'Perceived_Load_Time_ms', 'LCP_ms', 
-    'API_Latency_ms', 'API_Measured', 'Total_Page_Size_KB', 
-    'Scenario', 'Commit_ID', 'Is_Regression'
+    'Timestamp', 'Page_Name', 'Network_Type',
+    'Page_Load_Time_ms', 'Perceived_Load_Time_ms', 'LCP_ms',
+    'API_Latency_ms', 'API_Measured', 'Total_Page_Size_KB',
+    'Scenario', 'Commit_ID', 'Is_Regression',
+    'TBT_ms', 'CLS', 'INP_ms', 'Sample_ID',
+    'API_Server_ms', 'API_Data_Fetch_ms', 'API_Serialize_ms'
 ]
 
-def get_lcp(page):
-    return page.evaluate("""() => {
-        return new Promise((resolve) => {
-            new PerformanceObserver((entryList) => {
-                const entries = entryList.getEntries();
-                const lastEntry = entries[entries.length - 1];
-                resolve(lastEntry.startTime);
-            }).observe({ type: 'largest-contentful-paint', buffered: true });
-            
-            // Fallback if no LCP after timeout (e.g. 5s)
-            setTimeout(() => resolve(0), 5000);
-        });
-    }""")
-
-def measure_performance():
-    data = []
-    
+def draw_sample(rng):
+    """
+    Draw the (page, network) choice for the next sample index.
+    Choices are drawn in index order from one seeded RNG, so a run is reproducible
+    no matter how many workers consume the plan or in which order they finish.
+    """
+    return rng.choice(PAGES), rng.choice(list(NETWORK_PROFILES.keys()))
+
+def open_writer(seed=None, resume=False, batch_size=DEFAULT_BATCH_SIZE):
+    return CheckpointedWriter.open(OUTPUT_PATH, COLUMNS, TOTAL_SAMPLES, draw_sample, seed, resume, batch_size)
+
+def api_latency_from_timing(timing):
+    # Playwright timing: responseStart - requestStart is TTFB (latency + server proc).
+    if timing and timing.get('responseStart') and timing.get('requestStart'):
+        return max(0, timing['responseStart'] - timing['requestStart'])
+    return None
+
+class ResponseTotals:
+    """
+    API latency (Playwright request timing of the API call) and page size (summed
+    content-length of every response) as the dataset defines them. Anything that
+    writes dataset rows collects them through track_responses / track_responses_sync.
+    """
+
+    def __init__(self):
+        self.api_latency = 0
+        self.api_called = 0
+        self.total_size_bytes = 0
+
+    def add(self, url, timing, content_length):
+        # Check for API calls (customize path if needed)
+        if API_PATH in url:
+            self.api_called = 1
+            # Approximate latency from timing
+            latency = api_latency_from_timing(timing)
+            if latency is not None:
+                self.api_latency = latency
+        # Sum body size
+        try:
+            self.total_size_bytes += int(content_length or 0)
+        except ValueError:
+            pass
+
+def track_responses_sync(page):
+    totals = ResponseTotals()
+
+    def handle_response(response):
+        try:
+            content_length = response.header_value("content-length")
+        except Exception:
+            content_length = None
+        totals.add(response.url, response.request.timing, content_length)
+
+    page.on("response", handle_response)
+    return totals
+
+def track_responses(page):
+    """Async-API counterpart of track_responses_sync()."""
+    totals = ResponseTotals()
+
+    async def handle_response(response):
+        try:
+            content_length = await response.header_value("content-length")
+        except Exception:
+            content_length = None
+        totals.add(response.url, response.request.timing, content_length)
+
+    page.on("response", handle_response)
+    return totals
+
+def build_row(page_def, network_name, load_time, lcp, api_called, api_latency, total_size_bytes, vitals,
+              scenario=LIVE_SCENARIO, sample_id=None):
+    from waterfall_store import new_sample_id
+    # Perceived
+    perceived_load = load_time + api_latency if api_called else load_time
+
+    # API Latency Handling
+    # Dataset expects empty or value. "Capture 0 or NaN if the page has no API call"
+    # Thesis dataset has 0 or empty. Our training script fills with 0.
+    return {
+        'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'Page_Name': page_def['name'],
+        'Network_Type': network_name,
+        'Page_Load_Time_ms': round(load_time, 2),
+        'Perceived_Load_Time_ms': round(perceived_load, 2),
+        'LCP_ms': round(float(lcp), 2),
+        'API_Latency_ms': round(api_latency, 2) if api_called else None, # will be NaN in pandas
+        'API_Measured': api_called,
+        'Total_Page_Size_KB': round(total_size_bytes / 1024, 2),
+        'Scenario': scenario,
+        'Commit_ID': 'live',
+        'Is_Regression': 0,
+        **vitals_columns(vitals),
+        # Key of this sample's resources in waterfall_store.py
+        'Sample_ID': sample_id or new_sample_id(),
+    }
+
+def measure_sample(browser, page_def, network_name, assets=None, waterfall=None):
+    """
+    Sync-API counterpart of measure_sample_async(). Returns the row, or None on failure;
+    any error in the sample is logged and its context closed, so the run carries on.
+    """
+    url = f"{BASE_URL}{page_def['path']}"
+    context = None
+    try:
+        # 1. Setup Context (Clean Slate)
+        context = browser.new_context(bypass_csp=True)
+        context.clear_cookies()
+        replay = None
+        if assets is not None:
+            replay = AssetReplay(assets)
+            replay.attach_sync(context)
+
+        # 2. Apply Network Conditions (CDP) to the page that is measured below
+        page = context.new_page()
+        emulate_sync(page, network_name)
+        # LCP/CLS/long-task observers must exist before the first byte (see web_vitals.py)
+        page.add_init_script(COLLECTOR_SCRIPT)
+
+        # 3. Metrics Setup (API latency + summed body size)
+        totals = track_responses_sync(page)
+
+        # 4. Navigate (the collector waits for the API call and a quiet page, so 'load' is enough)
+        start_time = time.time()
+        page.goto(url, wait_until='load')
+
+        # 5. Collect Metrics (navigation timing, LCP, CLS, TBT in one roundtrip)
+        vitals = page.evaluate(COLLECT_SCRIPT, collect_args())
+        load_time = vitals['load_time_ms']
+        if load_time <= 0: load_time = (time.time() - start_time) * 1000 # Fallback
+
+        # 6. Build Row
+        if replay and replay.changed:
+            replay.print_report()
+        scenario = LIVE_SCENARIO if replay is None else REPLAY_SCENARIO
+        row = build_row(page_def, network_name, load_time, vitals['lcp_ms'], totals.api_called, totals.api_latency, totals.total_size_bytes, vitals, scenario)
+        if waterfall is not None:
+            waterfall.add(vitals, url, row['Sample_ID'], row['Commit_ID'], row['Page_Name'], network_name)
+        return row
+    except Exception as e:
+        print(f"❌ Error measuring {url}: {e}")
+        return None
+    finally:
+        if context is not None:
+            context.close()
+
+def measure_performance(seed=None, resume=False, batch_size=DEFAULT_BATCH_SIZE, replay_assets=False):
+    # Playwright and the pyarrow-backed waterfall table load on use, not for --help
+    from playwright.sync_api import sync_playwright
+    from waterfall_store import WaterfallWriter
+
     print(f"🚀 Starting Validation Data Generation ({TOTAL_SAMPLES} samples)...")
-    
+
+    # Rows stream to OUTPUT_PATH in checkpointed batches instead of an in-memory list
+    writer = open_writer(seed, resume, batch_size)
+    assets = load_assets() if replay_assets else None
+    waterfall = WaterfallWriter(flush_samples=batch_size)
+
     with sync_playwright() as p:
         # Launch Chrome (headless)
         browser = p.chromium.launch(headless=True)
-        
-        for i in range(TOTAL_SAMPLES):
-            # 1. Random Selection
-            page_def = random.choice(PAGES)
-            network_name = random.choice(list(NETWORK_PROFILES.keys()))
-            url = f"{BASE_URL}{page_def['path']}"
-            
-            # 2. Setup Context (Clean Slate)
-            context = browser.new_context(bypass_csp=True)
-            context.clear_cookies()
-            
-            # 3. Apply Network Conditions (CDP)
-            if NETWORK_PROFILES[network_name]:
-                cdp = context.new_cdp_session(context.pages[0] if context.pages else context.new_page())
-                cdp.send('Network.emulateNetworkConditions', NETWORK_PROFILES[network_name])
-            
-            page = context.new_page()
-            
-            # 4. Metrics Setup
-            api_latency = 0
-            api_called = 0
-            total_size_bytes = 0
-            
-            def handle_response(response):
-                nonlocal api_latency, api_called, total_size_bytes
-                
-                # Check for API calls (customize path if needed)
-                if "/api/products" in response.url:
-                    api_called = 1
-                    # Approximate latency from timing
-                    timing = response.request.timing
-                    if timing:
-                        # end - start approx latency
-                        # Playwright timing: startTime, domainLookupStart, etc.
-                        # responseEnd - responseStart is download. 
-                        # responseStart - requestStart is TTFB (latency).
-                        # Let's use simplified: response received timestamp - request timestamp? 
-                        # response.timing is detailed.
-                        # responseStart - startTime is mostly latency + server proc.
-                         if timing.get('responseStart') and timing.get('requestStart'):
-                             api_latency = max(0, timing['responseStart'] - timing['requestStart'])
-                
-                # Sum body size
-                try:
-                    s = int(response.header_value("content-length") or 0)
-                    total_size_bytes += s
-                except:
-                    pass
-
-            page.on("response", handle_response)
-            
-            # 5. Navigate
-            start_time = time.time()
-            try:
-                page.goto(url, wait_until='networkidle')
-            except Exception as e:
-                print(f"❌ Error loading {url}: {e}")
-                context.close()
-                continue
-                
-            # 6. Collect Metrics
-            # Page Load
-            # Using Navigation Timing API for precision
-            nav_timing = page.evaluate("() => JSON.stringify(window.performance.timing)")
-            import json
-            timings = json.loads(nav_timing)
-            load_time = timings['loadEventEnd'] - timings['navigationStart']
-            if load_time < 0: load_time = (time.time() - start_time) * 1000 # Fallback
-            
-            # LCP
-            try:
-                lcp = get_lcp(page)
-            except:
-                lcp = 0
-            
-            # Perceived
-            perceived_load = load_time + api_latency if api_called else load_time
-            
-            # API Latency Handling
-            # Dataset expects empty or value. "Capture 0 or NaN if the page has no API call"
-            # But we are putting it into a DataFrame that likely expects floats.
-            # Thesis dataset has 0 or empty. Our training script fills with 0.
-            # Validation request: "Capture 0 or NaN".
-            final_api_latency = api_latency if api_called else None # will be NaN in pandas
-            
-            # 7. Record Row
-            row = {
-                'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'Page_Name': page_def['name'],
-                'Network_Type': network_name,
-                'Page_Load_Time_ms': round(load_time, 2),
-                'Perceived_Load_Time_ms': round(perceived_load, 2),
-                'LCP_ms': round(float(lcp), 2),
-                'API_Latency_ms': round(api_latency, 2) if api_called else None,
-                'API_Measured': api_called,
-                'Total_Page_Size_KB': round(total_size_bytes / 1024, 2),
-                'Scenario': 'live_validation',
-                'Commit_ID': 'live',
-                'Is_Regression': 0
-            }
-            
-            data.append(row)
-            print(f"[{i+1}/{TOTAL_SAMPLES}] {page_def['name']} ({network_name}): Load={row['Page_Load_Time_ms']}ms, LCP={row['LCP_ms']}ms")
-            
-            context.close()
-        
+
+        # Samples are drawn in order from the seeded plan
+        for i, page_def, network_name in writer.plan:
+            row = measure_sample(browser, page_def, network_name, assets, waterfall)
+            writer.record(i, row)
+            if row:
+                print(f"[{i+1}/{TOTAL_SAMPLES}] {page_def['name']} ({network_name}): Load={row['Page_Load_Time_ms']}ms, LCP={row['LCP_ms']}ms, TBT={row['TBT_ms']}ms")
+
         browser.close()
-        
-    # Save
-    df = pd.DataFrame(data, columns=COLUMNS)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-    
-    df.to_csv(OUTPUT_PATH, index=False)
-    print(f"\n✅ Validation data saved to: {OUTPUT_PATH}")
-    print(df.describe())
+
+    writer.close()
+    waterfall.close()
+    return writer
+
+async def measure_sample_async(browser, index, page_def, network_name, assets=None, waterfall=None):
+    """
+    Measure one sample in its own isolated context. Returns the row, or None on failure;
+    any error in the sample is logged and its context closed, so other workers carry on.
+    With assets (asset_replay.load_assets()), recorded static assets are served locally;
+    with a WaterfallWriter, the sample's resource timing entries are added to it.
+    """
+    url = f"{BASE_URL}{page_def['path']}"
+
+    context = None
+    try:
+        context = await browser.new_context(bypass_csp=True)
+        replay = None
+        if assets is not None:
+            replay = AssetReplay(assets)
+            await replay.attach(context)
+        page = await context.new_page()
+
+        # Network emulation is bound to this context's measured page only
+        await emulate(page, network_name)
+        await page.add_init_script(COLLECTOR_SCRIPT)
+
+        totals = track_responses(page)
+
+        start_time = time.time()
+        await page.goto(url, wait_until='load')
+
+        vitals = await page.evaluate(COLLECT_SCRIPT, collect_args())
+        load_time = vitals['load_time_ms']
+        if load_time <= 0: load_time = (time.time() - start_time) * 1000 # Fallback
+
+        if replay and replay.changed:
+            replay.print_report()
+        scenario = LIVE_SCENARIO if replay is None else REPLAY_SCENARIO
+        row = build_row(page_def, network_name, load_time, vitals['lcp_ms'], totals.api_called, totals.api_latency, totals.total_size_bytes, vitals, scenario)
+        if waterfall is not None:
+            waterfall.add(vitals, url, row['Sample_ID'], row['Commit_ID'], row['Page_Name'], network_name)
+        return row
+    except Exception as e:
+        print(f"❌ Error measuring {url}: {e}")
+        return None
+    finally:
+        if context is not None:
+            await context.close()
+
+async def measure_performance_async(workers, seed=None, resume=False, batch_size=DEFAULT_BATCH_SIZE, replay_assets=False):
+    """Run the sample plan across `workers` concurrent browser contexts."""
+    from playwright.async_api import async_playwright
+
+    from waterfall_store import WaterfallWriter
+
+    print(f"🚀 Starting Validation Data Generation ({TOTAL_SAMPLES} samples, {workers} workers)...")
+
+    writer = open_writer(seed, resume, batch_size)
+    assets = load_assets() if replay_assets else None
+    waterfall = WaterfallWriter(flush_samples=batch_size)
+    # Workers pull from one lazy iterator, so at most `workers` samples are drawn ahead of disk
+    plan_iter = iter(writer.plan)
+    start_index = writer.next_index
+    done = 0
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+
+        async def worker():
+            nonlocal done
+            while True:
+                try:
+                    i, page_def, network_name = next(plan_iter)
+                except StopIteration:
+                    return
+                row = await measure_sample_async(browser, i, page_def, network_name, assets, waterfall)
+                writer.record(i, row)
+                done += 1
+                if row:
+                    print(f"[{done}/{TOTAL_SAMPLES}] #{i+1} {page_def['name']} ({network_name}): Load={row['Page_Load_Time_ms']}ms, LCP={row['LCP_ms']}ms, TBT={row['TBT_ms']}ms")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        elapsed = time.perf_counter() - start
+
+        await browser.close()
+
+    print(f"⏱️ {done} samples in {elapsed:.1f}s ({done / elapsed:.2f} samples/s)")
+
+    # The writer reorders completions, so rows land in plan order and seeded runs line up sample-for-sample
+    writer.close()
+    waterfall.close()
+    return writer
+
+def report_output(writer, fmt='csv'):
+    print(f"\n✅ Validation data saved to: {OUTPUT_PATH} ({writer.rows_written} rows)")
+    if fmt == 'parquet':
+        parquet_path = export_parquet(OUTPUT_PATH)
+        print(f"✅ Columnar export saved to: {parquet_path}")
+
+def add_arguments(parser):
+    # Usage: python script.py [filename] [--workers N] [--seed S] [--resume] [--format csv|parquet] [--replay-assets]
+    parser.add_argument("output", nargs="?", default=OUTPUT_PATH, help="Output CSV path")
+    parser.add_argument("--samples", type=int, default=TOTAL_SAMPLES, help="Number of samples")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent browser contexts (>1 uses asyncio mode)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for page/network selection")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoint")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Samples per flushed batch")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Also export Parquet when 'parquet'")
+    parser.add_argument("--replay-assets", action="store_true", help="Serve static assets from the recorded HAR (asset_replay.py record)")
+
+def main(args):
+    global OUTPUT_PATH, TOTAL_SAMPLES
+    OUTPUT_PATH = args.output
+    TOTAL_SAMPLES = args.samples
+
+    # Labels are applied later by finalize_validation_data.py; record metrics as is.
+    if args.workers > 1:
+        writer = asyncio.run(measure_performance_async(args.workers, args.seed, args.resume, args.batch_size, args.replay_assets))
+    else:
+        writer = measure_performance(args.seed, args.resume, args.batch_size, args.replay_assets)
+
+    report_output(writer, args.format)
 
 if __name__ == "__main__":
-    import sys
-    # Simple arg parsing: python script.py [filename] [is_regression_run]
-    if len(sys.argv) > 1:
-        OUTPUT_PATH = sys.argv[1]
-    
-    # Optional: Logic to override labels if we know this is a regression run
-    # For now, we'll let the merging step handle the explicit labeling to keep this script simple 
-    # or we can pass a flag.
-    # Let's keep it simple: Record metrics as is. We will post-process usage.
-    
-    measure_performance()
+    parser = argparse.ArgumentParser(description="Generate live validation samples")
+    add_arguments(parser)
+    main(parser.parse_args())
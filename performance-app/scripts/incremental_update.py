@@ -0,0 +1,253 @@
+import argparse
+import datetime
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
+from artifact_cache import cache_key, file_digest, load_build_manifest, record_build
+from compiled_forest import COMPILED_MODEL_PATH, export_compiled_model
+from dataset_loader import read_dataset
+from features import (
+    BASELINE_KEYS, CATEGORICAL_FEATURES, RAW_METRICS, TARGET,
+    add_delta_features, compute_baselines, model_features, numeric_features_for, prepare_raw_metrics
+)
+from model_metadata import decision_threshold, forest_params, load_metadata, update_metadata
+
+# Incremental model updates: a fixed-size forest whose oldest trees are replaced
+# by trees fit on each new batch of labeled runs. The fitted preprocessor and the
+# baselines are kept, so an update costs a fit of --trees trees on the new rows
+# only, independent of how much history the model has seen.
+#   python scripts/incremental_update.py update new_runs.csv
+#   python scripts/incremental_update.py compare      # incremental vs. full retrain on validation
+#
+# Rebuild policy (full train_final_model.py run) -- see rebuild_reasons():
+#   - new Page_Name/Network_Type values (the encoder and baselines can't represent them)
+#   - healthy medians in new data drift > BASELINE_DRIFT_LIMIT from the stored baselines
+#     (once a key has MIN_DRIFT_SAMPLES healthy rows in the batch)
+#   - new rows' numeric features drift > SCALER_DRIFT_LIMIT standard deviations from the scaler
+#   - every original tree has been replaced (no tree has seen the full history)
+#   - rows ingested since the last rebuild exceed REBUILD_ROW_FRACTION of the training set
+#   - validation recall drops below the value recorded at the last rebuild
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+TRAIN_FILE = os.path.join(PERFORMANCE_APP_DIR, 'thesis_final_dataset.csv')
+VALIDATION_FILE = os.path.join(PERFORMANCE_APP_DIR, 'real_validation_data.csv')
+MODEL_DIR = os.path.join(PERFORMANCE_APP_DIR, 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.pkl')
+BASELINE_PATH = os.path.join(MODEL_DIR, 'baseline_stats.pkl')
+
+DEFAULT_NEW_TREES = 30
+BASELINE_DRIFT_LIMIT = 0.10 # Relative change of a healthy median
+MIN_DRIFT_SAMPLES = 30 # Healthy rows per (page, network) before its median is compared
+SCALER_DRIFT_LIMIT = 3.0 # Mean shift of a numeric feature, in scaler standard deviations
+REBUILD_ROW_FRACTION = 0.5
+RECALL_TOLERANCE = 0.0 # CI runs at 100% recall; any drop triggers a rebuild
+
+
+def prepare_batch(df, baselines):
+    prepare_raw_metrics(df)
+    add_delta_features(df, baselines)
+    return df
+
+
+def feature_columns(pipeline):
+    numeric, categorical = model_features(pipeline)
+    return numeric + categorical
+
+
+def fit_batch_trees(pipeline, X, y, n_trees=DEFAULT_NEW_TREES, random_state=None):
+    """Trees with the pipeline's forest settings, fit on the transformed batch only."""
+    classifier = pipeline.named_steps['classifier']
+    batch_forest = clone(classifier).set_params(n_estimators=n_trees, random_state=random_state, warm_start=False)
+    batch_forest.fit(pipeline.named_steps['preprocessor'].transform(X), y)
+    return batch_forest.estimators_
+
+
+def replace_oldest_trees(pipeline, new_trees):
+    """Append new_trees and drop the same number of the oldest ones (forest size is unchanged)."""
+    classifier = pipeline.named_steps['classifier']
+    size = len(classifier.estimators_)
+    classifier.estimators_ = (classifier.estimators_ + list(new_trees))[-size:]
+    return pipeline
+
+
+def rebuild_reasons(pipeline, baselines, batch, lineage, validation_recall=None):
+    """Reasons a full retrain is needed instead of (or after) an incremental update."""
+    reasons = []
+    preprocessor = pipeline.named_steps['preprocessor']
+    encoder = preprocessor.named_transformers_['cat']
+    for col, known in zip(CATEGORICAL_FEATURES, encoder.categories_):
+        unseen = set(batch[col].astype(str)) - set(map(str, known))
+        if unseen:
+            reasons.append(f"unseen {col} values: {sorted(unseen)}")
+
+    healthy = compute_baselines(batch)
+    counts = batch[batch['Scenario'] == 'baseline'].groupby(BASELINE_KEYS, observed=True).size()
+    for key, medians in healthy.items():
+        base = baselines.get(key)
+        if base is None or counts.get(key, 0) < MIN_DRIFT_SAMPLES:
+            continue
+        for metric in RAW_METRICS:
+            if base[metric] > 0 and abs(medians[metric] - base[metric]) / base[metric] > BASELINE_DRIFT_LIMIT:
+                reasons.append(f"baseline drift {key} {metric}: {base[metric]:.1f} -> {medians[metric]:.1f}")
+
+    scaler = preprocessor.named_transformers_['num']
+    numeric, _ = model_features(pipeline)
+    healthy_rows = batch[TARGET] == 0
+    if healthy_rows.any():
+        shift = (batch.loc[healthy_rows, numeric].mean().to_numpy() - scaler.mean_) / scaler.scale_
+        for col, z in zip(numeric, shift):
+            if abs(z) > SCALER_DRIFT_LIMIT:
+                reasons.append(f"feature drift {col}: {z:+.1f} std")
+
+    forest_size = len(pipeline.named_steps['classifier'].estimators_)
+    if lineage.get('trees_replaced', 0) >= forest_size:
+        reasons.append(f"all {forest_size} original trees replaced")
+    if lineage.get('rows_since_rebuild', 0) > REBUILD_ROW_FRACTION * lineage.get('rebuild_rows', np.inf):
+        reasons.append(f"{lineage['rows_since_rebuild']} rows ingested since rebuild "
+                       f"(> {REBUILD_ROW_FRACTION:.0%} of {lineage['rebuild_rows']})")
+    if validation_recall is not None and 'rebuild_recall' in lineage:
+        if validation_recall < lineage['rebuild_recall'] - RECALL_TOLERANCE:
+            reasons.append(f"validation recall {validation_recall:.4f} < {lineage['rebuild_recall']:.4f} at rebuild")
+    return reasons
+
+
+def evaluate(pipeline, validation, threshold):
+    y_true = validation[TARGET]
+    y_pred = (pipeline.predict_proba(validation[feature_columns(pipeline)])[:, 1] >= threshold).astype(int)
+    precision, recall, f1, _ = precision_recall_fscore_support(y_true, y_pred, average='binary', zero_division=0)
+    return {
+        'accuracy': round(accuracy_score(y_true, y_pred), 4),
+        'precision': round(precision, 4),
+        'recall': round(recall, 4),
+        'f1': round(f1, 4),
+    }
+
+
+def load_validation(baselines):
+    return prepare_batch(read_dataset(VALIDATION_FILE), baselines)
+
+
+def update(batch_file, n_trees=DEFAULT_NEW_TREES, model_path=MODEL_PATH, baseline_path=BASELINE_PATH, force=False):
+    print(f"🚀 Incremental update from {batch_file}...")
+    pipeline = joblib.load(model_path)
+    baselines = joblib.load(baseline_path)
+    batch = prepare_batch(read_dataset(batch_file), baselines)
+    lineage = load_metadata().get('training', {})
+
+    blocking = [r for r in rebuild_reasons(pipeline, baselines, batch, lineage) if r.startswith('unseen')]
+    if blocking and not force:
+        print("❌ Full rebuild required (run train_final_model.py):")
+        for reason in blocking:
+            print(f"   - {reason}")
+        return False
+    if batch[TARGET].nunique() < 2:
+        print("❌ Batch has a single class; new trees need both healthy and regression runs. Batch more runs.")
+        return False
+
+    start = time.perf_counter()
+    seed = lineage.get('updates', 0) + 1
+    replace_oldest_trees(pipeline, fit_batch_trees(pipeline, batch[feature_columns(pipeline)], batch[TARGET], n_trees, seed))
+    fit_s = time.perf_counter() - start
+
+    joblib.dump(pipeline, model_path)
+    export_compiled_model(pipeline, COMPILED_MODEL_PATH)
+    # Same baselines, new trees: a child of the loaded build (validate_model.py checks the pair)
+    parent = (load_build_manifest() or {}).get('build_id')
+    record_build(model_path, baseline_path, cache_key(parent, file_digest(model_path))[:16],
+                 compiled_path=COMPILED_MODEL_PATH, parent_build=parent)
+
+    lineage = {
+        **lineage,
+        'updates': lineage.get('updates', 0) + 1,
+        'trees_replaced': lineage.get('trees_replaced', 0) + n_trees,
+        'rows_since_rebuild': lineage.get('rows_since_rebuild', 0) + len(batch),
+        'last_update': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    metrics = evaluate(pipeline, load_validation(baselines), decision_threshold())
+    reasons = rebuild_reasons(pipeline, baselines, batch, lineage, metrics['recall'])
+    lineage['rebuild_recommended'] = reasons
+    update_metadata({'training': lineage})
+
+    print(f"✅ Replaced {n_trees} oldest trees using {len(batch)} new rows in {fit_s:.2f}s")
+    print(f"   Validation: {metrics}")
+    if reasons:
+        print("⚠️ Full rebuild recommended (run train_final_model.py):")
+        for reason in reasons:
+            print(f"   - {reason}")
+    return True
+
+
+def compare(n_batches=5, n_trees=DEFAULT_NEW_TREES, initial_fraction=0.5, seed=42):
+    """
+    Simulate labeled runs arriving in batches: fit on an initial share of the thesis
+    dataset, then ingest the rest batch by batch both ways (full retrain on all rows so
+    far vs. incremental tree replacement) and score each model on the validation set.
+    """
+    data = read_dataset(TRAIN_FILE).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    prepare_raw_metrics(data)
+    baselines = compute_baselines(data)
+    add_delta_features(data, baselines)
+    validation = load_validation(baselines)
+    threshold = decision_threshold()
+
+    from train_final_model import build_pipeline
+    n_initial = int(len(data) * initial_fraction)
+    batches = np.array_split(np.arange(n_initial, len(data)), n_batches)
+
+    numeric = numeric_features_for(data)
+    columns = numeric + CATEGORICAL_FEATURES
+    incremental = build_pipeline(forest_params(), numeric).fit(data.loc[:n_initial - 1, columns], data.loc[:n_initial - 1, TARGET])
+    results = []
+    for i, idx in enumerate(batches, start=1):
+        seen = data.iloc[:idx[-1] + 1]
+        batch = data.iloc[idx]
+
+        start = time.perf_counter()
+        full = build_pipeline(forest_params(), numeric).fit(seen[columns], seen[TARGET])
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replace_oldest_trees(incremental, fit_batch_trees(incremental, batch[columns], batch[TARGET], n_trees, i))
+        incremental_s = time.perf_counter() - start
+
+        for mode, model, seconds in [('full', full, full_s), ('incremental', incremental, incremental_s)]:
+            results.append({'Batch': i, 'Rows_Seen': len(seen), 'Mode': mode, 'Fit_s': round(seconds, 2),
+                            **evaluate(model, validation, threshold)})
+        print(f"[batch {i}/{n_batches}] full {full_s:6.2f}s {results[-2]} | incremental {incremental_s:6.2f}s {results[-1]}")
+
+    summary = pd.DataFrame(results)
+    print()
+    print(summary.to_string(index=False))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental forest updates from new labeled runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    update_p = sub.add_parser("update", help="Replace the oldest trees with trees fit on a new batch")
+    update_p.add_argument("batch", help="CSV of new labeled runs (thesis dataset columns)")
+    update_p.add_argument("--trees", type=int, default=DEFAULT_NEW_TREES, help="Trees fit on the batch (and retired)")
+    update_p.add_argument("--model", default=MODEL_PATH)
+    update_p.add_argument("--baselines", default=BASELINE_PATH)
+    update_p.add_argument("--force", action="store_true", help="Update even if a rebuild is required")
+
+    cmp_p = sub.add_parser("compare", help="Accuracy/time of incremental updates vs. full retraining")
+    cmp_p.add_argument("--batches", type=int, default=5)
+    cmp_p.add_argument("--trees", type=int, default=DEFAULT_NEW_TREES)
+    cmp_p.add_argument("--initial-fraction", type=float, default=0.5)
+
+    args = parser.parse_args()
+
+    if args.command == "update":
+        update(args.batch, args.trees, args.model, args.baselines, args.force)
+    else:
+        compare(args.batches, args.trees, args.initial_fraction)
@@ -0,0 +1,380 @@
+import argparse
+import contextlib
+import fcntl
+import os
+import socket
+import sqlite3
+import sys
+import time
+import urllib.parse
+
+from plan_routes import load_test_config
+
+# Local measurement job scheduler (replaces the check-then-create performance_test.lock).
+# Every measurement run (one CI job, several may start at once) enqueues itself and
+# waits for its turn instead of failing:
+#   queue     SQLite (jobs.sqlite). Claims run inside BEGIN IMMEDIATE, so two runs can
+#             never take the same turn; jobs start in submission order.
+#   slots     one flock()ed file per app instance plus max_concurrent_per_host slot
+#             files per host. The kernel drops a flock when its process exits, so a
+#             crashed or kill -9'd run never leaves a lock behind.
+#   recovery  a 'running' job whose instance lock is free has lost its process, and a
+#             'queued' job that stopped heartbeating has lost its waiter; both are
+#             marked 'abandoned' by the next run that looks at the queue.
+# Jobs are dispatched to the least recently used free instance from test-config.json:
+#   "instances": ["http://localhost:3000", "http://localhost:3001"],
+#   "max_concurrent_per_host": 1         (or {"localhost": 2, "default": 1})
+# Measurements on one host compete for its CPU, so the per-host limit (default 1)
+# keeps concurrent jobs from distorting each other's timings. Only URLs already on
+# one of the instances are rebased; any other host (staging, previews), or every
+# URL without "instances", is measured where it points under that host's own locks.
+#
+#   python scripts/job_scheduler.py status             # queued and running jobs
+#   python scripts/job_scheduler.py stats --hours 24   # queue latency and throughput
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+STATE_DIR = os.path.join(PERFORMANCE_APP_DIR, '.perf_scheduler')
+DEFAULT_HOST_CONCURRENCY = 1
+POLL_S = 0.25
+STALE_AFTER_S = 30 # A queued job without a heartbeat for this long is abandoned
+DB_TIMEOUT_S = 30
+
+QUEUED, RUNNING, DONE, FAILED, ABANDONED, TIMED_OUT = 'queued', 'running', 'done', 'failed', 'abandoned', 'timed_out'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    commit_id TEXT,
+    pid INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    pinned TEXT,
+    instance TEXT,
+    submitted_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL,
+    exit_code INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class QueueTimeout(TimeoutError):
+    """Raised when a job is still queued after its queue timeout."""
+
+
+def base_url(url):
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def rebase_url(url, instance):
+    """The same path/query on another app instance."""
+    parts = urllib.parse.urlsplit(url)
+    target = urllib.parse.urlsplit(instance)
+    return urllib.parse.urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+
+def _lock_name(url):
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.hostname}_{parts.port or (443 if parts.scheme == 'https' else 80)}"
+
+
+def scheduler_config(config=None):
+    """(instances, {host: limit}, default limit) from test-config.json."""
+    config = load_test_config() if config is None else config
+    instances = [base_url(url) for url in config.get('instances', [])]
+    limits = config.get('max_concurrent_per_host', DEFAULT_HOST_CONCURRENCY)
+    if isinstance(limits, dict):
+        return instances, {k: v for k, v in limits.items() if k != 'default'}, limits.get('default', DEFAULT_HOST_CONCURRENCY)
+    return instances, {}, limits
+
+
+def _try_flock(path):
+    """Open and exclusively flock `path` without blocking; the fd, or None when held elsewhere."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+class Lease:
+    """A claimed job: the instance it runs on plus the flocks that reserve it."""
+
+    def __init__(self, scheduler, job_id, instance, fds, queue_latency_s):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.instance = instance
+        self.fds = fds
+        self.queue_latency_s = queue_latency_s
+
+    def release(self, status, exit_code=None):
+        try:
+            self.scheduler.finish(self.job_id, status, exit_code)
+        finally:
+            for fd in self.fds:
+                os.close(fd) # Closing drops the flock
+            self.fds = []
+
+
+class Scheduler:
+    def __init__(self, state_dir=STATE_DIR, instances=None, host_limits=None, default_limit=DEFAULT_HOST_CONCURRENCY):
+        self.state_dir = state_dir
+        self.lock_dir = os.path.join(state_dir, 'locks')
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.instances = instances or []
+        self.host_limits = host_limits or {}
+        self.default_limit = default_limit
+        self.db_path = os.path.join(state_dir, 'jobs.sqlite')
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config=None, state_dir=STATE_DIR):
+        instances, host_limits, default_limit = scheduler_config(config)
+        return cls(state_dir, instances, host_limits, default_limit)
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=DB_TIMEOUT_S, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        db = self._connect()
+        try:
+            db.execute('BEGIN IMMEDIATE') # Takes SQLite's write lock: one claimer at a time
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def host_limit(self, host):
+        return self.host_limits.get(host, self.default_limit)
+
+    def submit(self, kind, label, commit_id=None, pinned=None):
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                'INSERT INTO jobs (kind, label, commit_id, pid, status, pinned, submitted_at, heartbeat_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (kind, label, commit_id, os.getpid(), QUEUED, pinned, now, now))
+            return cursor.lastrowid
+
+    def _recover_stale(self, db):
+        now = time.time()
+        db.execute('UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ?',
+                   (ABANDONED, now, QUEUED, now - STALE_AFTER_S))
+        for job in db.execute('SELECT id, instance FROM jobs WHERE status = ?', (RUNNING,)).fetchall():
+            fd = _try_flock(os.path.join(self.lock_dir, f"instance-{_lock_name(job['instance'])}.lock"))
+            if fd is not None: # Nobody holds the instance: its process is gone
+                os.close(fd)
+                db.execute('UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?', (ABANDONED, now, job['id']))
+
+    def _candidates(self, db, pinned):
+        if pinned:
+            return [pinned]
+        # Least recently used first, so load spreads over the instances
+        last_used = {row['instance']: row['t'] for row in db.execute(
+            'SELECT instance, MAX(claimed_at) AS t FROM jobs WHERE instance IS NOT NULL GROUP BY instance')}
+        return sorted(self.instances, key=lambda instance: last_used.get(instance) or 0)
+
+    def _reserve(self, instance):
+        """flocks for a host slot + the instance itself, or None when either is taken."""
+        instance_fd = _try_flock(os.path.join(self.lock_dir, f"instance-{_lock_name(instance)}.lock"))
+        if instance_fd is None:
+            return None
+        host = urllib.parse.urlsplit(instance).hostname
+        for slot in range(self.host_limit(host)):
+            slot_fd = _try_flock(os.path.join(self.lock_dir, f"host-{host}-{slot}.lock"))
+            if slot_fd is not None:
+                return [instance_fd, slot_fd]
+        os.close(instance_fd)
+        return None
+
+    def try_claim(self, job_id):
+        """
+        Claim the job if it is first in line and an instance is free.
+        Returns (Lease or None, number of jobs ahead in the queue).
+        """
+        now = time.time()
+        with self._transaction() as db:
+            self._recover_stale(db)
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job['status'] != QUEUED:
+                raise RuntimeError(f"job {job_id} is {job['status']}")
+            db.execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (now, job_id))
+            ahead = db.execute('SELECT COUNT(*) FROM jobs WHERE status = ? AND id < ?', (QUEUED, job_id)).fetchone()[0]
+            if ahead:
+                return None, ahead
+
+            for instance in self._candidates(db, job['pinned']):
+                fds = self._reserve(instance)
+                if fds is None:
+                    continue
+                db.execute('UPDATE jobs SET status = ?, instance = ?, claimed_at = ? WHERE id = ?',
+                           (RUNNING, instance, now, job_id))
+                return Lease(self, job_id, instance, fds, now - job['submitted_at']), 0
+            return None, 0
+
+    def finish(self, job_id, status, exit_code=None):
+        with self._transaction() as db:
+            db.execute('UPDATE jobs SET status = ?, finished_at = ?, exit_code = ? WHERE id = ?',
+                       (status, time.time(), exit_code, job_id))
+
+    def wait(self, job_id, timeout_s=None, on_wait=None):
+        """Poll until the job is claimed. on_wait(ahead) is called whenever the queue position changes."""
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+        last_ahead = None
+        while True:
+            lease, ahead = self.try_claim(job_id)
+            if lease:
+                return lease
+            if on_wait and ahead != last_ahead:
+                on_wait(ahead)
+                last_ahead = ahead
+            if deadline is not None and time.monotonic() > deadline:
+                self.finish(job_id, TIMED_OUT)
+                raise QueueTimeout(f"job {job_id} still queued after {timeout_s}s")
+            time.sleep(POLL_S)
+
+    @contextlib.contextmanager
+    def lease(self, kind, label, commit_id=None, url=None, timeout_s=None):
+        """
+        Queue a job and hold an instance for the duration of the block; yields the Lease.
+        A url on one of the configured instances is dispatched to any of them; any other
+        url (e.g. a staging or preview deployment) is pinned to its own scheme+host, with
+        that host's own locks, and never moved.
+        """
+        target = base_url(url or label)
+        pinned = None if target in self.instances else target
+        job_id = self.submit(kind, label, commit_id, pinned)
+
+        def report(ahead):
+            if ahead:
+                print(f"⏳ Job {job_id} queued behind {ahead} job(s)...")
+            else:
+                print(f"⏳ Job {job_id} is next, waiting for a free instance...")
+
+        try:
+            lease = self.wait(job_id, timeout_s, report)
+        except BaseException as e:
+            if not isinstance(e, QueueTimeout):
+                self.finish(job_id, ABANDONED)
+            raise
+        print(f"🚦 Job {job_id} dispatched to {lease.instance} after {lease.queue_latency_s:.1f}s in queue")
+
+        status, exit_code = DONE, 0
+        try:
+            yield lease
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            status = DONE if exit_code == 0 else FAILED
+            raise
+        except BaseException:
+            status, exit_code = FAILED, None
+            raise
+        finally:
+            lease.release(status, exit_code)
+
+    def jobs(self, since=None, statuses=None):
+        query, params = 'SELECT * FROM jobs WHERE 1 = 1', []
+        if since is not None:
+            query += ' AND submitted_at >= ?'
+            params.append(since)
+        if statuses:
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params += list(statuses)
+        with contextlib.closing(self._connect()) as db:
+            return [dict(row) for row in db.execute(query + ' ORDER BY id', params)]
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def job_stats(jobs):
+    """Queue latency / run time percentiles and throughput of finished jobs, overall and per instance."""
+    finished = [j for j in jobs if j['status'] in (DONE, FAILED)]
+
+    def summarize(group):
+        waits = [j['claimed_at'] - j['submitted_at'] for j in group]
+        runs = [j['finished_at'] - j['claimed_at'] for j in group]
+        span_s = max(j['finished_at'] for j in group) - min(j['submitted_at'] for j in group)
+        return {
+            'jobs': len(group),
+            'failed': sum(j['status'] == FAILED for j in group),
+            'queue_p50_s': round(_percentile(waits, 50), 2),
+            'queue_p95_s': round(_percentile(waits, 95), 2),
+            'queue_max_s': round(max(waits), 2),
+            'run_p50_s': round(_percentile(runs, 50), 2),
+            'busy_s': round(sum(runs), 1),
+            'jobs_per_hour': round(len(group) / span_s * 3600, 1) if span_s > 0 else None,
+        }
+
+    stats = {'all': summarize(finished)} if finished else {}
+    for instance in sorted({j['instance'] for j in finished}):
+        stats[instance] = summarize([j for j in finished if j['instance'] == instance])
+    stats['abandoned'] = sum(j['status'] == ABANDONED for j in jobs)
+    stats['timed_out'] = sum(j['status'] == TIMED_OUT for j in jobs)
+    return stats
+
+
+def print_status(scheduler):
+    with scheduler._transaction() as db:
+        scheduler._recover_stale(db)
+    active = scheduler.jobs(statuses=[RUNNING, QUEUED])
+    if not active:
+        print("✅ No queued or running jobs.")
+        return
+    now = time.time()
+    for job in active:
+        if job['status'] == RUNNING:
+            print(f"   🏃 #{job['id']} {job['kind']} {job['label']} ({job['commit_id']}) on {job['instance']}, "
+                  f"running {now - job['claimed_at']:.0f}s, pid {job['pid']}")
+        else:
+            print(f"   ⏳ #{job['id']} {job['kind']} {job['label']} ({job['commit_id']}), "
+                  f"queued {now - job['submitted_at']:.0f}s, pid {job['pid']}")
+
+
+def print_stats(stats, hours):
+    if 'all' not in stats:
+        print(f"ℹ️ No finished jobs in the last {hours}h.")
+    for name, s in stats.items():
+        if not isinstance(s, dict):
+            continue
+        print(f"📊 {name}: {s['jobs']} job(s), {s['failed']} failed, {s['jobs_per_hour']} jobs/h")
+        print(f"   queue latency p50 {s['queue_p50_s']}s, p95 {s['queue_p95_s']}s, max {s['queue_max_s']}s; "
+              f"run p50 {s['run_p50_s']}s, busy {s['busy_s']}s")
+    print(f"   abandoned: {stats['abandoned']}, timed out in queue: {stats['timed_out']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local measurement job scheduler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show queued and running jobs")
+    stats_cmd = sub.add_parser("stats", help="Queue latency and throughput of finished jobs")
+    stats_cmd.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+
+    args = parser.parse_args()
+
+    scheduler = Scheduler.from_config(state_dir=args.state_dir)
+    if args.command == "status":
+        print_status(scheduler)
+    else:
+        print_stats(job_stats(scheduler.jobs(since=time.time() - args.hours * 3600)), args.hours)
+    sys.exit(0)
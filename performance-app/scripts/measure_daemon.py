@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import signal
+import time
+import argparse
+from playwright.async_api import async_playwright
+
+from measure_performance import DEFAULT_DAEMON_ADDRESS, attach_asset_replay, collect_metrics, parse_daemon_address
+
+# Long-lived measurement daemon: keeps a pool of pre-launched Chromium instances
+# and hands each job a fresh context, so CI calls skip browser startup.
+#   python scripts/measure_daemon.py --browsers 2
+#   python scripts/measure_performance.py --url http://localhost:3000/products --commit abc123
+#
+# Protocol: one JSON line per connection.
+#   {"op": "measure", "url": ..., "commit": ..., "replay_assets": false, "network": "WiFi"}
+#                                                -> {"ok": true, "results": {...}, "metrics": {...}}
+#   {"op": "stats"}                              -> {"ok": true, "stats": {...}}
+
+DEFAULT_POOL_SIZE = 2
+METRICS_WINDOW = 1000 # Samples kept per timing series for percentile reporting
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return round(ordered[idx], 2)
+
+
+class BrowserPool:
+    """Fixed pool of warm browsers; each checkout yields a brand-new context on one of them."""
+
+    def __init__(self, playwright, size):
+        self.playwright = playwright
+        self.size = size
+        self.idle = asyncio.Queue()
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.timings = {'queue_wait_ms': [], 'context_checkout_ms': [], 'measure_ms': []}
+        self.started_at = time.time()
+
+    async def start(self):
+        for _ in range(self.size):
+            self.idle.put_nowait(await self.playwright.chromium.launch(headless=True))
+
+    async def close(self):
+        while not self.idle.empty():
+            await self.idle.get_nowait().close()
+
+    def record(self, name, value_ms):
+        series = self.timings[name]
+        series.append(value_ms)
+        if len(series) > METRICS_WINDOW:
+            del series[0]
+
+    async def measure(self, url, commit_id, replay_assets=False, network='WiFi'):
+        queued_at = time.perf_counter()
+        browser = await self.idle.get()
+        queue_wait_ms = (time.perf_counter() - queued_at) * 1000
+
+        try:
+            # Replace browsers that crashed since their last job
+            if not browser.is_connected():
+                browser = await self.playwright.chromium.launch(headless=True)
+
+            checkout_start = time.perf_counter()
+            context = await browser.new_context()
+            replay = await attach_asset_replay(context) if replay_assets else None
+            page = await context.new_page()
+            context_checkout_ms = (time.perf_counter() - checkout_start) * 1000
+
+            try:
+                measure_start = time.perf_counter()
+                results = await collect_metrics(page, url, commit_id, network)
+                measure_ms = (time.perf_counter() - measure_start) * 1000
+            finally:
+                await context.close()
+        finally:
+            self.idle.put_nowait(browser)
+
+        metrics = {
+            'queue_wait_ms': round(queue_wait_ms, 2),
+            'context_checkout_ms': round(context_checkout_ms, 2),
+            'measure_ms': round(measure_ms, 2),
+        }
+        for name, value in metrics.items():
+            self.record(name, value)
+        if replay:
+            stats = replay.stats()
+            metrics['assets_replayed'] = stats['assets_replayed']
+            metrics['assets_changed'] = stats['assets_changed']
+        return results, metrics
+
+    def stats(self):
+        return {
+            'pool_size': self.size,
+            'idle_browsers': self.idle.qsize(),
+            'jobs_done': self.jobs_done,
+            'jobs_failed': self.jobs_failed,
+            'uptime_s': round(time.time() - self.started_at, 1),
+            **{
+                f"{name}_{label}": percentile(values, q)
+                for name, values in self.timings.items()
+                for label, q in (('p50', 50), ('p95', 95), ('max', 100))
+            },
+        }
+
+
+async def handle_client(pool, reader, writer):
+    try:
+        request = json.loads(await reader.readline())
+        op = request.get('op', 'measure')
+
+        if op == 'stats':
+            reply = {'ok': True, 'stats': pool.stats()}
+        elif op == 'measure':
+            try:
+                results, metrics = await pool.measure(request['url'], request.get('commit', 'manual'),
+                                                    request.get('replay_assets', False), request.get('network', 'WiFi'))
+                pool.jobs_done += 1
+                reply = {'ok': True, 'results': results, 'metrics': metrics}
+                print(f"✅ {request['url']} ({results['Commit_ID']}): queue {metrics['queue_wait_ms']}ms, "
+                      f"checkout {metrics['context_checkout_ms']}ms, measure {metrics['measure_ms']}ms")
+            except Exception as e:
+                pool.jobs_failed += 1
+                reply = {'ok': False, 'error': str(e)}
+                print(f"❌ {request.get('url')}: {e}")
+        else:
+            reply = {'ok': False, 'error': f"unknown op {op!r}"}
+    except (json.JSONDecodeError, KeyError) as e:
+        reply = {'ok': False, 'error': f"bad request: {e}"}
+
+    writer.write(json.dumps(reply).encode() + b"\n")
+    await writer.drain()
+    writer.close()
+
+
+async def serve(address, pool_size):
+    kind, target = parse_daemon_address(address)
+
+    async with async_playwright() as p:
+        pool = BrowserPool(p, pool_size)
+        await pool.start()
+
+        handler = lambda r, w: handle_client(pool, r, w)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.remove(target) # Stale socket from a previous run
+            server = await asyncio.start_unix_server(handler, target)
+        else:
+            server = await asyncio.start_server(handler, *target)
+
+        print(f"🚀 Measurement daemon listening on {address} with {pool_size} warm browsers.")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass # Windows: rely on KeyboardInterrupt
+
+        async with server:
+            await stop.wait()
+
+        await pool.close()
+        if kind == 'unix' and os.path.exists(target):
+            os.remove(target)
+        print(f"🛑 Daemon stopped. Final stats: {pool.stats()}")
+
+
+async def print_stats(address):
+    kind, target = parse_daemon_address(address)
+    if kind == 'unix':
+        reader, writer = await asyncio.open_unix_connection(target)
+    else:
+        reader, writer = await asyncio.open_connection(*target)
+    writer.write(b'{"op": "stats"}\n')
+    await writer.drain()
+    print(json.dumps(json.loads(await reader.readline())['stats'], indent=2))
+    writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm-browser measurement daemon")
+    parser.add_argument("--address", default=DEFAULT_DAEMON_ADDRESS, help="host:port or unix:/path")
+    parser.add_argument("--browsers", type=int, default=DEFAULT_POOL_SIZE, help="Number of pre-launched browsers")
+    parser.add_argument("--stats", action="store_true", help="Print metrics of a running daemon and exit")
+
+    args = parser.parse_args()
+
+    if args.stats:
+        asyncio.run(print_stats(args.address))
+    else:
+        asyncio.run(serve(args.address, args.browsers))
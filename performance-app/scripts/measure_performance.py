@@ -1,152 +1,524 @@
 import asyncio
+import json
 import os
 import sys
 import argparse
+import contextlib
+import csv
+import statistics
 from datetime import datetime
-from playwright.async_api import async_playwright
+
+from job_scheduler import QueueTimeout, Scheduler, rebase_url
+from plan_routes import changed_files_from_git, find_route, load_test_config, plan_routes, print_plan
+from web_vitals import COLLECT_SCRIPT, COLLECTOR_SCRIPT, collect_args, vitals_columns
+from sequential_gate import DEFAULT_MAX_SAMPLES, REGRESSION, UNDECIDED, SequentialGate, route_hypotheses
+from network_profiles import (
+    CPU_PROBE_SCRIPT, CPU_THROTTLING_RATES, NETWORK_PROFILES,
+    cell_network_type, emulate, matrix_cells, verify_cpu, verify_network
+)
 
 # Configuration
 DEFAULT_URL = "http://localhost:3000"
 MAX_API_LATENCY_MS = 200
+DEFAULT_COMMIT_ID = "manual" # --commit of a local, untagged run
+
+# Warm-browser daemon (scripts/measure_daemon.py). "host:port" or "unix:/path/to/socket"
+DEFAULT_DAEMON_ADDRESS = os.environ.get("PERF_DAEMON_ADDRESS", "127.0.0.1:8765")
+DAEMON_CONNECT_TIMEOUT_S = 0.5
 
 # Determine the absolute path for the output file
 # Script is in /scripts, we want the file in the parent directory (root of performance-app)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PARENT_DIR = os.path.dirname(SCRIPT_DIR)
 
-async def measure_performance(url, show_ui=False, commit_id="manual"):
-    # Lock File Mechanism
-    LOCK_FILE = os.path.join(SCRIPT_DIR, "performance_test.lock")
-    
-    if os.path.exists(LOCK_FILE):
-        print("⚠️ A performance test is already running. Please wait.")
-        sys.exit(1)
-        
-    # Create lock file
-    with open(LOCK_FILE, 'w') as f:
-        f.write("running")
-        
+BASELINE_PATH = os.path.join(PARENT_DIR, 'models', 'baseline_stats.pkl')
+
+# Network/CPU matrix mode (--matrix): one dataset row per verified cell, with page size
+# and API latency defined as in generate_validation_data.py. Rows of a local run (the
+# default --commit) are tagged healthy so baseline_store.py ingest / compute_baselines
+# use them directly; rows of any other commit are candidates, not baselines, unless
+# --matrix-scenario baseline says otherwise (e.g. a main-branch job).
+MATRIX_OUTPUT_PATH = os.path.join(PARENT_DIR, 'network_matrix.csv')
+MATRIX_SCENARIO = 'baseline'
+MATRIX_CANDIDATE_SCENARIO = 'candidate'
+CPU_PROBE_RUNS = 3
+TTFB_REFERENCE_RUNS = 3
+
+async def collect_vitals(page, url):
+    """Load `url` in an already-open page and return the raw COLLECT_SCRIPT result."""
+    # Buffer every metric in-page from the first byte (see web_vitals.py)
+    await page.add_init_script(COLLECTOR_SCRIPT)
+
+    # Navigate; the collector waits for in-flight API calls and quiet, so networkidle isn't needed
+    await page.goto(url, wait_until="load")
+
+    # --- API latency, LCP, CLS, TBT, navigation timing and sizes in one roundtrip ---
+    return await page.evaluate(COLLECT_SCRIPT, collect_args())
+
+def store_waterfall(vitals, url, commit_id, network_type='WiFi', sample_id=None):
+    """Append the sample's resource timing entries to the waterfall side table. Returns the Sample_ID."""
+    import waterfall_store
+    sample_id = sample_id or waterfall_store.new_sample_id()
+    route = find_route(load_test_config(), url)
     try:
-        print(f"Starting measurement for {url}...")
-        
-        async with async_playwright() as p:
-            # Launch browser
-            browser = await p.chromium.launch(headless=not show_ui)
+        waterfall_store.append(waterfall_store.waterfall_frame(
+            vitals['resources'], url, sample_id, commit_id, route['name'] if route else url, network_type))
+    except OSError as e:
+        print(f"⚠️ Could not store resource waterfall: {e}")
+    return sample_id
+
+async def collect_metrics(page, url, commit_id="manual", network='WiFi'):
+    """Load `url` in an already-open page, under `network` emulation, and return the captured metrics dict."""
+    cdp = await emulate(page, network) # Held until the load is measured
+    vitals = await collect_vitals(page, url)
+    sample_id = store_waterfall(vitals, url, commit_id, network)
+
+    # Combine main document transfer size
+    total_page_size_kb = (vitals['resource_transfer_size'] + vitals['document_transfer_size']) / 1024
+
+    return {
+        "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Commit_ID": commit_id,
+        "Page_Load_Time_ms": round(vitals['load_time_ms'], 2),
+        "LCP_ms": round(vitals['lcp_ms'], 2),
+        "TTFB_ms": round(vitals['ttfb_ms'], 2),
+        "Total_Page_Size_KB": round(total_page_size_kb, 2),
+        "API_Latency_ms": round(vitals['api_duration_ms'], 2),
+        # responseStart - requestStart: the dataset's (and baseline_stats.pkl's) API_Latency_ms
+        "API_TTFB_ms": round(vitals['api_ttfb_ms'] or 0, 2),
+        "Network_Type": network,
+        **vitals_columns(vitals),
+        "Sample_ID": sample_id,
+    }
+
+def print_latency_split(results):
+    """Attribute API latency to the server (Server-Timing phases) and the rest (network, queuing)."""
+    server_ms = results.get("API_Server_ms")
+    if not server_ms:
+        return
+    rest_ms = max(0.0, results["API_Latency_ms"] - server_ms)
+    print(f"   server {server_ms}ms (data fetch {results.get('API_Data_Fetch_ms')}ms, "
+          f"serialization {results.get('API_Serialize_ms')}ms), network/queuing {rest_ms:.2f}ms")
+
+def check_quality_gate(results, max_latency_ms=MAX_API_LATENCY_MS):
+    """Return True when the captured results are within the latency budget."""
+    if results["API_Latency_ms"] > max_latency_ms:
+        print(f"❌ PERFORMANCE REGRESSION DETECTED! API Latency is {results['API_Latency_ms']}ms (Limit: {max_latency_ms}ms).")
+        print_latency_split(results)
+        return False
+    else:
+        print("✅ Performance check passed.")
+        return True
+
+async def measure_in_process(url, show_ui=False, commit_id="manual", replay_assets=False, network='WiFi'):
+    """Cold path: launch a browser just for this measurement."""
+    # Imported on use: `perfcheck measure --help` and the daemon path never need Playwright
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        # Launch browser
+        browser = await p.chromium.launch(headless=not show_ui)
+        try:
             context = await browser.new_context()
+            replay = await attach_asset_replay(context) if replay_assets else None
             page = await context.new_page()
+            results = await collect_metrics(page, url, commit_id, network)
+            if replay:
+                replay.print_report()
+            return results
+        finally:
+            await browser.close()
+
+async def attach_asset_replay(context):
+    """Serve recorded static assets locally in this context (scripts/asset_replay.py)."""
+    from asset_replay import AssetReplay
+    replay = AssetReplay.load()
+    await replay.attach(context)
+    return replay
+
+def parse_daemon_address(address):
+    """'unix:/tmp/perf.sock' -> ('unix', path); 'host:port' -> ('tcp', (host, port))."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+async def request_daemon_measurement(url, commit_id, address=DEFAULT_DAEMON_ADDRESS, replay_assets=False, network='WiFi'):
+    """
+    Send a measurement job to a running measure_daemon.py.
+    Returns None when no daemon is listening so the caller can fall back to the in-process path.
+    """
+    kind, target = parse_daemon_address(address)
+    try:
+        if kind == "unix":
+            connect = asyncio.open_unix_connection(target)
+        else:
+            connect = asyncio.open_connection(*target)
+        reader, writer = await asyncio.wait_for(connect, DAEMON_CONNECT_TIMEOUT_S)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    try:
+        writer.write(json.dumps({"op": "measure", "url": url, "commit": commit_id, "replay_assets": replay_assets,
+                                 "network": network}).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+    finally:
+        writer.close()
+
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error", "daemon measurement failed"))
+    # A daemon started before network emulation existed would measure unthrottled
+    if reply["results"].get("Network_Type", "WiFi") != network:
+        raise RuntimeError(f"daemon at {address} did not apply {network} emulation; restart measure_daemon.py")
+
+    metrics = reply.get("metrics", {})
+    print(f"🔥 Measured by warm daemon ({address}): queue wait {metrics.get('queue_wait_ms')}ms, "
+          f"context checkout {metrics.get('context_checkout_ms')}ms")
+    if "assets_replayed" in metrics:
+        print(f"📦 Asset replay: {metrics['assets_replayed']} static asset(s) served locally")
+        for changed in metrics.get("assets_changed", []):
+            print(f"   ⚠️ Build hash changed, fetched live: {changed}")
+    return reply["results"]
+
+# Measurement jobs queue on the local scheduler (scripts/job_scheduler.py) instead of failing
+# while another run holds the app; each job runs on the instance the scheduler assigns.
+@contextlib.contextmanager
+def measurement_slot(kind, url, commit_id, queue_timeout=None):
+    """Wait for a free app instance; yields `url`, rebased onto it when it points at the instance pool."""
+    try:
+        with Scheduler.from_config().lease(kind, url, commit_id, url, queue_timeout) as lease:
+            yield rebase_url(url, lease.instance)
+    except QueueTimeout as e:
+        print(f"⚠️ Measurement not started: {e}")
+        sys.exit(1)
+
+async def measure_url(url, show_ui=False, commit_id="manual", use_daemon=True, daemon_address=DEFAULT_DAEMON_ADDRESS,
+                      replay_assets=False, network='WiFi'):
+    """Measure one URL (emulating `network`) through the warm daemon when available, otherwise in-process."""
+    results = None
+    # The daemon's browsers are headless, so --headed always runs in-process
+    if use_daemon and not show_ui:
+        results = await request_daemon_measurement(url, commit_id, daemon_address, replay_assets, network)
+    if results is None:
+        results = await measure_in_process(url, show_ui, commit_id, replay_assets, network)
+    return results
+
+def load_route_baseline(route_name, network):
+    """Healthy medians for (route, network) from baseline_stats.pkl, or None if unavailable."""
+    if not route_name or not os.path.exists(BASELINE_PATH):
+        return None
+    import joblib
+    return joblib.load(BASELINE_PATH).get((route_name, network))
+
+async def measure_sequential(url, max_latency_ms, baseline, show_ui=False, commit_id="manual", use_daemon=True,
+                             daemon_address=DEFAULT_DAEMON_ADDRESS, max_samples=DEFAULT_MAX_SAMPLES, replay_assets=False,
+                             network='WiFi'):
+    """
+    Sample the route under `network` emulation until the SPRT is confident (or max_samples),
+    testing against the (route, network) baseline. Returns True on pass.
+    """
+    gate = SequentialGate(route_hypotheses(max_latency_ms, baseline), max_samples=max_samples)
+
+    decision = UNDECIDED
+    while decision == UNDECIDED:
+        results = await measure_url(url, show_ui, commit_id, use_daemon, daemon_address, replay_assets, network)
+        # The baseline medians use the dataset's API latency (request timing), not the resource duration
+        results = {**results, 'API_Latency_ms': results['API_TTFB_ms']}
+        gate.update(results)
+        print(f"   sample {gate.n_samples}: API={results['API_Latency_ms']}ms, LCP={results['LCP_ms']}ms")
+        decision = gate.decision()
+
+    for summary in gate.summary():
+        print(f"   {summary['metric']}: mean {summary['mean']} (H0 {summary['healthy']} / H1 {summary['regressed']}), "
+              f"LLR {summary['llr']} -> {summary['decision']}")
+    cap_note = " (sample cap reached, decided by sample mean)" if gate.hit_cap else ""
+    print(f"🧪 Sequential decision: {decision} after {gate.n_samples} sample(s){cap_note}")
+
+    if decision == REGRESSION:
+        print(f"❌ PERFORMANCE REGRESSION DETECTED! Sequential test favours regression (API budget: {max_latency_ms}ms).")
+        return False
+    print("✅ Performance check passed.")
+    return True
+
+async def gate_url(url, max_latency_ms, route_name=None, show_ui=False, commit_id="manual", use_daemon=True,
+                   daemon_address=DEFAULT_DAEMON_ADDRESS, sequential=None, profile_on_failure=False, replay_assets=False):
+    """
+    Measure one URL and apply the gate. Single page load by default; with
+    sequential={'max_samples': N, 'network': ...} keep sampling until the SPRT decides.
+    With profile_on_failure, a failed route is reloaded once under the CPU profiler.
+    With replay_assets, static assets come from the recorded HAR (API latency gate only).
+    """
+    if sequential:
+        baseline = load_route_baseline(route_name, sequential['network'])
+        if baseline and replay_assets:
+            # Locally served assets make LCP incomparable with the live baseline
+            baseline = {k: v for k, v in baseline.items() if k != 'LCP_ms'}
+        passed = await measure_sequential(url, max_latency_ms, baseline, show_ui, commit_id, use_daemon,
+                                          daemon_address, sequential['max_samples'], replay_assets,
+                                          sequential['network'])
+    else:
+        results = await measure_url(url, show_ui, commit_id, use_daemon, daemon_address, replay_assets)
+        print(f"Captured results: {results}")
+        passed = check_quality_gate(results, max_latency_ms)
+
+    if not passed and profile_on_failure:
+        try:
+            from cpu_profile import profile_url
+            await profile_url(url, show_ui)
+        except Exception as e:
+            print(f"⚠️ CPU profile capture failed: {e}")
+    return passed
+
+def run_pregate(routes):
+    """Bundle pre-gate (scripts/bundle_pregate.py): (routes over budget, routes that still need a browser)."""
+    from bundle_pregate import FAIL, MEASURE, pregate, print_decisions
+    decisions = pregate(routes)
+    print_decisions(decisions)
+    failed = [d['route'] for d in decisions if d['decision'] == FAIL]
+    undecided = {d['route'] for d in decisions if d['decision'] == MEASURE}
+    return failed, [route for route in routes if route['name'] in undecided]
+
+async def measure_performance(url, show_ui=False, commit_id="manual", use_daemon=True, daemon_address=DEFAULT_DAEMON_ADDRESS, sequential=None, profile_on_failure=False, replay_assets=False, pregate=False, queue_timeout=None):
+    route = find_route(load_test_config(), url)
+    if pregate and route:
+        failed, undecided = run_pregate([route])
+        if failed:
+            print(f"❌ PERFORMANCE REGRESSION DETECTED! {route['name']} is over its bundle budget (no browser run).")
+            sys.exit(1)
+        if not undecided:
+            print("✅ Performance check passed (decided by the bundle pre-gate).")
+            sys.exit(0)
 
-            # variables to store metrics
-            api_latency = 0
-            page_size_bytes = 0
-            
-            # Listen for responses to calculate page size and specific API latency
-            def handle_response(response):
-                nonlocal page_size_bytes, api_latency
-                try:
-                    # Sum up transfer size if available (approximation)
-                    # Note: This might not be 100% accurate for all resources due to caching/headers
-                    header_len = int(response.headers.get('content-length', 0))
-                    page_size_bytes += header_len
-                    
-                    if "/api/products" in response.url:
-                        # Calculate latency for this specific API
-                        timing = response.request.timing
-                        if timing:
-                             pass
-                except Exception:
-                    pass
-
-            page.on("response", handle_response)
-            
+    with measurement_slot('measure', url, commit_id, queue_timeout) as url:
+        print(f"Starting measurement for {url}...")
+
+        try:
+            max_latency_ms = route.get('max_latency_ms', MAX_API_LATENCY_MS) if route else MAX_API_LATENCY_MS
+            passed = await gate_url(url, max_latency_ms, route['name'] if route else None, show_ui,
+                                    commit_id, use_daemon, daemon_address, sequential, profile_on_failure, replay_assets)
+
+            # --- Quality Gate Check ---
+            sys.exit(0 if passed else 1)
+
+        except SystemExit:
+            raise # Re-raise SystemExit to ensure proper exit code
+        except Exception as e:
+            print(f"Error measuring performance: {e}")
+            sys.exit(1) # A broken measurement must fail the gate, not pass it
+
+async def measure_planned_routes(base_url, changed_files, show_ui=False, commit_id="manual", use_daemon=True, daemon_address=DEFAULT_DAEMON_ADDRESS, sequential=None, profile_on_failure=False, replay_assets=False, pregate=False, queue_timeout=None):
+    """
+    Measure only the routes in test-config.json affected by changed_files, each against its own budget.
+    With pregate, routes the bundle pre-gate can decide never reach the browser.
+    """
+    plan = plan_routes(changed_files, load_test_config())
+    print_plan(plan, changed_files)
+
+    if not plan['routes']:
+        print("✅ No route is affected by this change. Skipping measurement.")
+        sys.exit(0)
+
+    routes = plan['routes']
+    if pregate:
+        over_budget, routes = run_pregate(routes)
+        if over_budget:
+            # Fail fast: the build output alone shows the regression
+            print(f"❌ {len(over_budget)}/{len(plan['routes'])} route(s) over their bundle budget: {', '.join(over_budget)}")
+            sys.exit(1)
+        if not routes:
+            print(f"✅ All {len(plan['routes'])} affected route(s) passed the bundle pre-gate.")
+            sys.exit(0)
+
+    with measurement_slot('routes', base_url, commit_id, queue_timeout) as base_url:
+        failed = []
+        for route in routes:
+            url = f"{base_url.rstrip('/')}{route['url']}"
+            print(f"Starting measurement for {route['name']} ({url})...")
             try:
-                # Navigate and wait for network idle to ensure most resources are loaded
-                start_time = datetime.now()
-                await page.goto(url, wait_until="networkidle")
-                
-                # --- Measure API Latency via Performance API (More Accurate) ---
-                api_metrics = await page.evaluate(r"""() => {
-                    const entries = performance.getEntriesByType('resource');
-                    const apiEntry = entries.find(e => e.name.includes('/api/products'));
-                    return apiEntry ? apiEntry.duration : 0;
-                }""")
-                
-                # --- Measure LCP ---
-                lcp = await page.evaluate(r"""() => {
-                    return new Promise((resolve) => {
-                        new PerformanceObserver((entryList) => {
-                            const entries = entryList.getEntries();
-                            const lastEntry = entries[entries.length - 1];
-                            resolve(lastEntry.startTime);
-                        }).observe({ type: 'largest-contentful-paint', buffered: true });
-                        
-                        // Fallback if no LCP event fires in 2 seconds
-                        setTimeout(() => resolve(0), 2000);
-                    });
-                }""")
-                
-                # --- Measure TTFB and Page Load Time ---
-                nav_metrics = await page.evaluate(r"""() => {
-                    const nav = performance.getEntriesByType('navigation')[0];
-                    return {
-                        ttfb: nav.responseStart - nav.requestStart,
-                        loadTime: nav.loadEventEnd - nav.startTime,
-                        transferSize: nav.transferSize // Main doc size
-                    };
-                }""")
-                
-                # --- Measure Total Page Size (Resource Timing API) ---
-                total_size = await page.evaluate(r"""() => {
-                    const resources = performance.getEntriesByType('resource');
-                    let size = 0;
-                    for (const r of resources) {
-                        size += (r.transferSize || 0);
-                    }
-                    return size;
-                }""")
-                
-                # Combine main document transfer size
-                total_page_size_kb = (total_size + (nav_metrics['transferSize'] or 0)) / 1024
-
-                results = {
-                    "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "Commit_ID": commit_id,
-                    "Page_Load_Time_ms": round(nav_metrics['loadTime'], 2),
-                    "LCP_ms": round(lcp, 2),
-                    "TTFB_ms": round(nav_metrics['ttfb'], 2),
-                    "Total_Page_Size_KB": round(total_page_size_kb, 2),
-                    "API_Latency_ms": round(api_metrics, 2)
-                }
-
-                print(f"Captured results: {results}")
-                
-                # --- Quality Gate Check ---
-                if results["API_Latency_ms"] > MAX_API_LATENCY_MS:
-                    print(f"❌ PERFORMANCE REGRESSION DETECTED! API Latency is {results['API_Latency_ms']}ms (Limit: {MAX_API_LATENCY_MS}ms).")
-                    sys.exit(1)
-                else:
-                    print("✅ Performance check passed.")
-                    sys.exit(0)
-
-            except SystemExit:
-                raise # Re-raise SystemExit to ensure proper exit code
+                passed = await gate_url(url, route.get('max_latency_ms', MAX_API_LATENCY_MS), route['name'], show_ui,
+                                        commit_id, use_daemon, daemon_address, sequential, profile_on_failure,
+                                        replay_assets)
             except Exception as e:
                 print(f"Error measuring performance: {e}")
-            finally:
-                await browser.close()
+                passed = False
+            if not passed:
+                failed.append(route['name'])
+
+        if failed:
+            print(f"❌ {len(failed)}/{len(routes)} measured route(s) failed: {', '.join(failed)}")
+            sys.exit(1)
+        print(f"✅ All {len(routes)} measured route(s) passed.")
+        sys.exit(0)
+
+async def cpu_probe_ms(browser):
+    """Unthrottled reference time of CPU_PROBE_SCRIPT (best of CPU_PROBE_RUNS)."""
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        return min([await page.evaluate(CPU_PROBE_SCRIPT) for _ in range(CPU_PROBE_RUNS)])
     finally:
-        # cleanup lock file
-        if os.path.exists(LOCK_FILE):
-            try:
-                os.remove(LOCK_FILE)
-            except Exception as e:
-                print(f"Warning: Could not remove lock file: {e}")
+        await context.close()
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Measure web app performance")
+async def reference_ttfb_ms(browser, url):
+    """Unthrottled document TTFB of `url` (median of TTFB_REFERENCE_RUNS fresh contexts)."""
+    samples = []
+    for _ in range(TTFB_REFERENCE_RUNS):
+        context = await browser.new_context()
+        try:
+            samples.append((await collect_vitals(await context.new_page(), url))['ttfb_ms'])
+        finally:
+            await context.close()
+    return statistics.median(samples)
+
+def matrix_scenario(commit_id, scenario=None):
+    """Scenario of matrix rows: explicit, else healthy only for a local (default --commit) run."""
+    if scenario:
+        return scenario
+    return MATRIX_SCENARIO if commit_id == DEFAULT_COMMIT_ID else MATRIX_CANDIDATE_SCENARIO
+
+async def measure_cell(browser, url, route_name, network, cpu_rate, commit_id, reference_probe_ms,
+                       reference_ttfb, scenario):
+    """
+    Measure one matrix cell in its own context, emulation applied to the measured page.
+    Returns (dataset row, emulation verified, verification note).
+    """
+    from generate_validation_data import build_row, track_responses
+
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        await emulate(page, network, cpu_rate)
+        totals = track_responses(page)
+        vitals = await collect_vitals(page, url)
+        probe_ms = await page.evaluate(CPU_PROBE_SCRIPT)
+    finally:
+        await context.close()
+
+    network_ok, network_note = verify_network(vitals, network, reference_ttfb)
+    cpu_ok, cpu_note = verify_cpu(probe_ms, reference_probe_ms, cpu_rate)
+
+    row = build_row({'name': route_name}, cell_network_type(network, cpu_rate), vitals['load_time_ms'],
+                    vitals['lcp_ms'], totals.api_called, totals.api_latency, totals.total_size_bytes,
+                    vitals, scenario)
+    row['Commit_ID'] = commit_id
+    if network_ok and cpu_ok:
+        store_waterfall(vitals, url, commit_id, row['Network_Type'], row['Sample_ID'])
+    return row, network_ok and cpu_ok, f"{network_note}; {cpu_note}"
+
+def append_rows(rows, path=MATRIX_OUTPUT_PATH):
+    """Append dataset rows to a CSV in the validation dataset schema."""
+    from generate_validation_data import COLUMNS
+
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+def default_matrix_workers(cells):
+    """
+    Cells that fit the cores without contending: a CPU rate of N means the cell should get
+    one full core to itself, so cells sharing cores would stack extra slowdown on top of N.
+    """
+    max_rate = max(cpu_rate for _, cpu_rate in cells)
+    return max(1, (os.cpu_count() or 1) // max_rate)
+
+async def measure_matrix(url, show_ui=False, commit_id=DEFAULT_COMMIT_ID, networks=None, cpu_rates=None, workers=None,
+                         output=MATRIX_OUTPUT_PATH, scenario=None):
+    """
+    Measure `url` once per (network, CPU rate) cell in separate contexts, at most `workers`
+    at a time (default: default_matrix_workers(); 0 runs all cells at once).
+    Verified cells are appended to `output`; returns (rows, failed cells).
+    """
+    route = find_route(load_test_config(), url)
+    route_name = route['name'] if route else url
+    cells = matrix_cells(networks, cpu_rates)
+    scenario = matrix_scenario(commit_id, scenario)
+    if workers is None:
+        workers = default_matrix_workers(cells)
+    workers = workers or len(cells)
+    print(f"🧮 Measuring {route_name} across {len(cells)} network/CPU cell(s), {workers} at a time (Scenario={scenario})...")
+
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not show_ui)
+        try:
+            reference_probe_ms = await cpu_probe_ms(browser)
+            # Before the cells start, so concurrent cells don't inflate the reference
+            reference_ttfb = await reference_ttfb_ms(browser, url)
+            limit = asyncio.Semaphore(workers)
+
+            async def run(cell):
+                async with limit:
+                    return await measure_cell(browser, url, route_name, *cell, commit_id, reference_probe_ms,
+                                              reference_ttfb, scenario)
+
+            outcomes = await asyncio.gather(*(run(cell) for cell in cells), return_exceptions=True)
+        finally:
+            await browser.close()
+
+    rows, failed = [], []
+    for (network, cpu_rate), outcome in zip(cells, outcomes):
+        label = cell_network_type(network, cpu_rate)
+        if isinstance(outcome, Exception):
+            print(f"❌ {label}: {outcome}")
+            failed.append(label)
+            continue
+        row, verified, note = outcome
+        if not verified:
+            # An unthrottled load labelled 3G would corrupt that network's baseline
+            print(f"❌ {label}: emulation not applied to the measured page ({note}); row dropped")
+            failed.append(label)
+            continue
+        rows.append(row)
+        print(f"✅ {label}: Load={row['Page_Load_Time_ms']}ms, LCP={row['LCP_ms']}ms, TBT={row['TBT_ms']}ms, "
+              f"API={row['API_Latency_ms']}ms ({note})")
+
+    if rows:
+        append_rows(rows, output)
+        print(f"💾 {len(rows)} row(s) appended to {output}")
+    return rows, failed
+
+def add_arguments(parser):
     parser.add_argument("--url", default=DEFAULT_URL, help="Target URL")
     parser.add_argument("--headed", action="store_true", help="Run in headed mode")
-    parser.add_argument("--commit", default="manual", help="Commit ID tag")
-    
-    args = parser.parse_args()
-    
-    asyncio.run(measure_performance(args.url, args.headed, args.commit))
\ No newline at end of file
+    parser.add_argument("--commit", default=DEFAULT_COMMIT_ID, help="Commit ID tag")
+    parser.add_argument("--daemon", default=DEFAULT_DAEMON_ADDRESS, help="Warm-browser daemon address (host:port or unix:/path)")
+    parser.add_argument("--no-daemon", action="store_true", help="Always launch a browser in-process")
+    parser.add_argument("--changed-files", nargs="*", metavar="FILE", help="Measure only routes in test-config.json affected by these files (--url is the base URL)")
+    parser.add_argument("--diff", metavar="BASE_REF", help="Like --changed-files, using git diff BASE_REF...HEAD")
+    parser.add_argument("--sequential", action="store_true", help="Sample until a sequential test (SPRT) decides pass/regression")
+    parser.add_argument("--max-samples", type=int, default=DEFAULT_MAX_SAMPLES, help="Sample cap for --sequential")
+    parser.add_argument("--network", default="WiFi", choices=list(NETWORK_PROFILES), help="--sequential: emulate this network and test against its route baseline")
+    parser.add_argument("--profile-on-failure", action="store_true", help="Capture a CPU profile + trace of failing routes (scripts/cpu_profile.py)")
+    parser.add_argument("--matrix", action="store_true", help="Measure --url once per network/CPU cell and append dataset rows")
+    parser.add_argument("--networks", nargs="+", choices=list(NETWORK_PROFILES), help="Matrix networks (default: all)")
+    parser.add_argument("--cpu-rates", nargs="+", type=int, default=CPU_THROTTLING_RATES, help="Matrix CPU throttling rates")
+    parser.add_argument("--matrix-workers", type=int,
+                        help="Concurrent matrix cells (default: CPU count // highest CPU rate; 0 = all at once)")
+    parser.add_argument("--matrix-output", default=MATRIX_OUTPUT_PATH, help="CSV the matrix rows are appended to")
+    parser.add_argument("--matrix-scenario", help=f"Scenario of the matrix rows (default: {MATRIX_SCENARIO} for --commit {DEFAULT_COMMIT_ID}, else {MATRIX_CANDIDATE_SCENARIO})")
+    parser.add_argument("--pregate", action="store_true", help="Decide from the .next bundle sizes first; browse only undecided routes (scripts/bundle_pregate.py)")
+    parser.add_argument("--replay-assets", action="store_true", help="Serve static assets from the recorded HAR (scripts/asset_replay.py record)")
+    parser.add_argument("--queue-timeout", type=float, help="Give up (exit 1) when no app instance is free after this many seconds")
+
+def main(args):
+    sequential = {'max_samples': args.max_samples, 'network': args.network} if args.sequential else None
+
+    if args.matrix:
+        with measurement_slot('matrix', args.url, args.commit, args.queue_timeout) as url:
+            _, failed_cells = asyncio.run(measure_matrix(url, args.headed, args.commit, args.networks,
+                                                         args.cpu_rates, args.matrix_workers, args.matrix_output,
+                                                         args.matrix_scenario))
+        sys.exit(1 if failed_cells else 0)
+    elif args.diff or args.changed_files is not None:
+        changed = changed_files_from_git(args.diff) if args.diff else args.changed_files
+        asyncio.run(measure_planned_routes(args.url, changed, args.headed, args.commit, not args.no_daemon, args.daemon, sequential, args.profile_on_failure, args.replay_assets, args.pregate, args.queue_timeout))
+    else:
+        asyncio.run(measure_performance(args.url, args.headed, args.commit, not args.no_daemon, args.daemon, sequential, args.profile_on_failure, args.replay_assets, args.pregate, args.queue_timeout))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure web app performance")
+    add_arguments(parser)
+    main(parser.parse_args())
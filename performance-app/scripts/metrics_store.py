@@ -0,0 +1,186 @@
+import os
+import uuid
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Columnar metrics store (Parquet, Hive-partitioned by Commit_ID / Run_Date).
+#   metrics_store/Commit_ID=clean_baseline/Run_Date=2026-02-18/part-<uuid>-0.parquet
+# Page_Name, Network_Type, Scenario and Dataset are dictionary-encoded, and each
+# ingest writes new part files only (append-only), so nothing is ever rewritten.
+#
+#   python scripts/metrics_store.py migrate            # import the existing CSV datasets
+#   python scripts/metrics_store.py query --scenario baseline --page Products --network 3G
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+STORE_DIR = os.path.join(PERFORMANCE_APP_DIR, 'metrics_store')
+
+# Existing flat CSVs and the Dataset label they get in the store
+LEGACY_DATASETS = {
+    'thesis_final': os.path.join(PERFORMANCE_APP_DIR, 'thesis_final_dataset.csv'),
+    'real_validation': os.path.join(PERFORMANCE_APP_DIR, 'real_validation_data.csv'),
+}
+
+# Rows are sorted by these columns at ingest so Parquet row-group statistics can
+# skip whole groups for the usual scenario/page/network filters
+SORT_KEYS = ['Scenario', 'Page_Name', 'Network_Type', 'Timestamp']
+MAX_ROWS_PER_GROUP = 65_536
+
+OPTIONAL_COLUMNS = ['TBT_ms', 'CLS', 'INP_ms', 'Sample_ID', 'API_Server_ms', 'API_Data_Fetch_ms', 'API_Serialize_ms']
+
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+PARTITION_SCHEMA = pa.schema([
+    ('Commit_ID', pa.string()),
+    ('Run_Date', pa.string()),
+])
+
+SCHEMA = pa.schema([
+    ('Timestamp', pa.timestamp('s')),
+    ('Page_Name', DICT_STRING),
+    ('Network_Type', DICT_STRING),
+    ('Page_Load_Time_ms', pa.float64()),
+    ('Perceived_Load_Time_ms', pa.float64()),
+    ('LCP_ms', pa.float64()),
+    ('API_Latency_ms', pa.float64()),
+    ('API_Measured', pa.int8()),
+    ('Total_Page_Size_KB', pa.float64()),
+    ('Scenario', DICT_STRING),
+    ('Is_Regression', pa.int8()),
+    ('Dataset', DICT_STRING),
+    # Web Vitals (web_vitals.py); null for runs recorded before they were collected
+    ('TBT_ms', pa.float64()),
+    ('CLS', pa.float64()),
+    ('INP_ms', pa.float64()),
+    # Key into the per-resource waterfall table (waterfall_store.py)
+    ('Sample_ID', pa.string()),
+    # API Server-Timing phases (web_vitals.server_timing_columns); null before they were collected
+    ('API_Server_ms', pa.float64()),
+    ('API_Data_Fetch_ms', pa.float64()),
+    ('API_Serialize_ms', pa.float64()),
+]).append(PARTITION_SCHEMA.field('Commit_ID')).append(PARTITION_SCHEMA.field('Run_Date'))
+
+
+def _to_table(df, dataset):
+    df = df.copy()
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    df['Run_Date'] = df['Timestamp'].dt.strftime('%Y-%m-%d')
+    df['Dataset'] = dataset
+    if 'API_Measured' not in df.columns:
+        df['API_Measured'] = (df['API_Latency_ms'] > 0).astype(int)
+    df['Commit_ID'] = df['Commit_ID'].astype(str)
+    for col in OPTIONAL_COLUMNS:
+        if col not in df.columns:
+            df[col] = float('nan')
+    df['Sample_ID'] = df['Sample_ID'].astype('string')
+    df = df.sort_values(SORT_KEYS, kind='stable')
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+def append(df, dataset, store_dir=STORE_DIR):
+    """Append rows as new part files. Returns the number of rows written."""
+    table = _to_table(df, dataset)
+    ds.write_dataset(
+        table,
+        store_dir,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=MAX_ROWS_PER_GROUP,
+    )
+    return table.num_rows
+
+
+def open_store(store_dir=STORE_DIR):
+    return ds.dataset(
+        store_dir,
+        format='parquet',
+        schema=SCHEMA,
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+    )
+
+
+def build_filter(dataset=None, commit=None, date=None, page=None, network=None, scenario=None, is_regression=None):
+    """AND together the given equality filters (a list value means 'any of')."""
+    conditions = {
+        'Dataset': dataset, 'Commit_ID': commit, 'Run_Date': date,
+        'Page_Name': page, 'Network_Type': network, 'Scenario': scenario,
+        'Is_Regression': is_regression,
+    }
+    expr = None
+    for column, value in conditions.items():
+        if value is None:
+            continue
+        field = ds.field(column)
+        cond = field.isin(value) if isinstance(value, (list, tuple, set)) else field == value
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def load(columns=None, store_dir=STORE_DIR, **filters):
+    """
+    Load matching rows as a DataFrame. Partition filters (commit/date) prune directories,
+    column filters are pushed down to Parquet row groups, and only `columns` are read.
+    Dictionary columns come back as pandas categoricals.
+    """
+    table = open_store(store_dir).to_table(columns=columns, filter=build_filter(**filters))
+    return table.to_pandas()
+
+
+def count_rows(store_dir=STORE_DIR, **filters):
+    return open_store(store_dir).count_rows(filter=build_filter(**filters))
+
+
+def migrate_csvs(datasets=LEGACY_DATASETS, store_dir=STORE_DIR):
+    """Import the flat CSV datasets into the store (skips datasets already present)."""
+    existing = set()
+    if os.path.exists(store_dir):
+        existing = set(pc.unique(open_store(store_dir).to_table(columns=['Dataset'])['Dataset']
+                                 .cast(pa.string())).to_pylist())
+
+    for name, csv_path in datasets.items():
+        if name in existing:
+            print(f"⏭️ {name} already in store, skipping.")
+            continue
+        if not os.path.exists(csv_path):
+            print(f"⚠️ {csv_path} not found, skipping.")
+            continue
+        rows = append(pd.read_csv(csv_path), name, store_dir)
+        print(f"✅ Migrated {rows} rows from {os.path.basename(csv_path)} as '{name}'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar metrics store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="Import the existing CSV datasets")
+
+    ingest = sub.add_parser("ingest", help="Append a CSV of samples")
+    ingest.add_argument("csv")
+    ingest.add_argument("--dataset", required=True, help="Dataset label, e.g. real_validation")
+
+    query = sub.add_parser("query", help="Print rows matching filters")
+    for flag in ("dataset", "commit", "date", "page", "network", "scenario"):
+        query.add_argument(f"--{flag}")
+    query.add_argument("--columns", nargs="*")
+
+    parser.add_argument("--store", default=STORE_DIR, help="Store directory")
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_csvs(store_dir=args.store)
+    elif args.command == "ingest":
+        rows = append(pd.read_csv(args.csv), args.dataset, args.store)
+        print(f"✅ Appended {rows} rows to {args.store}.")
+    else:
+        filters = {k: getattr(args, k) for k in ("dataset", "commit", "date", "page", "network", "scenario")}
+        df = load(columns=args.columns, store_dir=args.store, **filters)
+        print(df)
+        print(f"{len(df)} rows")
@@ -0,0 +1,88 @@
+import json
+import os
+
+# Tunable model settings, stored next to the model in models/model_metadata.json:
+#   {"threshold": 0.31, "forest_params": {"n_estimators": 300, ...}, "operating_point": {...},
+#    "pending": {"threshold": ..., "forest_params": {...}, "operating_point": {...}}}
+# tune_model.py stages its pick under "pending"; train_final_model.py fits with the
+# pending forest_params and only then activates the pair, so the live threshold always
+# belongs to the forest that was actually trained. validate_model.py and
+# scoring_server.py read the active threshold. Missing keys fall back to the
+# defaults below, which are the original hardcoded settings.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+METADATA_PATH = os.path.join(PERFORMANCE_APP_DIR, 'models', 'model_metadata.json')
+
+DEFAULT_THRESHOLD = 0.25 # Optimized for 100% Recall in CI
+DEFAULT_FOREST_PARAMS = {
+    'n_estimators': 300,
+    'max_depth': None,
+    'min_samples_leaf': 1,
+    'max_features': 'sqrt',
+}
+
+
+def load_metadata(path=METADATA_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def update_metadata(updates, path=METADATA_PATH):
+    """Merge updates into the metadata file (atomic replace). Returns the new metadata."""
+    metadata = {**load_metadata(path), **updates}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, path)
+    return metadata
+
+
+def decision_threshold(path=METADATA_PATH):
+    """Active threshold; a tuned one still under "pending" is ignored until its forest is trained."""
+    return float(load_metadata(path).get('threshold', DEFAULT_THRESHOLD))
+
+
+def threshold_source(path=METADATA_PATH):
+    """Where the decision threshold comes from, for reports."""
+    metadata = load_metadata(path)
+    if 'threshold' not in metadata:
+        return "default, optimized for 100% Recall in CI"
+    selected_on = metadata.get('operating_point', {}).get('selected_on')
+    if selected_on:
+        return f"tuned by tune_model.py on {selected_on}"
+    # tune_model.py used to select on real_validation_data.csv itself
+    return "tuned on this validation set, so the metrics below are optimistic"
+
+
+def forest_params(path=METADATA_PATH):
+    return {**DEFAULT_FOREST_PARAMS, **load_metadata(path).get('forest_params', {})}
+
+
+def training_params(path=METADATA_PATH):
+    """Forest params for the next full training: the pending tuned ones if staged, else the active ones."""
+    pending = load_metadata(path).get('pending')
+    if pending:
+        return {**DEFAULT_FOREST_PARAMS, **pending['forest_params']}
+    return forest_params(path)
+
+
+def activate_pending(trained_params, path=METADATA_PATH):
+    """
+    Promote the staged threshold/forest_params once a forest was trained with exactly
+    those params. Returns the activated threshold, or None if nothing matched.
+    """
+    metadata = load_metadata(path)
+    pending = metadata.get('pending')
+    if not pending or {**DEFAULT_FOREST_PARAMS, **pending['forest_params']} != trained_params:
+        return None
+    metadata = {key: value for key, value in metadata.items() if key != 'pending'}
+    metadata.update(pending)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, path)
+    return float(pending['threshold'])
@@ -0,0 +1,99 @@
+# Network / CPU emulation shared by the collectors.
+# Emulation is applied through a CDP session opened on the page that is then
+# measured; a session on any other page (or the context's first page) throttles
+# that page only. Each matrix cell is verified after the load:
+#   network: the measured document's TTFB must exceed the unthrottled TTFB of the
+#            same URL by ~the emulated latency
+#   CPU:     a fixed in-page workload must run ~rate x slower than unthrottled
+#
+#   cdp = await emulate(page, '3G', cpu_rate=4)
+#   await page.goto(url)
+#   ok, note = verify_network(vitals, '3G', reference_ttfb_ms)
+
+NETWORK_PROFILES = {
+    'WiFi': None, # No throttling
+    '4G': {
+        'offline': False,
+        'downloadThroughput': 4 * 1024 * 1024 / 8, # 4MB/s
+        'uploadThroughput': 4 * 1024 * 1024 / 8,
+        'latency': 20
+    },
+    '3G': {
+        'offline': False,
+        'downloadThroughput': 750 * 1024 / 8, # 750kb/s
+        'uploadThroughput': 250 * 1024 / 8,
+        'latency': 100
+    }
+}
+
+CPU_THROTTLING_RATES = [1, 4] # 4x ~ mid-range mobile (Lighthouse default)
+# A throttled probe must be at least this fraction of the requested slowdown
+CPU_VERIFY_FRACTION = 0.5
+# A throttled document's TTFB must exceed the unthrottled one by this fraction of the latency
+NETWORK_VERIFY_FRACTION = 0.5
+
+CPU_PROBE_SCRIPT = r"""
+() => {
+    const start = performance.now();
+    let x = 0;
+    for (let i = 0; i < 2e6; i++) x = (x + Math.sqrt(i)) % 1e9;
+    return performance.now() - start;
+}
+"""
+
+
+def cell_network_type(network, cpu_rate=1):
+    """Network_Type label of a matrix cell: '3G', or '3G_CPU4x' with CPU throttling."""
+    return network if cpu_rate == 1 else f"{network}_CPU{cpu_rate}x"
+
+
+def matrix_cells(networks=None, cpu_rates=None):
+    return [(network, rate) for network in (networks or list(NETWORK_PROFILES))
+            for rate in (cpu_rates or CPU_THROTTLING_RATES)]
+
+
+async def emulate(page, network, cpu_rate=1):
+    """Throttle `page` itself. Returns the CDP session (keep it open for the measurement)."""
+    cdp = await page.context.new_cdp_session(page)
+    if NETWORK_PROFILES[network]:
+        await cdp.send('Network.enable')
+        await cdp.send('Network.emulateNetworkConditions', NETWORK_PROFILES[network])
+    if cpu_rate != 1:
+        await cdp.send('Emulation.setCPUThrottlingRate', {'rate': cpu_rate})
+    return cdp
+
+
+def emulate_sync(page, network, cpu_rate=1):
+    """Sync-API counterpart of emulate()."""
+    cdp = page.context.new_cdp_session(page)
+    if NETWORK_PROFILES[network]:
+        cdp.send('Network.enable')
+        cdp.send('Network.emulateNetworkConditions', NETWORK_PROFILES[network])
+    if cpu_rate != 1:
+        cdp.send('Emulation.setCPUThrottlingRate', {'rate': cpu_rate})
+    return cdp
+
+
+def verify_network(vitals, network, reference_ttfb_ms):
+    """
+    (ok, note): the measured document's TTFB must exceed the unthrottled reference
+    TTFB of the same URL by a good part of the emulated latency. An absolute floor
+    would pass unthrottled loads of any page whose SSR alone takes that long.
+    """
+    profile = NETWORK_PROFILES[network]
+    if not profile:
+        return True, "unthrottled"
+    added = vitals['ttfb_ms'] - reference_ttfb_ms
+    if added >= profile['latency'] * NETWORK_VERIFY_FRACTION:
+        return True, f"TTFB +{added:.0f}ms over unthrottled ({profile['latency']}ms latency)"
+    return False, f"TTFB only +{added:.0f}ms over unthrottled (expected ~{profile['latency']}ms latency)"
+
+
+def verify_cpu(probe_ms, reference_ms, cpu_rate):
+    """(ok, note): the in-page probe must be slowed down by a good part of cpu_rate."""
+    if cpu_rate == 1:
+        return True, "unthrottled"
+    slowdown = probe_ms / reference_ms if reference_ms else 0
+    if slowdown >= cpu_rate * CPU_VERIFY_FRACTION:
+        return True, f"probe {slowdown:.1f}x slower"
+    return False, f"probe only {slowdown:.1f}x slower (expected ~{cpu_rate}x)"
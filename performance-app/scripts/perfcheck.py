@@ -0,0 +1,115 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Single entry point for the pipeline scripts:
+#   python scripts/perfcheck.py measure --diff origin/main     # measure_performance.py
+#   python scripts/perfcheck.py generate --workers 4           # generate_validation_data.py
+#   python scripts/perfcheck.py finalize --store               # finalize_validation_data.py
+#   python scripts/perfcheck.py train                          # train_final_model.py
+#   python scripts/perfcheck.py validate                       # validate_model.py
+#   python scripts/perfcheck.py score --port 8000              # scoring_server.py
+# Only the chosen subcommand's module is imported, and those modules import
+# pandas/scikit-learn/joblib/matplotlib/Playwright inside the functions that need
+# them, so `--help` and argument errors return without loading any of them.
+#   python scripts/perfcheck.py --profile-startup measure --help   # import time per module
+# benchmark_startup.py keeps the cold start of `perfcheck measure --help` within budget.
+
+COMMANDS = {
+    'measure': ('measure_performance', "Measure a URL, the routes affected by a change, or a network/CPU matrix"),
+    'generate': ('generate_validation_data', "Generate live validation samples"),
+    'finalize': ('finalize_validation_data', "Merge and label the healthy/regression validation runs"),
+    'train': ('train_final_model', "Train the regression classifier on the thesis dataset"),
+    'validate': ('validate_model', "Validate the trained model on the live validation data"),
+    'score': ('scoring_server', "Serve the model over HTTP for regression scoring"),
+}
+
+PROFILE_TOP_MODULES = 10
+PROFILE_EXPAND_FRACTION = 0.2 # Expand modules taking at least this share of import time
+
+# `python -X importtime` stderr: "import time: self [us] | cumulative | imported package"
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='perfcheck', description="Performance regression pipeline")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Run the command under `python -X importtime` and report import time per module")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    for name, (_, help_text) in COMMANDS.items():
+        # Options belong to the subcommand's own parser, built after its module is imported
+        sub.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+
+def command_parser(name, module):
+    parser = argparse.ArgumentParser(prog=f"perfcheck {name}", description=COMMANDS[name][1])
+    module.add_arguments(parser)
+    return parser
+
+
+def parse_importtime(stderr):
+    """
+    Top-level imports from `-X importtime` output as [(module, self_ms, cumulative_ms, children)],
+    children being that module's direct imports in the same form (without children).
+    """
+    rows, pending = [], []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        depth = len(indent) // 2
+        # A module's line follows the lines of everything it imported
+        if depth == 1:
+            pending.append((module, int(self_us) / 1000, int(cumulative_us) / 1000, []))
+        elif depth == 0:
+            rows.append((module, int(self_us) / 1000, int(cumulative_us) / 1000, pending))
+            pending = []
+    return rows
+
+
+def profile_startup(argv):
+    """Run `perfcheck argv` in a fresh interpreter with -X importtime; print the import breakdown."""
+    cmd = [sys.executable, '-X', 'importtime', os.path.abspath(__file__), *argv]
+    start = time.perf_counter()
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    sys.stdout.write(out.stdout)
+    rows = parse_importtime(out.stderr)
+    other = [line for line in out.stderr.splitlines() if not _IMPORTTIME_RE.match(line)
+             and not line.startswith('import time:')]
+    if other:
+        sys.stderr.write('\n'.join(other) + '\n')
+
+    import_ms = sum(row[2] for row in rows)
+    print(f"\n⏱️ perfcheck {' '.join(argv)}: {wall_ms:.0f} ms wall, {import_ms:.0f} ms in imports")
+    print(f"   {'module':<40} {'cumulative':>10} {'self':>8}")
+    for module, self_ms, cumulative_ms, children in sorted(rows, key=lambda row: -row[2])[:PROFILE_TOP_MODULES]:
+        print(f"   {module:<40} {cumulative_ms:8.1f}ms {self_ms:6.1f}ms")
+        # Break the expensive ones down one level (e.g. the subcommand's module)
+        if cumulative_ms >= PROFILE_EXPAND_FRACTION * import_ms:
+            for child, child_self_ms, child_ms, _ in sorted(children, key=lambda row: -row[2])[:PROFILE_TOP_MODULES]:
+                print(f"     {child:<38} {child_ms:8.1f}ms {child_self_ms:6.1f}ms")
+    return out.returncode
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args, rest = build_parser().parse_known_args(argv)
+
+    if args.profile_startup:
+        return profile_startup([arg for arg in argv if arg != '--profile-startup'])
+
+    # __import__ (not importlib.import_module) so -X importtime attributes the import to the module
+    module = __import__(COMMANDS[args.command][0])
+    module.main(command_parser(args.command, module).parse_args(rest))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import fnmatch
+import json
+import os
+import subprocess
+import argparse
+
+# Change-impact planner: maps changed files onto the routes in test-config.json.
+#   global_triggers      -> any match re-measures every route
+#   routes[].trigger_files -> a match re-measures that route only
+#   source_roots         -> a changed file under one of these that matches no
+#                           trigger re-measures every route (fail safe, not skip)
+# Trigger entries are matched against the tail of each changed path, so
+# "app/page.tsx" matches "performance-app/src/app/page.tsx". Entries ending in
+# "/" match a directory anywhere in the path; "*", "?" and "[...]" are globs.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+CONFIG_PATH = os.path.join(PARENT_DIR, 'test-config.json')
+
+
+def load_test_config(path=CONFIG_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def changed_files_from_git(base_ref, head_ref='HEAD', cwd=PARENT_DIR):
+    """Files changed between the merge base of base_ref and head_ref."""
+    out = subprocess.run(
+        ['git', 'diff', '--name-only', f'{base_ref}...{head_ref}'],
+        cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout
+    return [line.strip() for line in out.splitlines() if line.strip()]
+
+
+def _normalize(path):
+    path = path.replace('\\', '/')
+    while path.startswith('./'):
+        path = path[2:]
+    return path
+
+
+def matches_trigger(path, trigger):
+    path = _normalize(path)
+    trigger = _normalize(trigger)
+
+    if trigger.endswith('/'):
+        return f'/{trigger}' in f'/{path}'
+
+    if any(ch in trigger for ch in '*?['):
+        # Try the glob against every path suffix ("a/b/c", "b/c", "c")
+        parts = path.split('/')
+        return any(fnmatch.fnmatchcase('/'.join(parts[i:]), trigger) for i in range(len(parts)))
+
+    return path == trigger or path.endswith(f'/{trigger}')
+
+
+def plan_routes(changed_files, config):
+    """
+    Decide which routes to measure for a change set.
+    Returns {'mode': 'all'|'selected'|'none', 'routes': [...], 'reasons': {route_name: [files]}}.
+    """
+    global_hits = [
+        f for f in changed_files
+        if any(matches_trigger(f, t) for t in config.get('global_triggers', []))
+    ]
+    # Application code no trigger knows about could affect any route
+    route_triggers = [t for route in config['routes'] for t in route.get('trigger_files', [])]
+    global_hits += [
+        f for f in changed_files
+        if f not in global_hits
+        and any(matches_trigger(f, root) for root in config.get('source_roots', []))
+        and not any(matches_trigger(f, t) for t in route_triggers)
+    ]
+    if global_hits:
+        return {
+            'mode': 'all',
+            'routes': list(config['routes']),
+            'reasons': {route['name']: global_hits for route in config['routes']},
+        }
+
+    selected, reasons = [], {}
+    for route in config['routes']:
+        hits = [f for f in changed_files if any(matches_trigger(f, t) for t in route.get('trigger_files', []))]
+        if hits:
+            selected.append(route)
+            reasons[route['name']] = hits
+
+    return {'mode': 'selected' if selected else 'none', 'routes': selected, 'reasons': reasons}
+
+
+def find_route(config, url):
+    """Route whose url matches the path of `url` (e.g. http://localhost:3000/products), or None."""
+    from urllib.parse import urlparse
+    path = urlparse(url).path or '/'
+    for route in config['routes']:
+        if route['url'].rstrip('/') == path.rstrip('/'):
+            return route
+    return None
+
+
+def print_plan(plan, changed_files):
+    print(f"🧭 {len(changed_files)} changed file(s) -> {len(plan['routes'])} route(s) to measure ({plan['mode']}).")
+    for route in plan['routes']:
+        files = plan['reasons'][route['name']]
+        shown = ', '.join(files[:3]) + (f" (+{len(files) - 3} more)" if len(files) > 3 else '')
+        print(f"   - {route['name']} ({route['url']}, budget {route['max_latency_ms']}ms) <- {shown}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Select routes to measure from a change set")
+    parser.add_argument("files", nargs="*", help="Changed files (instead of --diff)")
+    parser.add_argument("--diff", metavar="BASE_REF", help="Use files changed since BASE_REF (git diff BASE_REF...HEAD)")
+    parser.add_argument("--config", default=CONFIG_PATH, help="Path to test-config.json")
+    parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+
+    args = parser.parse_args()
+
+    changed = changed_files_from_git(args.diff) if args.diff else args.files
+    plan = plan_routes(changed, load_test_config(args.config))
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        print_plan(plan, changed)
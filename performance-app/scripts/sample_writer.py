@@ -0,0 +1,197 @@
+import json
+import os
+import random
+
+# Streaming, checkpointed output for long sample-collection runs.
+# Rows are appended to a CSV spool in small fsync'd batches. After every batch a
+# checkpoint (<output>.ckpt.json) records the next sample index, the CSV byte
+# offset and the plan RNG state, so an interrupted run resumes exactly where the
+# last durable batch ended.
+
+CHECKPOINT_SUFFIX = '.ckpt.json'
+DEFAULT_BATCH_SIZE = 25
+EXPORT_CHUNK_ROWS = 50_000
+
+# Stable dtypes so every exported chunk shares one columnar schema
+EXPORT_DTYPES = {
+    'Timestamp': 'string',
+    'Page_Name': 'string',
+    'Network_Type': 'string',
+    'Page_Load_Time_ms': 'float64',
+    'Perceived_Load_Time_ms': 'float64',
+    'LCP_ms': 'float64',
+    'API_Latency_ms': 'float64',
+    'API_Measured': 'int64',
+    'Total_Page_Size_KB': 'float64',
+    'Scenario': 'string',
+    'Commit_ID': 'string',
+    'Is_Regression': 'int64',
+    'TBT_ms': 'float64',
+    'CLS': 'float64',
+    'INP_ms': 'float64',
+    'Sample_ID': 'string',
+    'API_Server_ms': 'float64',
+    'API_Data_Fetch_ms': 'float64',
+    'API_Serialize_ms': 'float64',
+}
+
+
+def checkpoint_path(output_path):
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def load_checkpoint(output_path):
+    path = checkpoint_path(output_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _encode_rng_state(state):
+    version, internal, gauss = state
+    return [version, list(internal), gauss]
+
+
+def _decode_rng_state(state):
+    version, internal, gauss = state
+    return (version, tuple(internal), gauss)
+
+
+class SamplePlan:
+    """
+    Lazily draws (index, choice...) tuples from a seedable RNG.
+    After each draw the RNG state is remembered so the writer can checkpoint
+    the exact state needed to continue from the next index.
+    """
+
+    def __init__(self, total, draw, seed=None, start_index=0, rng_state=None):
+        self.total = total
+        self.draw = draw
+        self.start_index = start_index
+        self.rng = random.Random(seed)
+        if rng_state is not None:
+            self.rng.setstate(_decode_rng_state(rng_state))
+        self.states = {}
+
+    def __iter__(self):
+        for i in range(self.start_index, self.total):
+            choice = self.draw(self.rng)
+            self.states[i] = self.rng.getstate()
+            yield (i,) + tuple(choice)
+
+    def state_after(self, index):
+        return self.states.pop(index)
+
+
+class CheckpointedWriter:
+    """
+    Appends rows to a CSV in sample-index order, flushing every batch_size samples.
+    Out-of-order completions (concurrent workers) are held until the gap before them closes.
+    """
+
+    def __init__(self, output_path, columns, plan, batch_size=DEFAULT_BATCH_SIZE):
+        self.output_path = output_path
+        self.columns = columns
+        self.plan = plan
+        self.batch_size = batch_size
+        self.next_index = plan.start_index
+        self.pending = {}
+        self.batch = []
+        self.batch_samples = 0
+        self.rows_written = 0
+        self.resume_state = None
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    @classmethod
+    def open(cls, output_path, columns, total, draw, seed=None, resume=False, batch_size=DEFAULT_BATCH_SIZE):
+        """Start a fresh run, or continue from the checkpoint when resume=True and one exists."""
+        checkpoint = load_checkpoint(output_path) if resume else None
+
+        if checkpoint:
+            # Drop any rows appended after the last durable checkpoint
+            with open(output_path, 'r+b') as f:
+                f.truncate(checkpoint['bytes'])
+            plan = SamplePlan(total, draw, start_index=checkpoint['next_index'], rng_state=checkpoint['rng_state'])
+            writer = cls(output_path, columns, plan, batch_size)
+            writer.rows_written = checkpoint['rows_written']
+            writer.resume_state = checkpoint['rng_state']
+            print(f"⏯️ Resuming at sample {checkpoint['next_index'] + 1}/{total} ({checkpoint['rows_written']} rows on disk).")
+        else:
+            plan = SamplePlan(total, draw, seed=seed)
+            writer = cls(output_path, columns, plan, batch_size)
+            import pandas as pd # Imported on use so the collectors' --help stays light
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False)
+            writer.resume_state = _encode_rng_state(plan.rng.getstate())
+            writer._write_checkpoint()
+        return writer
+
+    def record(self, index, row):
+        """Register the outcome of sample `index` (row=None for a failed sample)."""
+        self.pending[index] = row
+        while self.next_index in self.pending:
+            row = self.pending.pop(self.next_index)
+            self.resume_state = _encode_rng_state(self.plan.state_after(self.next_index))
+            if row is not None:
+                self.batch.append(row)
+            self.batch_samples += 1
+            self.next_index += 1
+            if self.batch_samples >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self.batch:
+            import pandas as pd
+            with open(self.output_path, 'a', newline='', encoding='utf-8') as f:
+                pd.DataFrame(self.batch, columns=self.columns).to_csv(f, header=False, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            self.rows_written += len(self.batch)
+        self.batch = []
+        self.batch_samples = 0
+        self._write_checkpoint()
+
+    def close(self):
+        """Flush the tail and remove the checkpoint once every sample is accounted for."""
+        self.flush()
+        if self.next_index >= self.plan.total:
+            os.remove(checkpoint_path(self.output_path))
+
+    def _write_checkpoint(self):
+        state = {
+            'next_index': self.next_index,
+            'total': self.plan.total,
+            'rows_written': self.rows_written,
+            'bytes': os.path.getsize(self.output_path),
+            'rng_state': self.resume_state,
+        }
+        tmp_path = checkpoint_path(self.output_path) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, checkpoint_path(self.output_path))
+
+
+def export_parquet(csv_path, parquet_path=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Convert a CSV spool to Parquet chunk by chunk, keeping memory flat for large runs."""
+    import pandas as pd
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    parquet_path = parquet_path or os.path.splitext(csv_path)[0] + '.parquet'
+    writer = None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=EXPORT_DTYPES):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return parquet_path
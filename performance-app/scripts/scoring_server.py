@@ -0,0 +1,308 @@
+import json
+import os
+import signal
+import threading
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from compiled_forest import COMPILED_MODEL_PATH, CompiledForest, load_model
+from features import CATEGORICAL_FEATURES, DELTA_COLUMNS, NUMERIC_FEATURES, RAW_METRICS, model_features
+from model_metadata import decision_threshold
+
+# Local regression scoring service. Loads the pipeline and baselines once and
+# scores raw metric rows over HTTP:
+#   POST /score   {"Page_Name": "Products", "Network_Type": "3G", "API_Latency_ms": 2100, ...}
+#                 or {"rows": [{...}, {...}]}
+#                 -> {"Regression_Prob", "Is_Regression", "Baseline_Missing", "Features_Missing"}
+#                 Optional model features (TBT_ms, CLS, server-timing columns) absent from a
+#                 row score as 0 and are listed in Features_Missing, so callers can tell.
+#   POST /reload  {"model_path": ..., "baseline_path": ...}   (hot reload; SIGHUP reloads defaults)
+#   GET  /health
+# With --compiled the forest is evaluated from the exported .npz (compiled_forest.py):
+# no sklearn import and no pipeline unpickling at startup or on reload. A missing,
+# unreadable or stale .npz falls back to the pickled pipeline.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+MODEL_DIR = os.path.join(PERFORMANCE_APP_DIR, 'models')
+MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.pkl')
+BASELINE_PATH = os.path.join(MODEL_DIR, 'baseline_stats.pkl')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+# Fast path must agree with Pipeline.predict_proba to this tolerance or it is disabled
+FAST_PATH_TOLERANCE = 1e-9
+
+
+def _leaf_regression_proba(tree):
+    # Same normalisation as DecisionTreeClassifier.predict_proba, precomputed per node
+    values = tree.value[:, 0, :2]
+    normalizer = values.sum(axis=1)
+    normalizer[normalizer == 0.0] = 1.0
+    return values[:, 1] / normalizer
+
+
+class RegressionScorer:
+    """
+    Scores raw metric rows with a loaded model/baseline pair.
+    Single rows and small batches skip pandas and sklearn's per-call overhead: deltas
+    come from a dict lookup, the ColumnTransformer is applied with NumPy, and the
+    forest's trees are evaluated directly. The fast path is checked against the
+    pipeline at load time and falls back to it if the model layout is unexpected.
+    With compiled_path, rows are scored by the CompiledForest instead (same result).
+    """
+
+    def __init__(self, model_path=MODEL_PATH, baseline_path=BASELINE_PATH, threshold=None, compiled_path=None):
+        self.model_path = model_path
+        self.baseline_path = baseline_path
+        self.compiled_path = compiled_path
+        # Same operating point as validate_model.py (model_metadata.json) unless overridden
+        self.threshold_override = threshold
+        self.threshold = decision_threshold() if threshold is None else threshold
+
+        import joblib
+        self.model = load_model(model_path, compiled_path, compiled=compiled_path is not None)
+        self.baselines = joblib.load(baseline_path)
+        self.loaded_at = time.time()
+
+        if isinstance(self.model, CompiledForest):
+            self.numeric_features, categorical_features = model_features(self.model)
+            # _raw_features fills NUMERIC_FEATURES first, like the pipeline's column order
+            if self.numeric_features[:len(NUMERIC_FEATURES)] != NUMERIC_FEATURES or categorical_features != CATEGORICAL_FEATURES:
+                raise ValueError(f"Compiled model has unexpected input columns: {self.numeric_features + categorical_features}")
+            self.fast = None
+            return
+
+        # Single-row calls are dominated by joblib dispatch when n_jobs=-1
+        classifier = self.model.named_steps['classifier']
+        if hasattr(classifier, 'n_jobs'):
+            classifier.n_jobs = 1
+
+        # NUMERIC_FEATURES, then any VITALS_FEATURES / SERVER_TIMING_FEATURES the model was trained on
+        self.numeric_features, _ = model_features(self.model)
+        self.fast = self._compile_fast_path()
+
+    def _compile_fast_path(self):
+        try:
+            preprocessor = self.model.named_steps['preprocessor']
+            classifier = self.model.named_steps['classifier']
+            transformers = {name: (est, cols) for name, est, cols in preprocessor.transformers_}
+            scaler, num_cols = transformers['num']
+            encoder, cat_cols = transformers['cat']
+            if list(num_cols)[:len(NUMERIC_FEATURES)] != NUMERIC_FEATURES or list(cat_cols) != CATEGORICAL_FEATURES:
+                return None
+            if list(classifier.classes_) != [0, 1]:
+                return None
+
+            fast = {
+                'mean': scaler.mean_ if scaler.with_mean else np.zeros(len(num_cols)),
+                'scale': scaler.scale_ if scaler.with_std else np.ones(len(num_cols)),
+                'categories': [
+                    {value: offset for offset, value in enumerate(cats)} for cats in encoder.categories_
+                ],
+                'widths': [len(cats) for cats in encoder.categories_],
+                # (tree, P(regression) per node) so scoring is one apply() + lookup per tree
+                'trees': [(est.tree_, _leaf_regression_proba(est.tree_)) for est in classifier.estimators_],
+            }
+        except (AttributeError, KeyError, ValueError):
+            return None
+
+        # Verify against the real pipeline on every baseline key
+        probe = [
+            {'Page_Name': page, 'Network_Type': net, 'API_Measured': 1, 'Total_Page_Size_KB': 700.0,
+             **{metric: value + 150.0 for metric, value in base.items()},
+             **{col: 100.0 for col in self.numeric_features[len(NUMERIC_FEATURES):]}}
+            for (page, net), base in self.baselines.items()
+        ]
+        if not probe:
+            return None
+        self.fast = fast
+        numeric, categorical, _, _ = self._raw_features(probe)
+        expected = self.model.predict_proba(self._as_frame(numeric, categorical))[:, 1]
+        actual = self._fast_proba(numeric, categorical)
+        if np.max(np.abs(expected - actual)) > FAST_PATH_TOLERANCE:
+            print("⚠️ Fast scoring path disagrees with the pipeline; using Pipeline.predict_proba.")
+            return None
+        return fast
+
+    def _raw_features(self, rows):
+        """
+        Numeric feature matrix (self.numeric_features order), categorical columns,
+        missing-baseline flags and, per row, the optional feature columns it lacks.
+        """
+        extra_features = self.numeric_features[len(NUMERIC_FEATURES):]
+        numeric = np.empty((len(rows), len(self.numeric_features)))
+        categorical = []
+        missing = []
+        absent = []
+        for i, row in enumerate(rows):
+            key = (row['Page_Name'], row['Network_Type'])
+            base = self.baselines.get(key)
+            api_latency = row.get('API_Latency_ms') or 0
+            values = {**row, 'API_Latency_ms': api_latency}
+            for j, metric in enumerate(RAW_METRICS):
+                numeric[i, j] = float(values[metric]) - base[metric] if base else 0.0
+            numeric[i, len(DELTA_COLUMNS)] = float(row.get('API_Measured', 1 if api_latency > 0 else 0))
+            numeric[i, len(DELTA_COLUMNS) + 1] = float(row['Total_Page_Size_KB'])
+            for j, col in enumerate(extra_features, start=len(NUMERIC_FEATURES)):
+                numeric[i, j] = float(row.get(col) or 0.0)
+            categorical.append([row[col] for col in CATEGORICAL_FEATURES])
+            missing.append(base is None)
+            absent.append([col for col in extra_features if row.get(col) is None])
+        return numeric, categorical, missing, absent
+
+    def _as_frame(self, numeric, categorical):
+        import pandas as pd
+        frame = pd.DataFrame(numeric, columns=self.numeric_features)
+        for j, col in enumerate(CATEGORICAL_FEATURES):
+            frame[col] = [cats[j] for cats in categorical]
+        return frame[self.numeric_features + CATEGORICAL_FEATURES]
+
+    def _fast_proba(self, numeric, categorical):
+        fast = self.fast
+        width = sum(fast['widths'])
+        onehot = np.zeros((len(categorical), width))
+        for i, cats in enumerate(categorical):
+            offset = 0
+            for j, value in enumerate(cats):
+                pos = fast['categories'][j].get(value)
+                if pos is not None: # handle_unknown='ignore' -> all zeros
+                    onehot[i, offset + pos] = 1.0
+                offset += fast['widths'][j]
+        X = np.ascontiguousarray(
+            np.hstack([(numeric - fast['mean']) / fast['scale'], onehot]), dtype=np.float32
+        )
+
+        total = np.zeros(len(X))
+        for tree, leaf_proba in fast['trees']:
+            total += leaf_proba[tree.apply(X)]
+        return total / len(fast['trees'])
+
+    def score(self, rows):
+        numeric, categorical, missing, absent = self._raw_features(rows)
+        if isinstance(self.model, CompiledForest):
+            probs = self.model.predict_proba_transformed(self.model.transform(numeric, categorical))[:, 1]
+        elif self.fast is not None:
+            probs = self._fast_proba(numeric, categorical)
+        else:
+            probs = self.model.predict_proba(self._as_frame(numeric, categorical))[:, 1]
+        return [
+            {
+                'Regression_Prob': round(float(p), 6),
+                'Is_Regression': int(p >= self.threshold),
+                'Baseline_Missing': bool(m),
+                'Features_Missing': a,
+            }
+            for p, m, a in zip(probs, missing, absent)
+        ]
+
+    def info(self):
+        return {
+            'model_path': self.model_path,
+            'baseline_path': self.baseline_path,
+            'threshold': self.threshold,
+            'compiled': isinstance(self.model, CompiledForest),
+            'fast_path': self.fast is not None,
+            'loaded_at': self.loaded_at,
+        }
+
+
+class ScoringService:
+    """Holds the current scorer; reloads build a new scorer and swap it in atomically."""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.reload_lock = threading.Lock()
+
+    def reload(self, model_path=None, baseline_path=None, threshold=None, compiled_path=None):
+        with self.reload_lock:
+            current = self.scorer
+            self.scorer = RegressionScorer(
+                model_path or current.model_path,
+                baseline_path or current.baseline_path,
+                threshold if threshold is not None else current.threshold_override,
+                compiled_path or current.compiled_path,
+            )
+        print(f"🔄 Model reloaded: {self.scorer.info()}")
+        return self.scorer.info()
+
+
+def make_handler(service):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'ok': True, **service.scorer.info()})
+            else:
+                self._reply(404, {'ok': False, 'error': 'not found'})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if self.path == '/score':
+                    single = 'rows' not in payload
+                    results = service.scorer.score([payload] if single else payload['rows'])
+                    self._reply(200, results[0] if single else {'results': results})
+                elif self.path == '/reload':
+                    self._reply(200, {'ok': True, **service.reload(**payload)})
+                else:
+                    self._reply(404, {'ok': False, 'error': 'not found'})
+            except (KeyError, ValueError, TypeError) as e:
+                self._reply(400, {'ok': False, 'error': f"bad request: {e}"})
+            except Exception as e:
+                self._reply(500, {'ok': False, 'error': str(e)})
+
+        def log_message(self, format, *args):
+            pass # Keep per-request logging off the hot path
+
+    return ScoringHandler
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, model_path=MODEL_PATH, baseline_path=BASELINE_PATH, threshold=None,
+          compiled_path=None):
+    service = ScoringService(RegressionScorer(model_path, baseline_path, threshold, compiled_path))
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=service.reload).start())
+
+    print(f"🚀 Scoring server on http://{host}:{port} ({service.scorer.info()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default=MODEL_PATH, help="Path to the trained pipeline")
+    parser.add_argument("--baselines", default=BASELINE_PATH, help="Path to baseline_stats.pkl")
+    parser.add_argument("--threshold", type=float, help="Decision threshold on Regression_Prob (default: model_metadata.json)")
+    parser.add_argument("--compiled", nargs="?", const=COMPILED_MODEL_PATH, metavar="NPZ",
+                        help="Score with the compiled forest (default: models/final_thesis_model.npz); falls back to --model")
+
+
+def main(args):
+    serve(args.host, args.port, args.model, args.baselines, args.threshold, args.compiled)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regression scoring server")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,134 @@
+import math
+
+# Sequential probability ratio test (Wald's SPRT) for the CI gate.
+# For each metric we test
+#   H0: mean = healthy  (the route baseline)
+#   H1: mean = regressed (e.g. the route's latency budget)
+# under a Gaussian model and stop sampling as soon as the log-likelihood ratio
+# crosses log((1-beta)/alpha) (regression) or log(beta/(1-alpha)) (pass).
+# Clear passes and clear regressions stop after min_samples; only samples near
+# the midpoint keep the test running, up to max_samples.
+
+DEFAULT_ALPHA = 0.05        # P(flag a regression | healthy)
+DEFAULT_BETA = 0.05         # P(pass | regressed)
+DEFAULT_MIN_SAMPLES = 2
+DEFAULT_MAX_SAMPLES = 10
+# Prior noise scale as a fraction of the healthy->regressed gap, used until the
+# sample standard deviation is available (and as its floor afterwards)
+SIGMA_FLOOR_FRACTION = 0.25
+HEALTHY_CAP_FRACTION = 0.8
+
+PASS = 'pass'
+REGRESSION = 'regression'
+UNDECIDED = 'undecided'
+
+
+class MetricSPRT:
+    """Running SPRT for one metric."""
+
+    def __init__(self, metric, healthy, regressed, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA):
+        if regressed <= healthy:
+            raise ValueError(f"{metric}: regressed level ({regressed}) must exceed healthy level ({healthy})")
+        self.metric = metric
+        self.healthy = healthy
+        self.regressed = regressed
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.samples = []
+        self.llr = 0.0
+
+    @property
+    def sigma(self):
+        floor = (self.regressed - self.healthy) * SIGMA_FLOOR_FRACTION
+        n = len(self.samples)
+        if n < 2:
+            return floor
+        mean = sum(self.samples) / n
+        std = math.sqrt(sum((x - mean) ** 2 for x in self.samples) / (n - 1))
+        return max(std, floor)
+
+    def update(self, x):
+        self.samples.append(x)
+        # Gaussian LLR with the current sigma estimate, recomputed over all samples
+        gap = self.regressed - self.healthy
+        midpoint = (self.healthy + self.regressed) / 2
+        self.llr = gap / self.sigma ** 2 * sum(s - midpoint for s in self.samples)
+
+    def decision(self):
+        if self.llr >= self.upper:
+            return REGRESSION
+        if self.llr <= self.lower:
+            return PASS
+        return UNDECIDED
+
+    def forced_decision(self):
+        """Decision at the sample cap: whichever hypothesis the sample mean is closer to."""
+        mean = sum(self.samples) / len(self.samples)
+        return REGRESSION if mean > (self.healthy + self.regressed) / 2 else PASS
+
+    def summary(self):
+        mean = sum(self.samples) / len(self.samples) if self.samples else float('nan')
+        return {
+            'metric': self.metric,
+            'healthy': round(self.healthy, 2),
+            'regressed': round(self.regressed, 2),
+            'mean': round(mean, 2),
+            'llr': round(self.llr, 3),
+            'decision': self.decision(),
+        }
+
+
+class SequentialGate:
+    """
+    Combines per-metric SPRTs. A regression in any metric fails the gate; the gate
+    passes once every metric has accepted H0. At max_samples, undecided metrics are
+    resolved by forced_decision().
+    """
+
+    def __init__(self, hypotheses, alpha=DEFAULT_ALPHA, beta=DEFAULT_BETA,
+                 min_samples=DEFAULT_MIN_SAMPLES, max_samples=DEFAULT_MAX_SAMPLES):
+        self.tests = [MetricSPRT(m, h0, h1, alpha, beta) for m, (h0, h1) in hypotheses.items()]
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.n_samples = 0
+
+    def update(self, results):
+        self.n_samples += 1
+        for test in self.tests:
+            test.update(float(results.get(test.metric) or 0.0))
+
+    def decision(self):
+        """PASS / REGRESSION once decided, UNDECIDED while more samples are needed."""
+        if self.n_samples < self.min_samples:
+            return UNDECIDED
+        decisions = [t.decision() for t in self.tests]
+        if REGRESSION in decisions:
+            return REGRESSION
+        if all(d == PASS for d in decisions):
+            return PASS
+        if self.n_samples >= self.max_samples:
+            forced = [t.forced_decision() if d == UNDECIDED else d for t, d in zip(self.tests, decisions)]
+            return REGRESSION if REGRESSION in forced else PASS
+        return UNDECIDED
+
+    @property
+    def hit_cap(self):
+        return self.n_samples >= self.max_samples and any(t.decision() == UNDECIDED for t in self.tests)
+
+    def summary(self):
+        return [t.summary() for t in self.tests]
+
+
+def route_hypotheses(max_latency_ms, baseline=None, lcp_regression_ratio=1.25):
+    """
+    Build {metric: (healthy, regressed)} for a route.
+    API latency: healthy = baseline median (or half the budget), regressed = the budget.
+    The healthy level is capped below the budget so the two hypotheses stay separable.
+    LCP is only tested when a baseline is known: regressed = baseline * lcp_regression_ratio.
+    """
+    api_healthy = baseline['API_Latency_ms'] if baseline else max_latency_ms / 2
+    api_healthy = min(api_healthy, max_latency_ms * HEALTHY_CAP_FRACTION)
+    hypotheses = {'API_Latency_ms': (api_healthy, max_latency_ms)}
+    if baseline and baseline.get('LCP_ms'):
+        hypotheses['LCP_ms'] = (baseline['LCP_ms'], baseline['LCP_ms'] * lcp_regression_ratio)
+    return hypotheses
@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Synthetic datasets shaped like thesis_final_dataset.csv, at any size.
+# Rows are drawn from the thesis dataset (so the page/network mix, API_Measured
+# pattern, injected regression scenarios, Commit_IDs and labels are preserved)
+# and every metric gets multiplicative log-normal jitter, so values do not repeat.
+# Generation is vectorized and chunked; 10M rows never hold more than one chunk.
+#   python scripts/synthetic_data.py synthetic_1m.csv --rows 1000000
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+SOURCE_FILE = os.path.join(PERFORMANCE_APP_DIR, 'thesis_final_dataset.csv')
+
+COLUMNS = ['Timestamp', 'Page_Name', 'Network_Type', 'Page_Load_Time_ms', 'Perceived_Load_Time_ms',
+           'LCP_ms', 'API_Latency_ms', 'API_Measured', 'Total_Page_Size_KB', 'Scenario',
+           'Commit_ID', 'Is_Regression']
+# Jittered independently; Perceived_Load_Time_ms shares Page_Load_Time_ms's factor so perceived >= load holds
+JITTER_METRICS = ['LCP_ms', 'API_Latency_ms', 'Total_Page_Size_KB']
+JITTER_SIGMA = 0.05
+MEAN_GAP_S = 4.0 # Mean spacing between synthetic timestamps (thesis run: ~5000 rows in 5.5h)
+START_TIME = '2026-02-18 12:00:00'
+CHUNK_ROWS = 1_000_000
+
+
+def load_source(path=SOURCE_FILE):
+    return pd.read_csv(path)
+
+
+def generate_chunk(source, n_rows, rng, start_s=0.0):
+    """
+    n_rows synthetic rows drawn from source. Returns (frame, end_s), where end_s is the
+    timestamp offset (seconds after START_TIME) to pass as start_s for the next chunk.
+    """
+    df = source.iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+
+    load_factor = np.exp(rng.normal(0.0, JITTER_SIGMA, n_rows))
+    df['Page_Load_Time_ms'] = (df['Page_Load_Time_ms'] * load_factor).round(2)
+    df['Perceived_Load_Time_ms'] = (df['Perceived_Load_Time_ms'] * load_factor).round(2)
+    for metric in JITTER_METRICS:
+        df[metric] = (df[metric] * np.exp(rng.normal(0.0, JITTER_SIGMA, n_rows))).round(2) # NaN stays NaN
+
+    offsets = start_s + np.cumsum(rng.exponential(MEAN_GAP_S, n_rows))
+    df['Timestamp'] = (pd.Timestamp(START_TIME) + pd.to_timedelta(offsets.round(), unit='s')).strftime('%Y-%m-%d %H:%M:%S')
+    return df[COLUMNS], float(offsets[-1]) if n_rows else start_s
+
+
+def generate(n_rows, seed=42, source=None):
+    """In-memory synthetic frame of n_rows."""
+    source = load_source() if source is None else source
+    df, _ = generate_chunk(source, n_rows, np.random.default_rng(seed))
+    return df
+
+
+def write_csv(path, n_rows, seed=42, source=None, chunk_rows=CHUNK_ROWS):
+    """Write n_rows synthetic rows to path in chunks. Returns the row count written."""
+    source = load_source() if source is None else source
+    rng = np.random.default_rng(seed)
+    offset_s = 0.0
+    written = 0
+    while written < n_rows:
+        n = min(chunk_rows, n_rows - written)
+        chunk, offset_s = generate_chunk(source, n, rng, offset_s)
+        chunk.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += n
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic thesis-shaped dataset")
+    parser.add_argument("output", help="CSV path to write")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--source", default=SOURCE_FILE, help="Dataset whose rows are resampled")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n = write_csv(args.output, args.rows, args.seed, load_source(args.source), args.chunk_rows)
+    print(f"✅ Wrote {n:,} rows to {args.output} in {time.perf_counter() - start:.1f}s")
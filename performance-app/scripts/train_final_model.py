@@ -1,14 +1,21 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import accuracy_score
-import joblib
+import argparse
+import datetime
 import os
 
+from artifact_cache import (
+    MAX_CACHE_MB, ArtifactCache, cache_key, code_digest, file_digest, frame_digest, library_versions, record_build
+)
+from compiled_forest import COMPILED_MODEL_PATH, export_compiled_model
+from dataset_loader import read_dataset
+from features import (
+    BASELINE_KEYS, CATEGORICAL_FEATURES, NUMERIC_FEATURES, RAW_METRICS, SERVER_TIMING_FEATURES, TARGET, VITALS_FEATURES,
+    add_delta_features, compute_baselines, numeric_features_for, prepare_raw_metrics
+)
+from model_metadata import activate_pending, decision_threshold, training_params, update_metadata
+
+# pandas, scikit-learn, joblib and matplotlib are imported by the functions that use
+# them, so `perfcheck train --help` and a cache hit don't pay for a full import.
+
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
@@ -18,125 +25,56 @@ MODEL_DIR = os.path.join(PERFORMANCE_APP_DIR, 'models')
 MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.pkl')
 BASELINE_PATH = os.path.join(MODEL_DIR, 'baseline_stats.pkl')
 PLOT_PATH = os.path.join(MODEL_DIR, 'feature_importance.png')
+# Files of a cached 'model' entry (see artifact_cache.py)
+MODEL_FILES = {
+    'final_thesis_model.pkl': MODEL_PATH,
+    'final_thesis_model.npz': COMPILED_MODEL_PATH,
+    'feature_importance.png': PLOT_PATH,
+}
 
-# Original Raw Features (for baseline calc)
-RAW_METRICS = [
-    'Page_Load_Time_ms', 
-    'Perceived_Load_Time_ms', 
-    'LCP_ms', 
-    'API_Latency_ms'
-]
-
-# Features to Train On (Relative + Context)
-TRAINING_FEATURES = [
-    'Page_Load_Time_Delta',
-    'Perceived_Load_Time_Delta',
-    'LCP_Delta',
-    'API_Latency_Delta',
-    'API_Measured',          
-    'Total_Page_Size_KB', 
-    'Network_Type', 
-    'Page_Name'
-]
-
-TARGET = 'Is_Regression'
-
-def train_model():
-    print(f"🚀 Starting Model Training (Feature Engineering 2.0: Relative Metrics)...")
-    
-    # 1. Load Data
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ Error: Dataset {INPUT_FILE} not found.")
-        return
-    
-    df = pd.read_csv(INPUT_FILE)
-    print(f"✅ Data Loaded. Shape: {df.shape}")
 
-    # 2. Preprocessing & Cleaning
-    if 'API_Measured' not in df.columns:
-         df['API_Measured'] = (df['API_Latency_ms'] > 0).astype(int)
-
-    df['API_Latency_ms'] = df['API_Latency_ms'].fillna(0)
-    
-    # 3. Calculate Baselines (from Healthy Data Only)
-    print("📊 Calculating Baselines from Healthy Data...")
-    healthy_df = df[df['Scenario'] == 'baseline']
-    
-    # Group by (Page_Name, Network_Type) and calculate Median
-    # We use Median to be robust against outliers in the "healthy" set
-    baselines = healthy_df.groupby(['Page_Name', 'Network_Type'])[RAW_METRICS].median().to_dict('index')
-    
-    # Save Baselines for Validation Script
-    if not os.path.exists(MODEL_DIR):
-        os.makedirs(MODEL_DIR)
-    joblib.dump(baselines, BASELINE_PATH)
-    print(f"💾 Baseline Stats Saved: {BASELINE_PATH}")
-    
-    # 4. Feature Engineering: Create Delta Columns
-    print("🛠️ Creating Relative Features (Deltas)...")
-    
-    def calculate_deltas(row):
-        key = (row['Page_Name'], row['Network_Type'])
-        if key in baselines:
-            base = baselines[key]
-            return pd.Series([
-                row['Page_Load_Time_ms'] - base['Page_Load_Time_ms'],
-                row['Perceived_Load_Time_ms'] - base['Perceived_Load_Time_ms'],
-                row['LCP_ms'] - base['LCP_ms'],
-                row['API_Latency_ms'] - base['API_Latency_ms']
-            ])
-        else:
-            # Fallback if no baseline (shouldn't happen in thesis data)
-            return pd.Series([0, 0, 0, 0])
-
-    delta_cols = ['Page_Load_Time_Delta', 'Perceived_Load_Time_Delta', 'LCP_Delta', 'API_Latency_Delta']
-    df[delta_cols] = df.apply(calculate_deltas, axis=1)
-    
-    # 5. Train on Full Dataset
-    X = df[TRAINING_FEATURES]
-    y = df[TARGET]
-    
-    print(f"📊 Training on full dataset: {len(X)} rows")
-    print(f"Features: {TRAINING_FEATURES}")
-
-    # Define Transformers
-    numeric_features = [
-        'Page_Load_Time_Delta',
-        'Perceived_Load_Time_Delta',
-        'LCP_Delta',
-        'API_Latency_Delta',
-        'API_Measured', 
-        'Total_Page_Size_KB'
-    ]
-    categorical_features = ['Network_Type', 'Page_Name']
+def build_pipeline(params, numeric_features=NUMERIC_FEATURES):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
     preprocessor = ColumnTransformer(
         transformers=[
             ('num', StandardScaler(), numeric_features),
-            ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+            ('cat', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES)
         ])
 
-    # 6. Model Pipeline
-    clf = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocessor', preprocessor),
         ('classifier', RandomForestClassifier(
-            n_estimators=300, 
+            **params,
             random_state=42,
             class_weight='balanced',
             n_jobs=-1
         ))
     ])
 
-    # 7. Train
-    print("🧠 Training RandomForest Model...")
-    clf.fit(X, y)
 
-    # 8. Sanity Check
-    y_pred = clf.predict(X)
-    accuracy = accuracy_score(y, y_pred)
-    print(f"🏆 Training Accuracy: {accuracy:.4f}")
+def run_cache_key(params):
+    """Key of a whole training run: dataset bytes + everything else the artifacts depend on."""
+    return cache_key('run', file_digest(INPUT_FILE), params, NUMERIC_FEATURES, CATEGORICAL_FEATURES,
+                     VITALS_FEATURES, SERVER_TIMING_FEATURES, library_versions(), code_digest())
+
+
+def baselines_cache_key(df):
+    healthy = df.loc[df['Scenario'] == 'baseline', BASELINE_KEYS + RAW_METRICS]
+    return cache_key('baselines', frame_digest(healthy), library_versions(), code_digest())
+
+
+def model_cache_key(X, y, params):
+    return cache_key('model', frame_digest(X), frame_digest(y.to_frame()), params, library_versions(), code_digest())
+
+
+def plot_feature_importance(clf, numeric_features, categorical_features, path=PLOT_PATH):
+    import matplotlib.pyplot as plt
+    import pandas as pd
 
-    # 9. Feature Importance
     try:
         ohe = clf.named_steps['preprocessor'].named_transformers_['cat']
         ohe_features = list(ohe.get_feature_names_out(categorical_features))
@@ -159,12 +97,169 @@ def train_model():
         plt.xlabel('Importance')
         plt.title('RF Feature Importance (Relative Metrics)')
         plt.tight_layout()
-        plt.savefig(PLOT_PATH)
-        print(f"📊 Importance Plot Saved: {PLOT_PATH}")
+        plt.savefig(path)
+        print(f"📊 Importance Plot Saved: {path}")
+
+
+def fit_model(X, y, baselines, params, numeric_features, categorical_features):
+    """Fit, save and export the model (+ importance plot). Returns the incremental-update lineage."""
+    import joblib
+    from sklearn.metrics import accuracy_score
+
+    print(f"Forest params: {params}")
+    clf = build_pipeline(params, numeric_features)
+
+    # 7. Train
+    print("🧠 Training RandomForest Model...")
+    clf.fit(X, y)
+
+    # 8. Sanity Check
+    y_pred = clf.predict(X)
+    accuracy = accuracy_score(y, y_pred)
+    print(f"🏆 Training Accuracy: {accuracy:.4f}")
+
+    # 9. Feature Importance
+    plot_feature_importance(clf, numeric_features, categorical_features)
 
     # 10. Save Model
     joblib.dump(clf, MODEL_PATH)
     print(f"💾 Model Saved: {MODEL_PATH}")
 
+    # 11. Export array-backed copy for sklearn-free scoring in CI
+    export_compiled_model(clf, COMPILED_MODEL_PATH)
+    print(f"💾 Compiled Model Saved: {COMPILED_MODEL_PATH}")
+    report_activation(params)
+
+    # 12. Reset the incremental-update lineage (see incremental_update.py)
+    from incremental_update import VALIDATION_FILE, evaluate, load_validation
+    lineage = {
+        'mode': 'full',
+        'trained_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'rebuild_rows': len(X),
+        'updates': 0,
+        'trees_replaced': 0,
+        'rows_since_rebuild': 0,
+    }
+    if os.path.exists(VALIDATION_FILE):
+        lineage['rebuild_recall'] = evaluate(clf, load_validation(baselines), decision_threshold())['recall']
+    return lineage
+
+
+def report_activation(params):
+    """Activate a staged tune_model.py threshold now that a forest with its params is in models/."""
+    threshold = activate_pending(params)
+    if threshold is not None:
+        print(f"🎯 Tuned operating point activated: threshold={threshold} for params {params}")
+
+
+def restore_build(cache, baselines_entry, model_entry):
+    """Copy a cached build into models/ and point the metadata/manifest at it."""
+    cache.restore(baselines_entry, {'baseline_stats.pkl': BASELINE_PATH})
+    cache.restore(model_entry, MODEL_FILES)
+    update_metadata({'training': model_entry['lineage']})
+    record_build(MODEL_PATH, BASELINE_PATH, model_entry['key'][:16], compiled_path=COMPILED_MODEL_PATH,
+                 baselines_key=baselines_entry['key'], model_key=model_entry['key'])
+
+
+def train_model(use_cache=True, cache=None):
+    import joblib
+
+    print(f"🚀 Starting Model Training (Feature Engineering 2.0: Relative Metrics)...")
+    
+    # 1. Load Data
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Error: Dataset {INPUT_FILE} not found.")
+        return
+
+    if not os.path.exists(MODEL_DIR):
+        os.makedirs(MODEL_DIR)
+
+    # Forest settings from model_metadata.json (a staged tune_model.py pick first)
+    params = training_params()
+    cache = cache or (ArtifactCache() if use_cache else None)
+
+    # Unchanged dataset + config: the whole run is a cache lookup
+    run_key = run_cache_key(params) if cache else None
+    run = cache.get('run', run_key) if cache else None
+    if run:
+        baselines_entry = cache.get('baselines', run['baselines_key'])
+        model_entry = cache.get('model', run['model_key'])
+        if baselines_entry and model_entry:
+            restore_build(cache, baselines_entry, model_entry)
+            print(f"♻️ Dataset and training config unchanged: restored build {run['model_key'][:16]} from cache.")
+            report_activation(params)
+            return
+    
+    df = read_dataset(INPUT_FILE)
+    print(f"✅ Data Loaded. Shape: {df.shape}")
+
+    # 2. Preprocessing & Cleaning
+    prepare_raw_metrics(df)
+    
+    # 3. Calculate Baselines (from Healthy Data Only), unless the healthy rows are cached
+    baselines_key = baselines_cache_key(df) if cache else None
+    baselines_entry = cache.get('baselines', baselines_key) if cache else None
+    if baselines_entry:
+        cache.restore(baselines_entry, {'baseline_stats.pkl': BASELINE_PATH})
+        baselines = joblib.load(BASELINE_PATH)
+        print(f"♻️ Healthy rows unchanged: baselines restored from cache ({BASELINE_PATH})")
+    else:
+        print("📊 Calculating Baselines from Healthy Data...")
+        baselines = compute_baselines(df)
+
+        # Save Baselines for Validation Script
+        joblib.dump(baselines, BASELINE_PATH)
+        print(f"💾 Baseline Stats Saved: {BASELINE_PATH}")
+        if cache:
+            baselines_entry = cache.put('baselines', baselines_key, {'baseline_stats.pkl': BASELINE_PATH})
+    
+    # 4. Feature Engineering: Create Delta Columns
+    print("🛠️ Creating Relative Features (Deltas)...")
+    add_delta_features(df, baselines)
+    
+    # 5. Train on Full Dataset (TBT/CLS join the features once the dataset records them)
+    numeric_features = numeric_features_for(df)
+    categorical_features = CATEGORICAL_FEATURES
+    X = df[numeric_features + categorical_features]
+    y = df[TARGET]
+    
+    print(f"📊 Training on full dataset: {len(X)} rows")
+    print(f"Features: {list(X.columns)}")
+
+    # 6. Model Pipeline: refit only when the training matrix, labels or params changed
+    model_key = model_cache_key(X, y, params) if cache else None
+    model_entry = cache.get('model', model_key) if cache else None
+    if model_entry:
+        print(f"♻️ Training matrix unchanged: model restored from cache ({MODEL_PATH})")
+        cache.restore(model_entry, MODEL_FILES)
+        report_activation(params)
+        lineage = model_entry['lineage']
+    else:
+        lineage = fit_model(X, y, baselines, params, numeric_features, categorical_features)
+        if cache:
+            model_entry = cache.put('model', model_key, {name: path for name, path in MODEL_FILES.items() if os.path.exists(path)},
+                                    {'lineage': lineage})
+    update_metadata({'training': lineage})
+
+    if cache:
+        cache.put('run', run_key, meta={'baselines_key': baselines_key, 'model_key': model_key})
+        record_build(MODEL_PATH, BASELINE_PATH, model_key[:16], compiled_path=COMPILED_MODEL_PATH,
+                     baselines_key=baselines_key, model_key=model_key)
+    else:
+        record_build(MODEL_PATH, BASELINE_PATH, cache_key(file_digest(MODEL_PATH), file_digest(BASELINE_PATH))[:16],
+                     compiled_path=COMPILED_MODEL_PATH)
+
+
+def add_arguments(parser):
+    parser.add_argument("--no-cache", action="store_true", help="Always recompute baselines and refit the model")
+    parser.add_argument("--cache-size-mb", type=float, default=MAX_CACHE_MB, help="LRU limit of the artifact cache")
+
+
+def main(args):
+    train_model(not args.no_cache, None if args.no_cache else ArtifactCache(max_mb=args.cache_size_mb))
+
+
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the regression classifier on the thesis dataset")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,252 @@
+import argparse
+import datetime
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from dataset_loader import read_dataset
+from features import (
+    CATEGORICAL_FEATURES, TARGET,
+    add_delta_features, compute_baselines, numeric_features_for, prepare_raw_metrics
+)
+from model_metadata import METADATA_PATH, update_metadata
+
+# Forest hyperparameter + decision threshold search.
+# Candidates are scored by stratified k-fold cross-validation on the training
+# dataset only: real_validation_data.csv is never seen here, so the precision and
+# recall validate_model.py reports for the chosen operating point stay unbiased.
+# Each fold's matrices (baselines and scaler fitted on its training part) are built
+# once, saved as .npy and memory-mapped by every worker in the process pool, so
+# each (candidate, fold) task only pays for its own fit.
+# Out-of-fold probabilities of every candidate are kept in one (candidates x rows)
+# array and all thresholds are swept at once with NumPy broadcasting.
+# The recommended operating point (max precision subject to recall >= --min-recall)
+# is staged in models/model_metadata.json; train_final_model.py activates it
+# once it has trained a forest with those params, then validate/score pick it up.
+#   python scripts/tune_model.py                       # full grid
+#   python scripts/tune_model.py --search random --n-iter 12
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+TRAIN_FILE = os.path.join(PERFORMANCE_APP_DIR, 'thesis_final_dataset.csv')
+FRONTIER_PATH = os.path.join(PERFORMANCE_APP_DIR, 'models', 'threshold_frontier.csv')
+
+PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [None, 8, 16],
+    'min_samples_leaf': [1, 5],
+    'max_features': ['sqrt', None],
+}
+THRESHOLDS = np.round(np.arange(0.01, 1.0, 0.01), 2)
+# Out-of-fold recall of 1.0 is rarely reachable: a few regression rows score ~0 in every fit
+DEFAULT_MIN_RECALL = 0.99
+DEFAULT_FOLDS = 5
+
+# Per-process memory-mapped matrices (set by _init_worker)
+_MATRICES = {}
+
+
+def build_matrices(workdir, folds=DEFAULT_FOLDS, seed=42, train_file=TRAIN_FILE):
+    """
+    Feature-engineer each stratified fold of the training dataset: baselines and
+    preprocessing are fitted on the fold's training rows only, then applied to its
+    held-out rows. Saves float32 .npy files per fold in workdir; returns
+    (y, held-out row indices per fold, matrix shapes of the first fold).
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    data = read_dataset(train_file)
+    prepare_raw_metrics(data)
+    y = data[TARGET].to_numpy()
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(data, y))
+
+    numeric = numeric_features_for(data)
+    columns = numeric + CATEGORICAL_FEATURES
+    shapes = None
+    for k, (train_idx, test_idx) in enumerate(splits):
+        train = data.iloc[train_idx].copy()
+        held_out = data.iloc[test_idx].copy()
+        baselines = compute_baselines(train)
+        add_delta_features(train, baselines)
+        add_delta_features(held_out, baselines)
+
+        # Same preprocessing as train_final_model.py; it does not depend on the forest params
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('num', StandardScaler(), numeric),
+                ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), CATEGORICAL_FEATURES)
+            ])
+        arrays = {
+            'X_train': preprocessor.fit_transform(train[columns]),
+            'y_train': y[train_idx],
+            'X_test': preprocessor.transform(held_out[columns]),
+        }
+        for name, array in arrays.items():
+            dtype = np.float32 if name.startswith('X') else np.int8
+            np.save(os.path.join(workdir, f'{name}_{k}.npy'), np.ascontiguousarray(array, dtype=dtype))
+        shapes = shapes or {name: array.shape for name, array in arrays.items()}
+    return y, [test_idx for _, test_idx in splits], shapes
+
+
+def _init_worker(workdir, folds):
+    for k in range(folds):
+        for name in ['X_train', 'y_train', 'X_test']:
+            _MATRICES[name, k] = np.load(os.path.join(workdir, f'{name}_{k}.npy'), mmap_mode='r')
+
+
+def _evaluate(task):
+    """Fit one candidate on one fold's training rows; returns (task, held-out P(regression), fit seconds)."""
+    _, params, k = task
+    start = time.perf_counter()
+    clf = RandomForestClassifier(**params, random_state=42, class_weight='balanced', n_jobs=1)
+    clf.fit(_MATRICES['X_train', k], _MATRICES['y_train', k])
+    probs = clf.predict_proba(_MATRICES['X_test', k])[:, 1]
+    return task, probs, time.perf_counter() - start
+
+
+def candidate_params(search='grid', n_iter=10, seed=42, grid=PARAM_GRID):
+    keys = list(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+    if search == 'random' and n_iter < len(combos):
+        rng = np.random.default_rng(seed)
+        combos = [combos[i] for i in sorted(rng.choice(len(combos), n_iter, replace=False))]
+    return combos
+
+
+def sweep_thresholds(probs, y_true, thresholds=THRESHOLDS):
+    """
+    probs: (candidates, rows). Returns (precision, recall) arrays of shape
+    (candidates, thresholds) computed in one broadcast.
+    """
+    predicted = probs[:, :, None] >= thresholds[None, None, :]
+    positives = (y_true == 1)[None, :, None]
+    tp = (predicted & positives).sum(axis=1)
+    fp = (predicted & ~positives).sum(axis=1)
+    n_pos = positives.sum()
+    predicted_pos = tp + fp
+    precision = np.divide(tp, predicted_pos, out=np.zeros(tp.shape), where=predicted_pos > 0)
+    recall = tp / n_pos if n_pos else np.ones(tp.shape)
+    return precision, recall
+
+
+def pareto_frontier(points):
+    """Rows of points (Precision, Recall columns) not dominated on both metrics."""
+    ordered = points.sort_values(['Recall', 'Precision'], ascending=[False, False])
+    best_precision = -1.0
+    keep = []
+    for idx, precision in ordered['Precision'].items():
+        if precision > best_precision:
+            keep.append(idx)
+            best_precision = precision
+    return ordered.loc[keep]
+
+
+def recommend(points, min_recall=DEFAULT_MIN_RECALL):
+    """
+    Max precision subject to recall >= min_recall. Ties go to the cheaper forest, and
+    within one candidate to the middle of the tied threshold range (largest margin).
+    """
+    eligible = points[points['Recall'] >= min_recall - 1e-12]
+    if eligible.empty:
+        return None
+    best = eligible[eligible['Precision'] == eligible['Precision'].max()]
+    best = best[best['Recall'] == best['Recall'].max()]
+    best = best[best['n_estimators'] == best['n_estimators'].min()]
+    candidate = best['Candidate'].iloc[0]
+    tied = best[best['Candidate'] == candidate].sort_values('Threshold')
+    return tied.iloc[len(tied) // 2]
+
+
+def run_search(search='grid', n_iter=10, workers=None, min_recall=DEFAULT_MIN_RECALL, seed=42,
+               write_metadata=True, metadata_path=METADATA_PATH, frontier_path=FRONTIER_PATH, folds=DEFAULT_FOLDS):
+    candidates = candidate_params(search, n_iter, seed)
+    workers = workers or os.cpu_count() or 1
+    print(f"🚀 Tuning {len(candidates)} forest configurations x {folds} folds on {workers} worker(s)...")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        y, held_out, shapes = build_matrices(workdir, folds, seed)
+        print(f"✅ Fold matrices built in {time.perf_counter() - start:.2f}s: "
+              f"train {shapes['X_train']}, held out {shapes['X_test']} per fold")
+
+        # Out-of-fold probabilities: every training row is scored by the fits that didn't see it
+        probs = np.empty((len(candidates), len(y)))
+        fit_seconds = np.zeros(len(candidates))
+        tasks = [(i, params, k) for i, params in enumerate(candidates) for k in range(folds)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workdir, folds)) as pool:
+            for n, ((i, params, k), p, seconds) in enumerate(pool.map(_evaluate, tasks)):
+                probs[i, held_out[k]] = p
+                fit_seconds[i] += seconds
+                if k == folds - 1:
+                    print(f"   [{i + 1}/{len(candidates)}] {params} ({fit_seconds[i]:.1f}s)")
+
+    precision, recall = sweep_thresholds(probs, y)
+    n_thresholds = len(THRESHOLDS)
+    points = pd.DataFrame({
+        'Candidate': np.repeat(np.arange(len(candidates)), n_thresholds),
+        'Threshold': np.tile(THRESHOLDS, len(candidates)),
+        'Precision': precision.ravel(),
+        'Recall': recall.ravel(),
+    })
+    params_frame = pd.DataFrame(candidates)
+    params_frame['Fit_s'] = fit_seconds.round(2) # Summed over folds
+    points = points.join(params_frame, on='Candidate')
+
+    frontier = pareto_frontier(points)
+    frontier.to_csv(frontier_path, index=False)
+    print(f"\n📈 Precision/recall frontier ({len(frontier)} points) saved: {frontier_path}")
+    print(frontier[['Threshold', 'Precision', 'Recall'] + list(PARAM_GRID)].to_string(index=False))
+
+    choice = recommend(points, min_recall)
+    if choice is None:
+        print(f"\n❌ No configuration reaches recall >= {min_recall}; metadata left unchanged.")
+        return points, frontier, None
+
+    params = {key: (None if pd.isna(choice[key]) else choice[key]) for key in PARAM_GRID}
+    params = {key: (int(value) if isinstance(value, (np.integer, float)) and float(value).is_integer() else value)
+              for key, value in params.items()}
+    operating_point = {
+        'threshold': float(choice['Threshold']),
+        'forest_params': params,
+        'operating_point': {
+            'criterion': f"max precision subject to recall >= {min_recall}",
+            'selected_on': f"{os.path.basename(TRAIN_FILE)}, {folds}-fold cross-validation",
+            'precision': round(float(choice['Precision']), 4),
+            'recall': round(float(choice['Recall']), 4),
+            'search': search,
+            'candidates': len(candidates),
+            'tuned_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        },
+    }
+    print(f"\n🏆 Recommended: threshold={operating_point['threshold']} params={params} "
+          f"cross-validated precision={choice['Precision']:.4f} recall={choice['Recall']:.4f}")
+    if write_metadata:
+        # Staged: the threshold goes live only with a forest trained on these params
+        update_metadata({'pending': operating_point}, metadata_path)
+        print(f"💾 Operating point staged in {metadata_path}; train_final_model.py activates it with the retrained forest")
+    return points, frontier, operating_point
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel forest/threshold search with a memory-mapped feature matrix")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-iter", type=int, default=10, help="Candidates for --search random")
+    parser.add_argument("--workers", type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument("--min-recall", type=float, default=DEFAULT_MIN_RECALL,
+                        help="Recall constraint for the recommended operating point")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="Cross-validation folds of the training dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dry-run", action="store_true", help="Report only; don't update model_metadata.json")
+
+    args = parser.parse_args()
+
+    run_search(args.search, args.n_iter, args.workers, args.min_recall, args.seed, not args.dry_run, folds=args.folds)
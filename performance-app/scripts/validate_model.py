@@ -1,9 +1,14 @@
-import pandas as pd
-import joblib
+import argparse
 import os
-import numpy as np
 import datetime
-from sklearn.metrics import accuracy_score, confusion_matrix, classification_report, precision_recall_fscore_support
+
+from artifact_cache import verify_build
+from dataset_loader import DEFAULT_CHUNK_ROWS, iter_dataset, read_dataset
+from features import (
+    BASELINE_KEYS, DELTA_COLUMNS, RAW_METRICS, TARGET, TRAINING_FEATURES,
+    add_delta_features, model_features, prepare_raw_metrics
+)
+from model_metadata import DEFAULT_THRESHOLD, decision_threshold, threshold_source
 
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,66 +20,93 @@ MODEL_PATH = os.path.join(MODEL_DIR, 'final_thesis_model.pkl')
 BASELINE_PATH = os.path.join(MODEL_DIR, 'baseline_stats.pkl')
 REPORT_PATH = os.path.join(PERFORMANCE_APP_DIR, 'validation_report.md')
 
-FEATURES = [
-    'Page_Load_Time_Delta',
-    'Perceived_Load_Time_Delta',
-    'LCP_Delta',
-    'API_Latency_Delta',
-    'API_Measured',          
-    'Total_Page_Size_KB', 
-    'Network_Type', 
-    'Page_Name'
-]
-TARGET = 'Is_Regression'
-
-def validate_model():
+FEATURES = TRAINING_FEATURES
+
+def score_chunks(path, model, baselines, threshold=DEFAULT_THRESHOLD, chunk_rows=DEFAULT_CHUNK_ROWS, keep=None):
+    """
+    Batch-score a dataset bigger than RAM chunk by chunk. Yields each chunk with
+    Regression_Prob / Predicted_Label; with `keep`, only the model inputs and `keep`
+    are parsed and each chunk is projected to `keep` + those two columns.
+    """
+    numeric_features, categorical_features = model_features(model)
+    features = numeric_features + categorical_features
+    columns = None
+    if keep is not None:
+        inputs = [col for col in features if col not in DELTA_COLUMNS]
+        columns = list(dict.fromkeys(BASELINE_KEYS + RAW_METRICS + inputs + keep))
+    for chunk in iter_dataset(path, columns=columns, chunk_rows=chunk_rows):
+        prepare_raw_metrics(chunk)
+        add_delta_features(chunk, baselines)
+        chunk['Regression_Prob'] = model.predict_proba(chunk[features])[:, 1]
+        chunk['Predicted_Label'] = (chunk['Regression_Prob'] >= threshold).astype('int8')
+        yield chunk if keep is None else chunk[keep + ['Regression_Prob', 'Predicted_Label']]
+
+def validate_model(allow_mixed_build=False, compiled=False):
+    # joblib/scikit-learn load here, not at import: `perfcheck validate --help` stays light
+    import joblib
+    from compiled_forest import COMPILED_MODEL_PATH, load_model
+
     print(f"🚀 Starting Comprehensive Validation Report Generation...")
     
     if not os.path.exists(VALIDATION_FILE) or not os.path.exists(MODEL_PATH) or not os.path.exists(BASELINE_PATH):
         print("❌ Error: Missing data, model, or baseline stats.")
         return
+
+    # Deltas against another build's baselines would silently skew every prediction
+    same_build, message = verify_build(MODEL_PATH, BASELINE_PATH)
+    if same_build is False and not allow_mixed_build:
+        print(f"❌ Error: Model and baselines come from different builds ({message}). Retrain or pass --allow-mixed-build.")
+        return
+    print(f"{'✅' if same_build else '⚠️'} Model and baselines: {message}")
         
-    df = pd.read_csv(VALIDATION_FILE)
-    model = joblib.load(MODEL_PATH)
+    df = read_dataset(VALIDATION_FILE)
+    # --compiled: array-backed forest, no sklearn import or pipeline unpickling
+    model = load_model(MODEL_PATH, COMPILED_MODEL_PATH, compiled)
     baselines = joblib.load(BASELINE_PATH)
     
     print(f"✅ Data Loaded ({len(df)} rows).")
 
     # Preprocessing
-    if 'API_Measured' not in df.columns:
-         df['API_Measured'] = (df['API_Latency_ms'] > 0).astype(int)
-    df['API_Latency_ms'] = df['API_Latency_ms'].fillna(0)
+    prepare_raw_metrics(df)
     
     # Calculate Deltas
-    def calculate_deltas(row):
-        key = (row['Page_Name'], row['Network_Type'])
-        if key in baselines:
-            base = baselines[key]
-            return pd.Series([
-                row['Page_Load_Time_ms'] - base['Page_Load_Time_ms'],
-                row['Perceived_Load_Time_ms'] - base['Perceived_Load_Time_ms'],
-                row['LCP_ms'] - base['LCP_ms'],
-                row['API_Latency_ms'] - base['API_Latency_ms']
-            ])
-        else:
-            return pd.Series([0, 0, 0, 0])
-
-    delta_cols = ['Page_Load_Time_Delta', 'Perceived_Load_Time_Delta', 'LCP_Delta', 'API_Latency_Delta']
-    df[delta_cols] = df.apply(calculate_deltas, axis=1)
+    add_delta_features(df, baselines)
 
-    X_val = df[FEATURES]
+    # The model's own input columns (TBT_ms/CLS when it was trained on them)
+    numeric_features, categorical_features = model_features(model)
+    features = numeric_features + categorical_features
+    X_val = df[features]
     y_true = df[TARGET]
     
-    # Predict with optimized threshold (0.25) to maximize Recall for CI
+    # Predict with optimized threshold (0.25 unless tuned, see tune_model.py) to maximize Recall for CI
     # y_pred = model.predict(X_val) # Default 0.5 threshold
+    threshold = decision_threshold()
     y_prob = model.predict_proba(X_val)[:, 1]
-    y_pred = (y_prob >= 0.25).astype(int)
+    y_pred = (y_prob >= threshold).astype(int)
     
     df['Predicted_Label'] = y_pred
     df['Regression_Prob'] = y_prob
     
-    # --- Generate Report ---
-    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+    write_report(df, REPORT_PATH, threshold, features, threshold_source())
+    print(f"✅ Report Generated: {REPORT_PATH}")
+    # Print content to stdout for user
+    with open(REPORT_PATH, 'r') as f:
+        print(f.read())
+
+def confusion_counts(y_true, y_pred):
+    """(tn, fp, fn, tp) for binary labels; counted directly so reporting doesn't import sklearn."""
+    y_true = y_true.to_numpy() == 1
+    y_pred = y_pred.to_numpy() == 1
+    return (int((~y_true & ~y_pred).sum()), int((~y_true & y_pred).sum()),
+            int((y_true & ~y_pred).sum()), int((y_true & y_pred).sum()))
+
+def write_report(df, report_path=REPORT_PATH, threshold=DEFAULT_THRESHOLD, features=FEATURES,
+                 threshold_note="Optimized for 100% Recall in CI"):
+    """Markdown validation report for a frame with TARGET, Predicted_Label and Regression_Prob columns."""
+    y_true = df[TARGET]
+    y_pred = df['Predicted_Label']
+
+    with open(report_path, 'w', encoding='utf-8') as f:
         f.write(f"# Thesis Validation Report\n")
         f.write(f"**Date:** {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n")
 
@@ -97,14 +129,16 @@ def validate_model():
         f.write("    - **Regression:** Application with injected 2s API delay on `Products` page.\n")
         f.write("- **Model Type:** Random Forest (V2)\n")
         f.write("- **Feature Engineering:** Relative Metrics (Deltas from Baseline Median)\n")
-        f.write(f"- **Features Used:** `{', '.join(FEATURES)}`\n")
-        f.write("- **Threshold:** 0.25 (Optimized for 100% Recall in CI)\n\n")
+        f.write(f"- **Features Used:** `{', '.join(features)}`\n")
+        f.write(f"- **Threshold:** {threshold} ({threshold_note})\n\n")
 
         # 3. Results
-        accuracy = accuracy_score(y_true, y_pred)
-        precision, recall, f1, _ = precision_recall_fscore_support(y_true, y_pred, average='binary')
-        cm = confusion_matrix(y_true, y_pred)
-        tn, fp, fn, tp = cm.ravel()
+        tn, fp, fn, tp = confusion_counts(y_true, y_pred)
+        accuracy = (tp + tn) / len(df)
+        # 0 where undefined, as sklearn's precision_recall_fscore_support reports it
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
 
         f.write("## 3. Results\n")
         f.write(f"### Performance Metrics\n")
@@ -144,11 +178,15 @@ def validate_model():
             f.write("\n")
         else:
             f.write("None.\n")
-            
-    print(f"✅ Report Generated: {REPORT_PATH}")
-    # Print content to stdout for user
-    with open(REPORT_PATH, 'r') as f:
-        print(f.read())
+
+def add_arguments(parser):
+    parser.add_argument("--allow-mixed-build", action="store_true", help="Validate even when the baselines are not from the model's build")
+    parser.add_argument("--compiled", action="store_true", help="Score with the compiled forest (.npz, no sklearn); falls back to the pickle")
+
+def main(args):
+    validate_model(args.allow_mixed_build, args.compiled)
 
 if __name__ == "__main__":
-    validate_model()
+    parser = argparse.ArgumentParser(description="Validate the trained model on the live validation data")
+    add_arguments(parser)
+    main(parser.parse_args())
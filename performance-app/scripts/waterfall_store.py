@@ -0,0 +1,216 @@
+import os
+import uuid
+import argparse
+import urllib.parse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from asset_replay import asset_identity
+
+# Per-resource waterfall side table (Parquet, Hive-partitioned by Commit_ID).
+#   waterfall_store/Commit_ID=abc123/part-<uuid>-0.parquet
+# One row per resource timing entry of a sample, keyed by the Sample_ID column of
+# the dataset row it belongs to. Assets are stored under a route-relative key with
+# build ids / content hashes removed (asset_replay.asset_identity), so the same
+# chunk lines up across commits even though its file name changes with every build.
+# Sizes are decoded body sizes from Resource Timing: unlike content-length they are
+# known for compressed/chunked responses, and unlike transferSize they are not 0
+# on cache hits.
+#
+#   python scripts/waterfall_store.py diff --commit abc123 --baseline live
+#   python scripts/waterfall_store.py show --sample 3f9c2a1b7d4e5f60
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PERFORMANCE_APP_DIR = os.path.dirname(SCRIPT_DIR)
+
+STORE_DIR = os.path.join(PERFORMANCE_APP_DIR, 'waterfall_store')
+DEFAULT_FLUSH_SAMPLES = 25
+MIN_DIFF_KB = 1.0 # Size changes below this are noise (headers, timestamps in HTML)
+
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+PARTITION_SCHEMA = pa.schema([
+    ('Commit_ID', pa.string()),
+])
+
+SCHEMA = pa.schema([
+    ('Sample_ID', DICT_STRING),
+    ('Page_Name', DICT_STRING),
+    ('Network_Type', DICT_STRING),
+    ('Asset', DICT_STRING),
+    ('Resource_Type', DICT_STRING),
+    ('Transfer_Bytes', pa.int32()),
+    ('Encoded_Bytes', pa.int32()),
+    ('Decoded_Bytes', pa.int32()),
+    ('Start_ms', pa.float32()),
+    ('Duration_ms', pa.float32()),
+    ('Render_Blocking', pa.bool_()),
+]).append(PARTITION_SCHEMA.field('Commit_ID'))
+
+
+def new_sample_id():
+    return uuid.uuid4().hex[:16]
+
+
+def asset_key(url, page_url):
+    """Route-relative, build-stable asset key; other origins keep their host."""
+    parts = urllib.parse.urlsplit(url)
+    key = asset_identity(url)
+    if parts.netloc and parts.netloc != urllib.parse.urlsplit(page_url).netloc:
+        return f"//{parts.netloc}{key}"
+    return key
+
+
+def waterfall_frame(resources, page_url, sample_id, commit_id, page_name, network_type):
+    """The columnar `resources` of a COLLECT_SCRIPT result as a frame in SCHEMA order."""
+    n = len(resources['url'])
+    return pd.DataFrame({
+        'Sample_ID': [sample_id] * n,
+        'Page_Name': [page_name] * n,
+        'Network_Type': [network_type] * n,
+        'Asset': [asset_key(url, page_url) for url in resources['url']],
+        'Resource_Type': resources['type'],
+        'Transfer_Bytes': resources['transfer_size'],
+        'Encoded_Bytes': resources['encoded_size'],
+        'Decoded_Bytes': resources['decoded_size'],
+        'Start_ms': resources['start_ms'],
+        'Duration_ms': resources['duration_ms'],
+        'Render_Blocking': resources['render_blocking'],
+        'Commit_ID': [str(commit_id)] * n,
+    })
+
+
+def append(df, store_dir=STORE_DIR):
+    """Append waterfall rows as new part files. Returns the number of rows written."""
+    if df.empty:
+        return 0
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    ds.write_dataset(
+        table,
+        store_dir,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return table.num_rows
+
+
+class WaterfallWriter:
+    """Buffers the waterfalls of several samples so each part file holds a batch, not one page load."""
+
+    def __init__(self, store_dir=STORE_DIR, flush_samples=DEFAULT_FLUSH_SAMPLES):
+        self.store_dir = store_dir
+        self.flush_samples = flush_samples
+        self.frames = []
+        self.rows_written = 0
+
+    def add(self, vitals, page_url, sample_id, commit_id, page_name, network_type):
+        self.frames.append(waterfall_frame(vitals['resources'], page_url, sample_id, commit_id, page_name, network_type))
+        if len(self.frames) >= self.flush_samples:
+            self.flush()
+
+    def flush(self):
+        if self.frames:
+            self.rows_written += append(pd.concat(self.frames, ignore_index=True), self.store_dir)
+        self.frames = []
+
+    def close(self):
+        self.flush()
+
+
+def open_store(store_dir=STORE_DIR):
+    return ds.dataset(
+        store_dir,
+        format='parquet',
+        schema=SCHEMA,
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+    )
+
+
+def load(columns=None, store_dir=STORE_DIR, commit=None, page=None, network=None, sample=None):
+    """Waterfall rows matching the given equality filters (a list value means 'any of')."""
+    expr = None
+    for column, value in {'Commit_ID': commit, 'Page_Name': page, 'Network_Type': network, 'Sample_ID': sample}.items():
+        if value is None:
+            continue
+        field = ds.field(column)
+        cond = field.isin(value) if isinstance(value, (list, tuple, set)) else field == value
+        expr = cond if expr is None else expr & cond
+    return open_store(store_dir).to_table(columns=columns, filter=expr).to_pandas()
+
+
+def asset_sizes(df):
+    """Median decoded KB and sample count per (Page_Name, Asset, Resource_Type)."""
+    df = df.assign(Decoded_KB=df['Decoded_Bytes'] / 1024)
+    grouped = df.groupby(['Page_Name', 'Asset', 'Resource_Type'], observed=True)
+    return grouped.agg(KB=('Decoded_KB', 'median'), Samples=('Sample_ID', 'nunique'))
+
+
+def diff_assets(commit, baseline, store_dir=STORE_DIR, page=None, network=None, min_kb=MIN_DIFF_KB):
+    """
+    Per-asset size change of `commit` against `baseline` (commit ids), medians over
+    each side's samples. Rows: Page_Name, Asset, Resource_Type, Baseline_KB, Commit_KB,
+    Delta_KB, Change in {'grew', 'shrank', 'new', 'removed'}, largest change first.
+    """
+    columns = ['Sample_ID', 'Page_Name', 'Asset', 'Resource_Type', 'Decoded_Bytes']
+    current = asset_sizes(load(columns, store_dir, commit=commit, page=page, network=network))
+    base = asset_sizes(load(columns, store_dir, commit=baseline, page=page, network=network))
+
+    merged = base[['KB']].rename(columns={'KB': 'Baseline_KB'}).join(
+        current[['KB']].rename(columns={'KB': 'Commit_KB'}), how='outer')
+    merged['Delta_KB'] = merged['Commit_KB'].fillna(0) - merged['Baseline_KB'].fillna(0)
+    merged['Change'] = 'grew'
+    merged.loc[merged['Delta_KB'] < 0, 'Change'] = 'shrank'
+    merged.loc[merged['Baseline_KB'].isna(), 'Change'] = 'new'
+    merged.loc[merged['Commit_KB'].isna(), 'Change'] = 'removed'
+
+    changed = merged[merged['Delta_KB'].abs() >= min_kb].reset_index()
+    return changed.reindex(changed['Delta_KB'].abs().sort_values(ascending=False).index).round(2)
+
+
+def print_diff(changes, commit, baseline, min_kb=MIN_DIFF_KB):
+    if changes.empty:
+        print(f"✅ No asset changed by >= {min_kb} KB between {baseline} and {commit}.")
+        return
+    print(f"📦 Asset size changes, {commit} vs {baseline}:")
+    for row in changes.itertuples():
+        where = f"{row.Page_Name}: {row.Asset} ({row.Resource_Type})"
+        if row.Change == 'new':
+            print(f"   🆕 {where} is new, {row.Commit_KB:.1f} KB")
+        elif row.Change == 'removed':
+            print(f"   🗑️ {where} was removed, -{row.Baseline_KB:.1f} KB")
+        else:
+            icon = '🔺' if row.Change == 'grew' else '🔻'
+            print(f"   {icon} {where} {row.Change} by {abs(row.Delta_KB):.1f} KB "
+                  f"({row.Baseline_KB:.1f} -> {row.Commit_KB:.1f} KB)")
+    total = changes['Delta_KB'].sum()
+    print(f"   Net change: {total:+.1f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-resource waterfall side table")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    diff = sub.add_parser("diff", help="Per-asset size diff of a commit against a baseline commit")
+    diff.add_argument("--commit", required=True)
+    diff.add_argument("--baseline", required=True, help="Commit_ID of the reference samples, e.g. live")
+    diff.add_argument("--page")
+    diff.add_argument("--network")
+    diff.add_argument("--min-kb", type=float, default=MIN_DIFF_KB)
+
+    show = sub.add_parser("show", help="Print the waterfall of one sample")
+    show.add_argument("--sample", required=True)
+
+    parser.add_argument("--store", default=STORE_DIR, help="Store directory")
+
+    args = parser.parse_args()
+
+    if args.command == "diff":
+        changes = diff_assets(args.commit, args.baseline, args.store, args.page, args.network, args.min_kb)
+        print_diff(changes, args.commit, args.baseline, args.min_kb)
+    else:
+        df = load(store_dir=args.store, sample=args.sample).sort_values('Start_ms')
+        print(df.drop(columns=['Sample_ID']).to_string(index=False))
@@ -0,0 +1,178 @@
+# Single-roundtrip Web Vitals collector.
+# COLLECTOR_SCRIPT is installed with page.add_init_script() before navigation, so
+# its PerformanceObservers see every entry from the first byte on (long tasks are
+# not buffered by the browser, so a late observer would miss them). It also
+# counts in-flight fetch/XHR requests, so a slow client-side API call keeps the
+# page "unsettled" even after the load event.
+# After navigation one page.evaluate(COLLECT_SCRIPT, collect_args()) waits until
+# the page settles, then returns everything at once:
+#   LCP, FCP, CLS (session windows), long tasks / Total Blocking Time, INP and FID
+#   proxies, navigation timing, resource sizes and the API resource timing, plus
+#   the per-resource waterfall as parallel arrays (see waterfall_store.py).
+# The API's Server-Timing header (src/lib/server-timing.ts) is read from the
+# resource entry's serverTiming, so API latency splits into server time per phase
+# and the rest (network + queuing). Browsers only expose serverTiming in secure
+# contexts (https or localhost); elsewhere the server columns stay empty.
+#
+#   await page.add_init_script(COLLECTOR_SCRIPT)
+#   await page.goto(url, wait_until="load")
+#   vitals = await page.evaluate(COLLECT_SCRIPT, collect_args())
+
+API_PATTERN = '/api/products'
+# The page counts as settled once it has loaded, no fetch/XHR is in flight and no
+# new performance entry (resource, long task, LCP, layout shift) arrived for this long
+SETTLE_QUIET_MS = 500
+SETTLE_MAX_WAIT_MS = 5000 # Previous LCP fallback timeout
+LONG_TASK_BLOCKING_MS = 50 # TBT counts the part of each long task above 50ms
+
+# Server-Timing metric name -> dataset column
+SERVER_TIMING_COLUMNS = {
+    'handler': 'API_Server_ms', # Whole route handler
+    'db': 'API_Data_Fetch_ms',
+    'serialize': 'API_Serialize_ms',
+}
+
+COLLECTOR_SCRIPT = r"""
+(() => {
+    if (window.__perfVitals) return;
+    const v = window.__perfVitals = {
+        lcp: 0, fcp: 0, cls: 0, inp: 0, fid: null,
+        longTasks: [], pending: 0, lastActivity: 0,
+        clsWindow: 0, clsWindowStart: 0, clsLast: 0,
+    };
+    const touch = () => { v.lastActivity = performance.now(); };
+    const observe = (type, onEntry, options = {}) => {
+        try {
+            new PerformanceObserver((list) => {
+                list.getEntries().forEach(onEntry);
+                touch();
+            }).observe({ type, buffered: true, ...options });
+        } catch (e) { /* entry type not supported by this browser */ }
+    };
+
+    observe('largest-contentful-paint', (e) => { v.lcp = e.startTime; });
+    observe('paint', (e) => { if (e.name === 'first-contentful-paint') v.fcp = e.startTime; });
+    observe('layout-shift', (e) => {
+        if (e.hadRecentInput) return;
+        // Session windows: shifts < 1s apart, window capped at 5s; CLS = worst window
+        if (v.clsWindow && e.startTime - v.clsLast < 1000 && e.startTime - v.clsWindowStart < 5000) {
+            v.clsWindow += e.value;
+        } else {
+            v.clsWindow = e.value;
+            v.clsWindowStart = e.startTime;
+        }
+        v.clsLast = e.startTime;
+        v.cls = Math.max(v.cls, v.clsWindow);
+    });
+    observe('longtask', (e) => { v.longTasks.push([e.startTime, e.duration]); });
+    observe('event', (e) => { if (e.interactionId) v.inp = Math.max(v.inp, e.duration); }, { durationThreshold: 16 });
+    observe('first-input', (e) => { v.fid = e.processingStart - e.startTime; });
+    observe('resource', () => {});
+
+    const done = () => { v.pending--; touch(); };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function (...args) {
+            v.pending++;
+            touch();
+            return fetch.apply(this, args).finally(done);
+        };
+    }
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        v.pending++;
+        touch();
+        this.addEventListener('loadend', done, { once: true });
+        return send.apply(this, args);
+    };
+})();
+"""
+
+COLLECT_SCRIPT = r"""
+async ({ apiPattern, quietMs, maxWaitMs, blockingMs }) => {
+    const v = window.__perfVitals;
+    const started = performance.now();
+    const settled = () => v && document.readyState === 'complete' && v.pending <= 0
+        && performance.now() - v.lastActivity >= quietMs;
+    while (!settled() && performance.now() - started < maxWaitMs) {
+        await new Promise((resolve) => setTimeout(resolve, 50));
+    }
+
+    const nav = performance.getEntriesByType('navigation')[0];
+    const resources = performance.getEntriesByType('resource');
+    const api = resources.find((e) => e.name.includes(apiPattern));
+    // Long tasks after FCP, as in Lighthouse's TBT (bounded by collection time instead of TTI)
+    const blocking = v ? v.longTasks.filter(([start]) => start >= v.fcp) : [];
+
+    return {
+        settled: settled(),
+        wait_ms: performance.now() - started,
+        lcp_ms: v ? v.lcp : 0,
+        fcp_ms: v ? v.fcp : 0,
+        cls: v ? v.cls : 0,
+        tbt_ms: blocking.reduce((sum, [, duration]) => sum + Math.max(0, duration - blockingMs), 0),
+        long_tasks: v ? v.longTasks.length : 0,
+        long_task_ms: v ? v.longTasks.reduce((sum, [, duration]) => sum + duration, 0) : 0,
+        inp_ms: v ? v.inp : 0,
+        fid_ms: v ? v.fid : null,
+        ttfb_ms: nav ? nav.responseStart - nav.requestStart : 0,
+        load_time_ms: nav ? nav.loadEventEnd - nav.startTime : 0,
+        dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : 0,
+        document_transfer_size: nav ? nav.transferSize || 0 : 0,
+        resource_count: resources.length,
+        resource_transfer_size: resources.reduce((sum, r) => sum + (r.transferSize || 0), 0),
+        api_found: Boolean(api),
+        api_duration_ms: api ? api.duration : 0,
+        api_ttfb_ms: api && api.requestStart > 0 ? api.responseStart - api.requestStart : null,
+        api_server_timing: api && api.serverTiming
+            ? Object.fromEntries(api.serverTiming.map((e) => [e.name, e.duration])) : {},
+        // Columnar waterfall: the document first, then every resource in start order
+        resources: [nav, ...resources].filter(Boolean).reduce((cols, e) => {
+            cols.url.push(e.name);
+            cols.type.push(e.entryType === 'navigation' ? 'document' : e.initiatorType);
+            cols.transfer_size.push(e.transferSize || 0);
+            cols.encoded_size.push(e.encodedBodySize || 0);
+            cols.decoded_size.push(e.decodedBodySize || 0);
+            cols.start_ms.push(e.startTime);
+            cols.duration_ms.push(e.duration);
+            cols.render_blocking.push(e.renderBlockingStatus === 'blocking');
+            return cols;
+        }, { url: [], type: [], transfer_size: [], encoded_size: [], decoded_size: [],
+             start_ms: [], duration_ms: [], render_blocking: [] }),
+    };
+}
+"""
+
+
+def collect_args(api_pattern=API_PATTERN, quiet_ms=SETTLE_QUIET_MS, max_wait_ms=SETTLE_MAX_WAIT_MS):
+    return {
+        'apiPattern': api_pattern,
+        'quietMs': quiet_ms,
+        'maxWaitMs': max_wait_ms,
+        'blockingMs': LONG_TASK_BLOCKING_MS,
+    }
+
+
+def server_timing_columns(vitals):
+    """
+    API Server-Timing phases as dataset columns: 0 when the page made no API call,
+    None when it did but the response carried no (visible) Server-Timing header.
+    """
+    timings = vitals.get('api_server_timing') or {}
+    columns = {}
+    for name, col in SERVER_TIMING_COLUMNS.items():
+        if not vitals.get('api_found'):
+            columns[col] = 0.0
+        else:
+            columns[col] = round(timings[name], 2) if name in timings else None
+    return columns
+
+
+def vitals_columns(vitals):
+    """The new dataset/model columns from a COLLECT_SCRIPT result."""
+    return {
+        'TBT_ms': round(vitals['tbt_ms'], 2),
+        'CLS': round(vitals['cls'], 4),
+        'INP_ms': round(vitals['inp_ms'], 2),
+        **server_timing_columns(vitals),
+    }
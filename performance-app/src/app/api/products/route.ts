@@ -1,15 +1,19 @@
-import { NextResponse } from 'next/server';
+import { ServerTiming } from '@/lib/server-timing';
 
 export async function GET() {
-    // Simulate complex database query (REGRESSION)
-    // await new Promise((resolve) => setTimeout(resolve, 2000));
+    const timing = new ServerTiming();
 
-    const products = Array.from({ length: 20 }).map((_, i) => ({
-        id: i + 1,
-        name: `Performance Product ${i + 1}`,
-        description: `High-speed product description for item ${i + 1}.`,
-        price: (Math.random() * 100).toFixed(2),
-    }));
+    const products = await timing.measure('db', 'Data fetch', async () => {
+        // Simulate complex database query (REGRESSION)
+        // await new Promise((resolve) => setTimeout(resolve, 2000));
 
-    return NextResponse.json(products);
+        return Array.from({ length: 20 }).map((_, i) => ({
+            id: i + 1,
+            name: `Performance Product ${i + 1}`,
+            description: `High-speed product description for item ${i + 1}.`,
+            price: (Math.random() * 100).toFixed(2),
+        }));
+    });
+
+    return timing.json(products);
 }
@@ -0,0 +1,39 @@
+// Server-Timing instrumentation for the API routes.
+// Each phase is reported as `name;dur=<ms>;desc="..."`, and the whole handler as
+// `handler`, so the collector (scripts/web_vitals.py) can split API latency into
+// server time and network/queuing time:
+//   const timing = new ServerTiming();
+//   const rows = await timing.measure('db', 'Data fetch', () => query());
+//   return timing.json(rows);
+
+export class ServerTiming {
+    private readonly start = performance.now();
+    private readonly phases: string[] = [];
+
+    async measure<T>(name: string, description: string, fn: () => T | Promise<T>): Promise<T> {
+        const start = performance.now();
+        try {
+            return await fn();
+        } finally {
+            this.add(name, description, performance.now() - start);
+        }
+    }
+
+    add(name: string, description: string, durationMs: number) {
+        this.phases.push(`${name};dur=${durationMs.toFixed(2)};desc="${description}"`);
+    }
+
+    header(): string {
+        // handler covers everything up to now, including phases that were not measured separately
+        return [...this.phases, `handler;dur=${(performance.now() - this.start).toFixed(2)};desc="Handler"`].join(', ');
+    }
+
+    // Serialize inside a measured phase (NextResponse.json would do it after the header is set)
+    async json(data: unknown, init: ResponseInit = {}): Promise<Response> {
+        const body = await this.measure('serialize', 'Serialization', () => JSON.stringify(data));
+        const headers = new Headers(init.headers);
+        headers.set('Content-Type', 'application/json');
+        headers.set('Server-Timing', this.header());
+        return new Response(body, { ...init, headers });
+    }
+}